@@ -1,8 +1,8 @@
 import streamlit as st
 import config
-from pipeline import run_pipeline
-import threading
-import queue
+from jobs import JobRunner, QUEUED, RUNNING, DONE, FAILED
+
+config.print_debug()
 
 st.set_page_config(page_title="YouTube Lead Gen", page_icon="🚀", layout="wide")
 
@@ -24,9 +24,29 @@ selected_countries = st.sidebar.multiselect("Allowed Countries", all_countries,
 # Subscribers
 min_subs = st.sidebar.number_input("Min Subscribers", value=config.MIN_SUBSCRIBERS, step=1000)
 max_subs = st.sidebar.number_input("Max Subscribers", value=config.MAX_SUBSCRIBERS, step=1000)
+min_views_per_video = st.sidebar.number_input("Min Views per Video", value=config.MIN_VIEWS_PER_VIDEO, min_value=0, step=100, help="0 = off.")
+max_days_since_upload = st.sidebar.number_input("Max Days Since Last Upload", value=config.MAX_DAYS_SINCE_UPLOAD or 0, min_value=0, step=30, help="Looks up each channel's latest upload before the paid stages. 0 = off.")
+paid_budget = st.sidebar.number_input("Paid-Stage Budget (channels)", value=config.PAID_STAGE_BUDGET or 0, min_value=0, step=50, help="Most channels per run sent to email scraping and AI enrichment, highest priority score first. 0 = no limit.")
 
 # Limits
 max_channels = st.sidebar.number_input("Max Channels per Keyword", value=config.MAX_CHANNELS_PER_KEYWORD, min_value=1, max_value=50)
+target_qualified = st.sidebar.number_input("Target Qualified Channels per Keyword", value=config.TARGET_QUALIFIED_PER_KEYWORD or 0, min_value=0, step=10, help="Keep paging through search results until this many channels pass the filters. 0 = single search page.")
+quota_budget = st.sidebar.number_input("YouTube Quota Budget (units)", value=config.YOUTUBE_QUOTA_BUDGET, min_value=100, step=100, help="Each search page costs 100 units.")
+
+# Cache
+cache_modes = ["use", "refresh", "bypass"]
+cache_mode = st.sidebar.selectbox("Response Cache", cache_modes, index=cache_modes.index(config.CACHE_MODE) if config.CACHE_MODE in cache_modes else 0, help="use: serve repeat YouTube/Apify/OpenAI calls from the local cache. refresh: re-fetch and update the cache. bypass: ignore the cache.")
+
+# Enrichment
+enrichment_modes = ["sync", "batch"]
+enrichment_mode = st.sidebar.selectbox("LLM Enrichment", enrichment_modes, index=enrichment_modes.index(config.LLM_ENRICHMENT_MODE) if config.LLM_ENRICHMENT_MODE in enrichment_modes else 0, help="sync: enrich during the run. batch: queue leads for the OpenAI Batch API (cheaper, finishes within 24h); they are saved by a later run.")
+
+# Refresh
+refresh_modes = ["full", "incremental"]
+refresh_mode = st.sidebar.selectbox("Refresh Mode", refresh_modes, index=refresh_modes.index(config.REFRESH_MODE) if config.REFRESH_MODE in refresh_modes else 0, help="full: process every channel found. incremental: skip email scraping and enrichment for channels seen by an earlier run unless their subscribers crossed the threshold, they uploaded or they edited their description.")
+
+# Resume
+resume_run_id = st.sidebar.text_input("Resume Run ID", help="Paste the Run ID of an interrupted run to finish it with its original settings. Leave empty to start a new run.")
 
 # Apify Token Override
 st.sidebar.markdown("---")
@@ -47,40 +67,135 @@ if apify_token:
     st.sidebar.success("✅ Token detected")
 
 # Main Area
-st.markdown("### 📊 Execution Log")
-log_container = st.empty()
-log_text = ""
+# Runs execute in a process-wide background job runner, so they keep going
+# across page reruns and queue up behind each other.
+@st.cache_resource
+def get_job_runner():
+    return JobRunner()
+
+runner = get_job_runner()
+
+# Log lines shown per job (older ones are kept in the job, not re-rendered)
+LOG_TAIL_LINES = 500
 
 if st.button("Start Lead Generation", type="primary"):
     if not keywords:
         st.error("Please enter at least one keyword.")
     else:
-        st.info("Starting process... This may take a while.")
-        
         # Prepare overrides
         overrides = {
             'keywords': keywords,
             'allowed_countries': selected_countries,
             'min_subs': min_subs,
             'max_subs': max_subs,
+            'min_views_per_video': min_views_per_video,
+            'max_days_since_upload': max_days_since_upload or None,
+            'paid_budget': paid_budget or None,
             'max_channels': max_channels,
+            'target_qualified': target_qualified or None,
+            'quota_budget': quota_budget,
+            'cache_mode': cache_mode,
+            'enrichment_mode': enrichment_mode,
+            'refresh_mode': refresh_mode,
             'apify_token': apify_token
         }
-        
-        # Callback to update UI
-        def status_update(msg):
-            global log_text
-            log_text += msg + "\n"
-            log_container.code(log_text)
-
-        # Run pipeline
-        try:
-            total = run_pipeline(config_overrides=overrides, status_callback=status_update)
-            st.success(f"🎉 Process Complete! Generated {total} leads.")
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            import traceback
-            st.code(traceback.format_exc())
+        if resume_run_id.strip():
+            overrides['run_id'] = resume_run_id.strip()
+
+        job = runner.submit(overrides)
+        st.session_state['job_id'] = job.id
+        st.info(f"Job #{job.id} queued. This may take a while; you can leave this page and come back.")
+
+def job_title(job):
+    return f"#{job.id} · {job.label} ({job.created:%H:%M})"
+
+def new_log_lines(job):
+    """
+    Appends the job's new log lines to this session's copy and returns the
+    tail to display.
+    """
+    logs = st.session_state.setdefault('job_logs', {})
+    offset, lines = logs.get(job.id, (0, []))
+    new_lines, offset = job.lines_since(offset)
+    lines = (lines + new_lines)[-LOG_TAIL_LINES:]
+    logs[job.id] = (offset, lines)
+    return lines
+
+def show_run_summary(run_report):
+    st.markdown("### ⏱️ Run Summary")
+    st.caption(f"Run {run_report['run_id']} took {run_report['duration_seconds']:.0f}s; estimated cost ${run_report['totals']['cost_usd']:.4f}.")
+    st.dataframe([
+        {
+            "stage": stage,
+            "calls": stats["calls"],
+            "errors": stats["errors"],
+            "p50 (ms)": stats["p50_ms"],
+            "p95 (ms)": stats["p95_ms"],
+            "total time (s)": stats["total_seconds"],
+            "YouTube units": stats["quota_units"],
+            "Apify CUs": stats["compute_units"],
+            "OpenAI tokens": stats["prompt_tokens"] + stats["completion_tokens"] + stats["batch_prompt_tokens"] + stats["batch_completion_tokens"],
+            "cost ($)": stats["cost_usd"]
+        }
+        for stage, stats in run_report["stages"].items()
+    ], use_container_width=True)
+    if run_report.get("connections"):
+        st.caption("Connection reuse: " + ", ".join(
+            f"{provider} {stats['reused']:.0%} of {stats['requests']} requests"
+            for provider, stats in run_report["connections"].items()
+        ))
+
+jobs = runner.jobs()
+active = any(job.active for job in jobs)
+
+# Polls the selected job every 2 seconds while any job is queued or running
+@st.fragment(run_every=2 if active else None)
+def job_panel():
+    jobs = runner.jobs()
+    st.markdown("### 📊 Execution Log")
+    if not jobs:
+        st.caption("No runs yet.")
+        return
+
+    ids = [job.id for job in jobs]
+    selected = st.session_state.get('job_id')
+    job = runner.get(st.selectbox(
+        "Job",
+        ids,
+        index=ids.index(selected) if selected in ids else 0,
+        format_func=lambda job_id: job_title(runner.get(job_id))
+    ))
+    st.session_state['job_id'] = job.id
+    st.caption(f"Status: {job.status}")
+
+    if job.status == QUEUED:
+        ahead = sum(1 for other in jobs if other.active and other.id < job.id)
+        st.info(f"Queued behind {ahead} job(s).")
+        if st.button("Cancel job"):
+            runner.cancel(job.id)
+            st.rerun()
+    elif job.status == RUNNING:
+        counters = job.stage_counters()
+        if counters:
+            columns = st.columns(len(counters))
+            for column, (stage, stats) in zip(columns, counters.items()):
+                column.metric(stage, stats["calls"], f"{stats['errors']} errors" if stats["errors"] else None, delta_color="inverse")
+
+    st.code("\n".join(new_log_lines(job)))
+
+    if job.status == DONE:
+        st.success(f"🎉 Process Complete! Generated {job.total} leads.")
+        if job.report:
+            show_run_summary(job.report)
+    elif job.status == FAILED:
+        st.error(f"An error occurred: {job.error.splitlines()[0]}")
+        st.code(job.error)
+
+    # Switch polling off once nothing is left to run
+    if active and not any(other.active for other in jobs):
+        st.rerun()
+
+job_panel()
 
 st.markdown("---")
 st.markdown("### 📝 Recent Leads (Preview)")
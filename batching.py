@@ -0,0 +1,69 @@
+from concurrent.futures import Future
+import threading
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls from pipeline workers into batch
+    calls. `batch_fn(items)` must return one result per item, in order.
+
+    A batch is submitted once it reaches `max_batch` items or `linger`
+    seconds after its first item arrived, whichever comes first. `limit` is an
+    optional context manager (e.g. a stage semaphore) held during each batch
+    call. If `batch_fn` raises, every caller in that batch gets `default`.
+    """
+    def __init__(self, batch_fn, max_batch, linger, limit=None, default=None, name="batch"):
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, int(max_batch))
+        self.linger = linger
+        self.limit = limit
+        self.default = default
+        self.name = name
+        self._lock = threading.Lock()
+        self._queue = []
+        self._timer = None
+
+    def submit(self, item):
+        """
+        Queues an item and blocks until its batch has been processed.
+        """
+        future = Future()
+        batch = None
+        with self._lock:
+            self._queue.append((item, future))
+            if len(self._queue) >= self.max_batch:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.linger, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if batch:
+            self._run(batch)
+        return future.result()
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+
+    def _take(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        return batch
+
+    def _run(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            if self.limit is not None:
+                with self.limit:
+                    results = list(self.batch_fn(items))
+            else:
+                results = list(self.batch_fn(items))
+        except Exception as e:
+            print(f"{self.name} error: {e}")
+            results = []
+        for i, (_, future) in enumerate(batch):
+            future.set_result(results[i] if i < len(results) else self.default)
@@ -0,0 +1,4 @@
+"""
+Offline end-to-end benchmarks of the pipeline against the fake services in
+standins/fakes.py (see benchmarks/run.py).
+"""
@@ -0,0 +1,196 @@
+"""
+Memory benchmark: peak RSS of a fresh process that holds --channels
+channel candidates with their leads, once in the layout the pipeline used
+to carry (raw channels().list resources and lead dicts) and once as the
+slotted records of records.py, and the peak RSS of a full run against the
+instant fake services (standins/fakes.py).
+
+    python -m benchmarks.memory
+    python -m benchmarks.memory --channels 50000 --scenario medium --save-baseline
+
+Results are saved and compared with benchmarks/baseline.json like
+benchmarks/run.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+
+from benchmarks.run import BASELINE_PATH, RESULTS_DIR, load_json, save_json, report_missing_baseline
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Layouts of held channels compared by the benchmark
+FORMS = ["raw", "records"]
+
+# Differences below this many MB are treated as noise
+SLACK_MB = 2.0
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def raw_candidate(keyword, channel):
+    """
+    A channel item as the pipeline carried it before records.py: the
+    channels().list resource and a lead dict with a string timestamp.
+    """
+    stats = channel['statistics']
+    item = {
+        "keyword": keyword,
+        "channel_id": channel['id'],
+        "channel": channel,
+        "keywords": [keyword],
+        "log": [],
+        "resumed_stage": None,
+        "previous": None,
+        "changes": None,
+        "emails": ["creator@example.com"],
+        "email_source": "Apify",
+        "lead": None,
+        "saved": False
+    }
+    item["lead"] = {
+        "timestamp": str(datetime.datetime.now()),
+        "source_keyword": keyword,
+        "source_keywords": list(item["keywords"]),
+        "email": item["emails"][0],
+        "email_source": item["email_source"],
+        "all_emails": item["emails"],
+        "channel_id": channel['id'],
+        "channel_url": f"https://www.youtube.com/channel/{channel['id']}",
+        "channel_title": channel['snippet']['title'],
+        "channel_description_short": None,
+        "country": channel['snippet'].get('country'),
+        "subscriber_count": int(stats.get('subscriberCount', 0)),
+        "view_count": stats.get('viewCount'),
+        "video_count": stats.get('videoCount'),
+        "contact_name": None,
+        "contact_name_confidence": None,
+        "product_type": None,
+        "product_description": None,
+        "product_name": None,
+        "website_url": "",
+        "last_video_title": "Latest video",
+        "last_video_paraphrase": None,
+        "email_status": "Found",
+        "notes": "",
+        "supabase_id": ""
+    }
+    return item
+
+def record_candidate(keyword, channel):
+    from records import Candidate, Channel, Lead
+    item = Candidate(keyword, channel['id'], Channel.from_resource(channel))
+    item.emails, item.email_source = ["creator@example.com"], "Apify"
+    item.lead = Lead(
+        channel_id=item.channel_id,
+        email=item.emails[0],
+        email_source=item.email_source,
+        all_emails=item.emails,
+        source_keyword=keyword,
+        source_keywords=list(item.keywords),
+        channel_url=f"https://www.youtube.com/channel/{item.channel_id}",
+        channel_title=item.channel.title,
+        country=item.channel.country,
+        subscriber_count=item.channel.subscribers,
+        view_count=item.channel.views,
+        video_count=item.channel.videos,
+        last_video_title="Latest video"
+    )
+    return item
+
+def child_held(form, channels):
+    """
+    Runs in the measured process: builds and holds `channels` candidates.
+    """
+    from standins.fakes import FakeWorld
+    world = FakeWorld()
+    build = raw_candidate if form == "raw" else record_candidate
+    before = peak_rss_mb()
+    held = [build("benchmark keyword", world.channel(world.channel_id(n))) for n in range(channels)]
+    grown = peak_rss_mb() - before
+    print(json.dumps({"channels": len(held), "peak_mb": round(peak_rss_mb(), 1), "held_mb": round(grown, 1)}))
+
+def child_pipeline(scenario):
+    """
+    Runs in the measured process: one benchmark scenario, instant services.
+    """
+    from contextlib import redirect_stdout
+    from benchmarks.run import run_scenario
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        result = run_scenario(scenario, profile="instant")
+    print(json.dumps({"leads": result["leads"], "peak_mb": round(peak_rss_mb(), 1)}))
+
+def run_child(*args):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory", "--child", *args],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", type=int, default=20000, help="Channels held per layout")
+    parser.add_argument("--scenario", default="small", help="benchmarks.run scenario for the pipeline run (or 'none')")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed regression, as a fraction")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        if args.child[0] == "held":
+            child_held(args.child[1], int(args.child[2]))
+        else:
+            child_pipeline(args.child[1])
+        return 0
+
+    result = {"channels": args.channels}
+    print(f"\n🧠 Memory ({args.channels} channels held)")
+    for form in FORMS:
+        held = run_child("held", form, str(args.channels))
+        result[f"{form}_mb"] = held["held_mb"]
+        result[f"{form}_bytes_per_channel"] = int(held["held_mb"] * 1024 * 1024 / max(1, args.channels))
+        print(f"   📦 {form}: {held['held_mb']} MB ({result[f'{form}_bytes_per_channel']} bytes/channel), peak RSS {held['peak_mb']} MB")
+    if result["raw_mb"]:
+        print(f"   📉 records use {1 - result['records_mb'] / result['raw_mb']:.0%} less memory than raw resources")
+    if args.scenario != "none":
+        run = run_child("pipeline", args.scenario)
+        result["pipeline_peak_mb"] = run["peak_mb"]
+        print(f"   🚀 {args.scenario} run: peak RSS {run['peak_mb']} MB ({run['leads']} leads)")
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    save_json(os.path.join(RESULTS_DIR, f"{stamp}-memory.json"), {"memory": result})
+    print(f"\n💾 Results: {os.path.join(RESULTS_DIR, stamp + '-memory.json')}")
+
+    baseline = load_json(BASELINE_PATH)
+    if args.save_baseline:
+        baseline["memory"] = result
+        save_json(BASELINE_PATH, baseline)
+        print(f"📌 Baseline updated: {BASELINE_PATH}")
+        return 0
+
+    base = baseline.get("memory")
+    if base is None:
+        report_missing_baseline("memory")
+        return 1
+    if base.get("channels") != result["channels"]:
+        print(f"⚠️ memory: baseline held {base.get('channels')} channels, not compared.")
+        return 0
+    regressions = [
+        f"{name} {result[name]} MB > baseline {base[name]} MB"
+        for name in ("records_mb", "pipeline_peak_mb")
+        if name in base and name in result and result[name] > base[name] * (1 + args.tolerance) + SLACK_MB
+    ]
+    for regression in regressions:
+        print(f"❌ memory: {regression}")
+    if not regressions:
+        print(f"✅ memory: within {args.tolerance:.0%} of baseline")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
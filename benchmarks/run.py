@@ -0,0 +1,196 @@
+"""
+Runs the pipeline end to end against the in-process fake services
+(standins/fakes.py), with no network access and no real quota spent, and
+reports leads/sec, per-stage latency and API calls per service.
+
+    python -m benchmarks.run --scenario small
+    python -m benchmarks.run --scenario small medium --save-baseline
+    python -m benchmarks.run --scenario medium --profile instant
+
+Every run is saved to benchmarks/results/<timestamp>.json and compared
+with the committed benchmarks/baseline.json. The command exits with status
+1 when throughput, a stage's p95 latency or the number of API calls
+regressed by more than --tolerance, or when the baseline has no entry for
+a scenario (record one with --save-baseline and commit it).
+"""
+from contextlib import redirect_stdout
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+import config
+import rate_limit
+from standins.fakes import FakeServices, FakeWorld, PROFILES
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Keyword count and fake service profile per scenario
+SCENARIOS = {
+    "small": {"keywords": 10, "profile": "realistic"},
+    "medium": {"keywords": 100, "profile": "realistic"},
+    "large": {"keywords": 1000, "profile": "realistic"},
+    "flaky": {"keywords": 10, "profile": "flaky"}
+}
+
+# Local state files a run writes; each scenario gets fresh ones
+STATE_PATHS = {
+    "CHANNEL_INDEX_PATH": "channel_index.sqlite3",
+    "SHEETS_SPOOL_PATH": "sheets_spool.jsonl",
+    "PENDING_ENRICHMENT_PATH": "pending_enrichment.sqlite3",
+    "LLM_BATCH_DIR": "batches",
+    "CHECKPOINT_PATH": "checkpoints.sqlite3",
+    "RUN_REPORT_DIR": "reports",
+    "CACHE_PATH": "response_cache.sqlite3",
+    "CHANNEL_STORE_PATH": "channel_store.sqlite3"
+}
+
+# p95 differences below this many milliseconds are treated as noise
+LATENCY_SLACK_MS = 25.0
+
+def run_scenario(name, profile=None, seed=1, verbose=False):
+    """
+    Runs one scenario and returns its result dict.
+    """
+    from pipeline import run_pipeline
+
+    scenario = SCENARIOS[name]
+    profile = profile or scenario["profile"]
+    keywords = [f"benchmark keyword {i}" for i in range(scenario["keywords"])]
+    services = FakeServices(FakeWorld(seed=seed), PROFILES[profile], seed=seed)
+    reports = []
+
+    with tempfile.TemporaryDirectory(prefix="leadgen-bench-") as state_dir:
+        originals = {attr: getattr(config, attr) for attr in STATE_PATHS}
+        for attr, filename in STATE_PATHS.items():
+            setattr(config, attr, os.path.join(state_dir, filename))
+        rate_limit.reset()
+        log_path = os.path.join(state_dir, "run.log")
+        try:
+            with services.install(), open(log_path, "w", encoding="utf-8") as log_file:
+                start = time.perf_counter()
+                if verbose:
+                    leads = run_pipeline({"keywords": keywords, "cache_mode": "bypass"}, report_callback=reports.append)
+                else:
+                    with redirect_stdout(log_file):
+                        leads = run_pipeline({"keywords": keywords, "cache_mode": "bypass"}, report_callback=reports.append)
+                seconds = time.perf_counter() - start
+        finally:
+            for attr, value in originals.items():
+                setattr(config, attr, value)
+
+    report = reports[0] if reports else {"stages": {}, "totals": {}}
+    return {
+        "scenario": name,
+        "profile": profile,
+        "keywords": len(keywords),
+        "seed": seed,
+        "leads": leads,
+        "seconds": round(seconds, 3),
+        "leads_per_sec": round(leads / seconds, 3) if seconds else 0.0,
+        "stages": {
+            stage: {field: stats[field] for field in ("calls", "errors", "p50_ms", "p95_ms", "total_seconds")}
+            for stage, stats in report["stages"].items()
+        },
+        "api_calls": services.call_counts(),
+        "rate_limits": rate_limit.summary(),
+        "estimated_cost_usd": report["totals"].get("cost_usd", 0.0)
+    }
+
+def compare(result, baseline, tolerance):
+    """
+    Returns a list of regressions of `result` against its baseline result.
+    """
+    regressions = []
+    if result["leads_per_sec"] < baseline["leads_per_sec"] * (1 - tolerance):
+        regressions.append(f"leads/sec {result['leads_per_sec']} < baseline {baseline['leads_per_sec']}")
+    for stage, stats in baseline["stages"].items():
+        current = result["stages"].get(stage)
+        if current is None:
+            continue
+        limit = stats["p95_ms"] * (1 + tolerance) + LATENCY_SLACK_MS
+        if current["p95_ms"] > limit:
+            regressions.append(f"{stage} p95 {current['p95_ms']} ms > baseline {stats['p95_ms']} ms")
+    for service, counts in baseline["api_calls"].items():
+        calls = result["api_calls"].get(service, {}).get("calls", 0)
+        if calls > counts["calls"] * (1 + tolerance):
+            regressions.append(f"{service} calls {calls} > baseline {counts['calls']}")
+    return regressions
+
+def print_result(result):
+    print(f"\n📈 {result['scenario']} ({result['keywords']} keywords, {result['profile']} services)")
+    print(f"   {result['leads']} leads in {result['seconds']}s = {result['leads_per_sec']} leads/sec, est. ${result['estimated_cost_usd']:.4f}")
+    for stage, stats in result["stages"].items():
+        print(f"   ⏱️ {stage}: {stats['calls']} calls, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms")
+    calls = ", ".join(f"{service} {counts['calls']}" for service, counts in result["api_calls"].items())
+    print(f"   📞 API calls: {calls}")
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+def report_missing_baseline(name):
+    """
+    A result with nothing to compare with fails the gate rather than
+    passing it silently.
+    """
+    print(f"❌ {name}: no baseline in {BASELINE_PATH}; record one with --save-baseline and commit it.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=["small"])
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="Override the scenario's service profile")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression, as a fraction")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline log")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.scenario:
+        results[name] = run_scenario(name, profile=args.profile, seed=args.seed, verbose=args.verbose)
+        print_result(results[name])
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    save_json(os.path.join(RESULTS_DIR, f"{stamp}.json"), results)
+    print(f"\n💾 Results: {os.path.join(RESULTS_DIR, stamp + '.json')}")
+
+    baseline = load_json(BASELINE_PATH)
+    if args.save_baseline:
+        baseline.update(results)
+        save_json(BASELINE_PATH, baseline)
+        print(f"📌 Baseline updated: {BASELINE_PATH}")
+        return 0
+
+    failed = False
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            report_missing_baseline(name)
+            failed = True
+            continue
+        if base["profile"] != result["profile"] or base["seed"] != result["seed"]:
+            print(f"⚠️ {name}: baseline used profile {base['profile']} / seed {base['seed']}, not compared.")
+            continue
+        regressions = compare(result, base, args.tolerance)
+        for regression in regressions:
+            print(f"❌ {name}: {regression}")
+        if not regressions:
+            print(f"✅ {name}: within {args.tolerance:.0%} of baseline")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
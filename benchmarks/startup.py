@@ -0,0 +1,113 @@
+"""
+Startup-time benchmark: how long a fresh process takes to import the
+config and the pipeline, to make its first external call and to finish a
+one-keyword run against the instant fake services (standins/fakes.py).
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 10 --save-baseline
+
+Each measurement is the median over --repeat fresh processes. Results are
+saved and compared with benchmarks/baseline.json like benchmarks/run.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.run import BASELINE_PATH, RESULTS_DIR, load_json, save_json, report_missing_baseline
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Timings (seconds since the process was spawned) reported by a child
+MEASUREMENTS = ["import_config", "import_pipeline", "first_call", "run"]
+
+# Differences below this many seconds are treated as noise
+SLACK_SECONDS = 0.05
+
+def child():
+    """
+    Runs in the measured process. Prints its timings as JSON.
+    """
+    spawned = float(os.environ["STARTUP_BENCH_SPAWNED"])
+    timings = {}
+    import config
+    timings["import_config"] = time.time() - spawned
+    from pipeline import run_pipeline
+    timings["import_pipeline"] = time.time() - spawned
+
+    import tempfile
+    from contextlib import redirect_stdout
+    from benchmarks.run import STATE_PATHS
+    from standins.fakes import FakeServices, PROFILES
+    services = FakeServices(profile=PROFILES["instant"])
+    with tempfile.TemporaryDirectory(prefix="leadgen-startup-") as state_dir:
+        for attr, filename in STATE_PATHS.items():
+            setattr(config, attr, os.path.join(state_dir, filename))
+        with services.install(), open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            run_pipeline({"keywords": ["startup benchmark"], "cache_mode": "bypass"})
+    timings["first_call"] = min(b.first_call for b in services.backends.values() if b.first_call) - spawned
+    timings["run"] = time.time() - spawned
+    print(json.dumps(timings))
+
+def measure(repeat):
+    samples = {name: [] for name in MEASUREMENTS}
+    for _ in range(repeat):
+        env = dict(os.environ, STARTUP_BENCH_SPAWNED=repr(time.time()))
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        for name in MEASUREMENTS:
+            samples[name].append(timings[name])
+    return {name: round(statistics.median(values), 3) for name, values in samples.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression, as a fraction")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child()
+        return 0
+
+    result = measure(max(1, args.repeat))
+    print("\n🚀 Startup (median of {} processes)".format(max(1, args.repeat)))
+    for name in MEASUREMENTS:
+        print(f"   ⏱️ {name}: {result[name]}s")
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    save_json(os.path.join(RESULTS_DIR, f"{stamp}-startup.json"), {"startup": result})
+    print(f"\n💾 Results: {os.path.join(RESULTS_DIR, stamp + '-startup.json')}")
+
+    baseline = load_json(BASELINE_PATH)
+    if args.save_baseline:
+        baseline["startup"] = result
+        save_json(BASELINE_PATH, baseline)
+        print(f"📌 Baseline updated: {BASELINE_PATH}")
+        return 0
+
+    base = baseline.get("startup")
+    if base is None:
+        report_missing_baseline("startup")
+        return 1
+    regressions = [
+        f"{name} {result[name]}s > baseline {base[name]}s"
+        for name in MEASUREMENTS
+        if name in base and result[name] > base[name] * (1 + args.tolerance) + SLACK_SECONDS
+    ]
+    for regression in regressions:
+        print(f"❌ startup: {regression}")
+    if not regressions:
+        print(f"✅ startup: within {args.tolerance:.0%} of baseline")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
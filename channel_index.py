@@ -0,0 +1,82 @@
+import datetime
+import os
+import sqlite3
+import threading
+
+class ChannelIndex:
+    """
+    Persistent local set of channel IDs known to exist in Supabase.
+    Backed by SQLite on disk, with an in-memory copy for lookups.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Shared by parallel `cli work` processes: WAL and a long busy timeout
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS channels (channel_id TEXT PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self._known = {row[0] for row in self._conn.execute("SELECT channel_id FROM channels")}
+
+    def __contains__(self, channel_id):
+        return channel_id in self._known
+
+    def __len__(self):
+        return len(self._known)
+
+    def add(self, channel_ids):
+        """
+        Records channel IDs as known. Accepts a single ID or an iterable.
+        """
+        if isinstance(channel_ids, str):
+            channel_ids = [channel_ids]
+        with self._lock:
+            new_ids = [cid for cid in channel_ids if cid and cid not in self._known]
+            if not new_ids:
+                return
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO channels (channel_id) VALUES (?)",
+                [(cid,) for cid in new_ids]
+            )
+            self._conn.commit()
+            self._known.update(new_ids)
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def warm(self, fetch_channel_ids):
+        """
+        Syncs the index with the database once per process start.
+        `fetch_channel_ids(since)` yields channel IDs saved after `since`
+        (a timestamp string, or None for every row). The first warm loads
+        everything; later warms only fetch rows added since the last one.
+        Returns the number of IDs added.
+        """
+        since = self._get_meta("last_warmed")
+        started = str(datetime.datetime.now())
+        before = len(self._known)
+
+        batch = []
+        for channel_id in fetch_channel_ids(since):
+            batch.append(channel_id)
+            if len(batch) >= 1000:
+                self.add(batch)
+                batch = []
+        self.add(batch)
+
+        self._set_meta("last_warmed", started)
+        return len(self._known) - before
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
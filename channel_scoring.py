@@ -0,0 +1,104 @@
+"""
+Vectorized channel filters and priority scores.
+
+A batch of Channel records (see records.py) is loaded into a pandas
+DataFrame, one row per channel, and every filter and score is computed as
+a column operation over the whole batch:
+
+    frame = channel_frame(channels)
+    reasons = rejection_reasons(frame, rules)   # None where a channel passes
+    scores = priority_scores(frame, config.PRIORITY_WEIGHTS)
+"""
+import numpy as np
+import pandas as pd
+
+# Something in the description that looks like a contact address, plain or
+# obfuscated ("name [at] gmail"), so the email step may find it for free
+EMAIL_HINT = r"@|[\[\(\{<]\s*at\s*[\]\)\}>]"
+
+# Features a priority score can weigh (see priority_scores)
+FEATURES = ["subscribers", "views_per_video", "recency", "description_email"]
+
+def channel_frame(channels):
+    """
+    Returns a DataFrame with the filter and scoring columns of `channels`.
+    """
+    frame = pd.DataFrame({
+        "channel_id": [c.id for c in channels],
+        # object, not str: pandas 3 would turn a missing country into NaN
+        "country": pd.Series([c.country for c in channels], dtype=object),
+        "subscribers": np.array([c.subscribers for c in channels], dtype="int64"),
+        "views": np.array([c.views for c in channels], dtype="int64"),
+        "videos": np.array([c.videos for c in channels], dtype="int64"),
+        "description": [c.description + "\n" + c.branding_description for c in channels]
+    })
+    frame["views_per_video"] = frame["views"] // frame["videos"].clip(lower=1)
+    frame["description_email"] = frame["description"].str.contains(EMAIL_HINT, case=False, regex=True)
+    return frame
+
+def set_upload_dates(frame, published):
+    """
+    Adds `days_since_upload` from {channel_id: ISO publish time of the
+    latest upload}. Channels without an entry get NaN (no upload found).
+    """
+    dates = pd.to_datetime(frame["channel_id"].map(published), utc=True, errors="coerce")
+    frame["days_since_upload"] = (pd.Timestamp.now(tz="UTC") - dates).dt.total_seconds() / 86400
+    return frame
+
+def rejection_reasons(frame, rules):
+    """
+    Returns an array with the reason each channel is rejected (the first
+    failing rule, in order), or None where it passes every rule.
+
+    `rules` holds allowed_countries, min_subs, max_subs and, optionally,
+    min_views_per_video and max_days_since_upload (checked only once
+    set_upload_dates has run).
+    """
+    conditions = [
+        ~frame["country"].isin(rules["allowed_countries"]),
+        ~frame["subscribers"].between(rules["min_subs"], rules["max_subs"])
+    ]
+    messages = [
+        "Country " + frame["country"].map(str) + " not in allowed list.",
+        "Subscribers " + frame["subscribers"].astype(str) + " out of range."
+    ]
+    min_views = rules.get("min_views_per_video")
+    if min_views:
+        conditions.append(frame["views_per_video"] < min_views)
+        messages.append("Views per video " + frame["views_per_video"].astype(str) + f" below {min_views}.")
+    max_days = rules.get("max_days_since_upload")
+    if max_days and "days_since_upload" in frame:
+        days = frame["days_since_upload"]
+        conditions.append(days.isna() | (days > max_days))
+        messages.append(pd.Series(f"No upload in the last {max_days} days.", index=frame.index))
+    return np.select(
+        [condition.to_numpy(dtype=bool) for condition in conditions],
+        [message.to_numpy(dtype=object) for message in messages],
+        default=None
+    )
+
+def priority_scores(frame, weights):
+    """
+    Returns each channel's priority score in [0, 1]: the weighted mean of
+    its features, each scaled to [0, 1]. Sizes are scored on a log scale
+    (1M subscribers or views per video score 1). Upload recency scores 0.5
+    when upload dates were not looked up.
+    """
+    unknown = set(weights) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown priority features: {sorted(unknown)} (expected {FEATURES})")
+
+    features = {
+        "subscribers": np.log10(frame["subscribers"].clip(lower=1)) / 6,
+        "views_per_video": np.log10(frame["views_per_video"].clip(lower=1)) / 6,
+        "recency": (
+            (1 - frame["days_since_upload"] / 365).fillna(0)
+            if "days_since_upload" in frame else pd.Series(0.5, index=frame.index)
+        ),
+        "description_email": frame["description_email"].astype(float)
+    }
+    total = sum(weights.values())
+    if not total:
+        return pd.Series(0.0, index=frame.index)
+    score = sum(features[name].clip(0, 1) * weight for name, weight in weights.items())
+    return (score / total).round(4)
@@ -0,0 +1,133 @@
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+def description_hash(channel):
+    return hashlib.sha1(channel.description.strip().encode("utf-8")).hexdigest()
+
+def changes(channel, previous, min_subs, max_subs, latest_upload=None):
+    """
+    Returns the cheap signals that changed since `previous`, the stored
+    record: a subscriber count that crossed into [min_subs, max_subs], a new
+    upload, an edited description. A new upload shows as a higher video
+    count or, when the latest upload was looked up (`latest_upload`, its
+    video ID), as a different latest upload than the stored one.
+    Returns None for a channel never seen before.
+    """
+    if previous is None:
+        return None
+    found = []
+    subs = channel.subscribers
+    was_in_range = previous["subscribers"] is not None and min_subs <= previous["subscribers"] <= max_subs
+    if min_subs <= subs <= max_subs and not was_in_range:
+        found.append(f"subscribers {previous['subscribers']} -> {subs}")
+    if previous["video_count"] is not None and channel.videos > previous["video_count"]:
+        found.append("new upload")
+    elif latest_upload and previous["latest_upload"] and latest_upload != previous["latest_upload"]:
+        found.append("new upload")
+    if previous["description_hash"] != description_hash(channel):
+        found.append("description edited")
+    return found
+
+class ChannelStore:
+    """
+    Persistent local record of every channel the pipeline looked up emails
+    for: the outcome of the last email lookup and the subscriber and video
+    counts, description hash and latest upload as they were at the time.
+    Incremental refresh runs use it to skip paid work on channels that did
+    not change since.
+
+    Statistics are only written with an email outcome, so a channel whose
+    paid steps never ran (dropped by the budget, or cut off by a crash)
+    still shows its changes to the next run.
+    """
+    COLUMNS = (
+        "channel_id", "subscribers", "video_count", "description_hash", "latest_upload",
+        "email_outcome", "emails", "email_source", "first_seen", "last_seen", "email_checked"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Shared by parallel `cli work` processes: WAL and a long busy timeout
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS channels ("
+            " channel_id TEXT PRIMARY KEY, subscribers INTEGER, video_count INTEGER,"
+            " description_hash TEXT, latest_upload TEXT, email_outcome TEXT, emails TEXT,"
+            " email_source TEXT, first_seen TEXT NOT NULL, last_seen TEXT NOT NULL, email_checked TEXT)"
+        )
+        self._conn.commit()
+
+    def _now(self):
+        return str(datetime.datetime.now())
+
+    def _record(self, row):
+        record = dict(zip(self.COLUMNS, row))
+        record["emails"] = json.loads(record["emails"]) if record["emails"] else []
+        return record
+
+    def get_many(self, channel_ids):
+        """
+        Returns {channel_id: record} for the channels in the store.
+        """
+        channel_ids = list(channel_ids)
+        records = {}
+        with self._lock:
+            for start in range(0, len(channel_ids), 500):
+                chunk = channel_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(self.COLUMNS)} FROM channels"
+                    f" WHERE channel_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for row in rows:
+                    records[row[0]] = self._record(row)
+        return records
+
+    def get(self, channel_id):
+        return self.get_many([channel_id]).get(channel_id)
+
+    def record_emails(self, channel, emails, source=None):
+        """
+        Records the outcome of an email lookup ("found" or "none") for a
+        Channel record, with the statistics it was made on.
+        """
+        now = self._now()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO channels (channel_id, subscribers, video_count, description_hash, email_outcome,"
+                " emails, email_source, first_seen, last_seen, email_checked) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(channel_id) DO UPDATE SET subscribers = excluded.subscribers,"
+                " video_count = excluded.video_count, description_hash = excluded.description_hash,"
+                " email_outcome = excluded.email_outcome, emails = excluded.emails,"
+                " email_source = excluded.email_source, last_seen = excluded.last_seen,"
+                " email_checked = excluded.email_checked",
+                (
+                    channel.id, channel.subscribers, channel.videos, description_hash(channel),
+                    "found" if emails else "none", json.dumps(list(emails or [])), source, now, now, now
+                )
+            )
+            self._conn.commit()
+
+    def record_upload(self, channel_id, video_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE channels SET latest_upload = ? WHERE channel_id = ?", (video_id, channel_id)
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM channels").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
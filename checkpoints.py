@@ -0,0 +1,187 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+# Per-channel stages, in pipeline order. A channel's row holds the last stage
+# it completed; "rejected" marks channels that dropped out (filters, dedup,
+# no email) and need no further work.
+STAGES = [
+    "searched",
+    "detailed",
+    "filtered",
+    "emails_found",
+    "enriched",
+    "saved_supabase",
+    "saved_sheets"
+]
+REJECTED = "rejected"
+
+def new_run_id():
+    return datetime.datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+
+class RunCheckpoints:
+    """
+    Durable per-channel stage checkpoints for one pipeline run, so a crashed
+    or interrupted run can be resumed without repeating paid calls.
+    Each channel keeps its latest stage plus the data later stages need
+    (channel resource, emails, lead).
+    """
+    def __init__(self, path, run_id):
+        self.path = path
+        self.run_id = run_id
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Shared by parallel `cli work` processes: WAL and a long busy timeout
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, settings TEXT NOT NULL,"
+            " status TEXT NOT NULL, created TEXT NOT NULL, updated TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keywords ("
+            " run_id TEXT NOT NULL, keyword TEXT NOT NULL, done INTEGER NOT NULL,"
+            " PRIMARY KEY (run_id, keyword))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS channels ("
+            " run_id TEXT NOT NULL, channel_id TEXT NOT NULL, keyword TEXT,"
+            " stage TEXT NOT NULL, data TEXT NOT NULL, updated TEXT NOT NULL,"
+            " PRIMARY KEY (run_id, channel_id))"
+        )
+        self._conn.commit()
+
+    def _now(self):
+        return str(datetime.datetime.now())
+
+    # Runs
+
+    def exists(self):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (self.run_id,)).fetchone()
+        return row is not None
+
+    def start(self, settings):
+        """
+        Records the run's settings (so a resume uses the same ones).
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, settings, status, created, updated)"
+                " VALUES (?, ?, 'running', ?, ?)",
+                (self.run_id, json.dumps(settings), self._now(), self._now())
+            )
+            self._conn.execute(
+                "UPDATE runs SET status = 'running', updated = ? WHERE run_id = ?",
+                (self._now(), self.run_id)
+            )
+            self._conn.commit()
+
+    def settings(self):
+        with self._lock:
+            row = self._conn.execute("SELECT settings FROM runs WHERE run_id = ?", (self.run_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def finish(self):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET status = 'completed', updated = ? WHERE run_id = ?",
+                (self._now(), self.run_id)
+            )
+            self._conn.commit()
+
+    # Keywords
+
+    def keyword_done(self, keyword):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT done FROM keywords WHERE run_id = ? AND keyword = ?", (self.run_id, keyword)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def mark_keyword_done(self, keyword):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO keywords (run_id, keyword, done) VALUES (?, ?, 1)",
+                (self.run_id, keyword)
+            )
+            self._conn.commit()
+
+    # Channels
+
+    def mark(self, channel_id, stage, keyword=None, **data):
+        """
+        Records that a channel completed `stage` (or was rejected), merging
+        `data` into what was stored for it before.
+        """
+        self.mark_many([channel_id], stage, keyword, **data)
+
+    def mark_many(self, channel_ids, stage, keyword=None, **data):
+        """
+        Like `mark` for several channels, in one transaction. A channel's
+        stage only ever moves forward (a channel seen again under another
+        keyword keeps its progress), and a rejected channel stays rejected.
+        """
+        with self._lock:
+            for channel_id in channel_ids:
+                row = self._conn.execute(
+                    "SELECT keyword, stage, data FROM channels WHERE run_id = ? AND channel_id = ?",
+                    (self.run_id, channel_id)
+                ).fetchone()
+                if row is None:
+                    stored_keyword, new_stage, stored = keyword, stage, {}
+                else:
+                    stored_keyword, current, stored = row[0], row[1], json.loads(row[2])
+                    new_stage = current
+                    if current != REJECTED and (stage == REJECTED or STAGES.index(stage) > STAGES.index(current)):
+                        new_stage = stage
+                stored.update(data)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO channels (run_id, channel_id, keyword, stage, data, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.run_id, channel_id, stored_keyword, new_stage, json.dumps(stored), self._now())
+                )
+            self._conn.commit()
+
+    def get(self, channel_id):
+        """
+        Returns (stage, data) for a channel, or (None, {}) if it is unknown.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stage, data FROM channels WHERE run_id = ? AND channel_id = ?",
+                (self.run_id, channel_id)
+            ).fetchone()
+        if row is None:
+            return None, {}
+        return row[0], json.loads(row[1])
+
+    def reached(self, channel_id, stage):
+        """
+        True if the channel completed `stage` (or a later one).
+        """
+        current, _ = self.get(channel_id)
+        if current is None or current == REJECTED:
+            return False
+        return STAGES.index(current) >= STAGES.index(stage)
+
+    def channels(self):
+        """
+        Returns [(channel_id, keyword, stage, data)] for every channel of the run.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel_id, keyword, stage, data FROM channels WHERE run_id = ? ORDER BY updated",
+                (self.run_id,)
+            ).fetchall()
+        return [(channel_id, keyword, stage, json.loads(data)) for channel_id, keyword, stage, data in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,207 @@
+"""
+Headless entry point for scheduled and fleet runs.
+
+Keywords are queued in a shared work queue (see work_queue.py); every
+worker claims a few keywords at a time and runs the pipeline on them, so
+any number of workers, local processes or machines sharing the queue file,
+split the keyword space without processing a keyword or channel twice.
+
+    python cli.py run --keywords-file keywords.txt --workers 4
+    python cli.py enqueue --keywords-file keywords.txt
+    python cli.py work --workers 2 --countries US,UK --min-subs 5000
+    python cli.py status
+
+`run` queues the keywords and works the queue until it is empty; `work`
+only works the queue (e.g. from cron on several machines). Exits with
+status 1 if a task failed.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import config
+from work_queue import WorkQueue
+
+def read_keywords(args):
+    keywords = list(args.keyword or [])
+    if args.keywords_file:
+        with open(args.keywords_file, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    keywords.append(line)
+    return keywords
+
+def build_overrides(args):
+    """
+    Returns run_pipeline overrides for the options given on the command line.
+    """
+    overrides = {}
+    if args.countries:
+        overrides['allowed_countries'] = [c.strip().upper() for c in args.countries.split(",") if c.strip()]
+    for option, key in (
+        ("min_subs", "min_subs"),
+        ("max_subs", "max_subs"),
+        ("min_views_per_video", "min_views_per_video"),
+        ("max_days_since_upload", "max_days_since_upload"),
+        ("paid_budget", "paid_budget"),
+        ("max_channels", "max_channels"),
+        ("target_qualified", "target_qualified"),
+        ("quota_budget", "quota_budget"),
+        ("cache_mode", "cache_mode"),
+        ("enrichment_mode", "enrichment_mode"),
+        ("refresh_mode", "refresh_mode"),
+        ("concurrency", "workers")
+    ):
+        value = getattr(args, option)
+        if value is not None:
+            overrides[key] = value
+    return overrides
+
+def work(queue_path, worker, overrides, rate_share=1):
+    """
+    Claims and runs tasks until the queue is empty. Returns the number of
+    tasks that failed.
+    """
+    from pipeline import run_pipeline
+
+    # The Sheets spool and the pending-enrichment store are rewritten in
+    # place, so every worker keeps its own (named after the worker, so a
+    # restarted worker recovers what it left behind)
+    name = worker.replace(os.sep, "_")
+    config.SHEETS_SPOOL_PATH = os.path.join(config.LOCAL_STATE_DIR, f"sheets_spool.{name}.jsonl")
+    config.PENDING_ENRICHMENT_PATH = os.path.join(config.LOCAL_STATE_DIR, f"pending_enrichment.{name}.sqlite3")
+    # Local worker processes share the machine's rate limits
+    config.RATE_LIMITS = {
+        provider: {"rate": limits["rate"] / rate_share, "burst": max(1, limits["burst"] // rate_share)}
+        for provider, limits in config.RATE_LIMITS.items()
+    }
+
+    queue = WorkQueue(queue_path)
+    failed = 0
+    while True:
+        task = queue.claim(worker, config.WORK_LEASE_SECONDS, config.WORK_MAX_ATTEMPTS)
+        if task is None:
+            break
+        task_id, keywords, run_id = task
+        print(f"👷 {worker}: task {task_id} ({len(keywords)} keywords), run {run_id}")
+
+        # Keep the lease while the run goes on
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(config.WORK_LEASE_SECONDS / 3):
+                if not queue.renew(task_id, worker, config.WORK_LEASE_SECONDS):
+                    print(f"⚠️ {worker}: lost the lease on task {task_id}")
+                    return
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            total = run_pipeline(
+                config_overrides=dict(overrides, keywords=keywords, run_id=run_id),
+                extra_filters=[queue.channel_filter(task_id, worker)]
+            )
+            queue.complete(task_id)
+            print(f"👷 {worker}: task {task_id} done, {total} leads")
+        except Exception as e:
+            print(f"❌ {worker}: task {task_id} failed: {e}")
+            queue.fail(task_id, e, config.WORK_MAX_ATTEMPTS)
+            failed += 1
+        finally:
+            stop.set()
+    queue.close()
+    return failed
+
+def _work_process(queue_path, worker, overrides, rate_share, results):
+    results.put(work(queue_path, worker, overrides, rate_share))
+
+def run_workers(args, overrides):
+    """
+    Works the queue with `args.workers` local processes. Returns the number
+    of failed tasks.
+    """
+    workers = max(1, args.workers)
+    if workers == 1:
+        return work(args.queue, args.worker_id, overrides)
+
+    # Spawned (not forked) so no thread or SQLite handle is inherited
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_work_process,
+            args=(args.queue, f"{args.worker_id}-{i}", overrides, workers, results)
+        )
+        for i in range(1, workers + 1)
+    ]
+    for process in processes:
+        process.start()
+    failed = 0
+    for process in processes:
+        process.join()
+        failed += 1 if process.exitcode else 0
+    while not results.empty():
+        failed += results.get()
+    return failed
+
+def print_status(queue_path):
+    queue = WorkQueue(queue_path)
+    counts = queue.counts()
+    print(f"📋 Tasks: {counts.get('pending', 0)} pending, {counts.get('claimed', 0)} running, {counts.get('done', 0)} done, {counts.get('failed', 0)} failed")
+    for task_id, keywords, error in queue.failures():
+        print(f"❌ Task {task_id} ({', '.join(keywords)}): {error}")
+    queue.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["run", "enqueue", "work", "status"])
+    parser.add_argument("--queue", default=config.WORK_QUEUE_PATH, help="Work queue file, shared by every worker")
+
+    group = parser.add_argument_group("keywords")
+    group.add_argument("--keywords-file", help="File with one keyword per line (# comments)")
+    group.add_argument("--keyword", action="append", help="A keyword (repeatable)")
+    group.add_argument("--chunk-size", type=int, default=config.WORK_CHUNK_SIZE, help="Keywords per task")
+
+    group = parser.add_argument_group("run settings")
+    group.add_argument("--countries", help="Comma-separated allowed countries, e.g. US,UK,CA")
+    group.add_argument("--min-subs", type=int)
+    group.add_argument("--max-subs", type=int)
+    group.add_argument("--min-views-per-video", type=int)
+    group.add_argument("--max-days-since-upload", type=int, help="Skip channels without an upload in this many days")
+    group.add_argument("--paid-budget", type=int, help="Most channels per task sent to Apify and the LLM, highest priority first")
+    group.add_argument("--max-channels", type=int, help="Channels per keyword search page")
+    group.add_argument("--target-qualified", type=int, help="Qualified channels to aim for per keyword")
+    group.add_argument("--quota-budget", type=int, help="YouTube quota units per task")
+    group.add_argument("--cache-mode", choices=["use", "refresh", "bypass"])
+    group.add_argument("--enrichment-mode", choices=["sync", "batch"])
+    group.add_argument("--refresh-mode", choices=["full", "incremental"], help="incremental: skip unchanged channels seen by earlier runs")
+    group.add_argument("--concurrency", type=int, help="Channel workers per run (threads)")
+
+    group = parser.add_argument_group("workers")
+    group.add_argument("--workers", type=int, default=1, help="Worker processes on this machine")
+    group.add_argument("--worker-id", default=socket.gethostname(), help="Name of this worker (unique per machine)")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        print_status(args.queue)
+        return 0
+
+    if args.command in ("run", "enqueue"):
+        keywords = read_keywords(args)
+        if not keywords and args.command == "enqueue":
+            parser.error("no keywords given (--keywords-file or --keyword)")
+        queue = WorkQueue(args.queue)
+        added = queue.add_keywords(keywords, chunk_size=max(1, args.chunk_size))
+        queue.close()
+        print(f"📥 Queued {added} new keywords ({len(keywords) - added} already queued or running).")
+        if args.command == "enqueue":
+            return 0
+
+    failed = run_workers(args, build_overrides(args))
+    print_status(args.queue)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,84 @@
 import os
+import sys
 from dotenv import load_dotenv
-import streamlit as st
 
 load_dotenv()
 
+# Streamlit secrets files, in the order Streamlit reads them (later wins)
+SECRETS_FILES = [
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+    os.path.join(os.getcwd(), ".streamlit", "secrets.toml")
+]
+
+_secrets = None
+
+def get_secrets():
+    """
+    Returns the Streamlit secrets as a dict. Under the Streamlit app these
+    are st.secrets; elsewhere the secrets files are read directly, so that
+    loading the config (e.g. in CLI workers) does not import streamlit.
+    """
+    global _secrets
+    if _secrets is None:
+        if "streamlit" in sys.modules:
+            import streamlit as st
+            try:
+                _secrets = st.secrets.to_dict()
+            except Exception:
+                _secrets = {}
+        else:
+            try:
+                import tomllib
+            except ImportError:
+                tomllib = None
+            _secrets = {}
+            for path in SECRETS_FILES:
+                if tomllib is not None and os.path.exists(path):
+                    with open(path, "rb") as f:
+                        _secrets.update(tomllib.load(f))
+    return _secrets
+
 def get_env(key, default=None):
     """Helper to get env var from os or streamlit secrets."""
     value = os.getenv(key)
     if value:
         return value
-    if hasattr(st, "secrets") and key in st.secrets:
-        return st.secrets[key]
+    secrets = get_secrets()
+    if key in secrets:
+        return secrets[key]
     return default
 
 # API Keys
 OPENAI_API_KEY = get_env("OPENAI_API_KEY")
+OPENAI_BASE_URL = get_env("OPENAI_BASE_URL")
 APIFY_API_TOKEN = get_env("APIFY_API_TOKEN")
 YOUTUBE_API_KEY = get_env("YOUTUBE_API_KEY")
 SUPABASE_URL = get_env("SUPABASE_URL")
 SUPABASE_KEY = get_env("SUPABASE_KEY")
 
-# Debug Logging
-print("--- CONFIG DEBUG ---")
-print(f"OPENAI_API_KEY present: {bool(OPENAI_API_KEY)}")
-print(f"SUPABASE_URL present: {bool(SUPABASE_URL)}")
-if hasattr(st, "secrets"):
-    print(f"Secrets keys: {list(st.secrets.keys())}")
-else:
-    print("st.secrets not available")
-print("--------------------")
+def print_debug():
+    """
+    Prints which credentials were found (without their values).
+    """
+    print("--- CONFIG DEBUG ---")
+    print(f"OPENAI_API_KEY present: {bool(OPENAI_API_KEY)}")
+    print(f"SUPABASE_URL present: {bool(SUPABASE_URL)}")
+    print(f"Secrets keys: {list(get_secrets().keys())}")
+    print("--------------------")
+
+# Supabase: leads per bulk upsert, and how long the pipeline waits for more
+# leads before writing a partial batch.
+SUPABASE_BATCH_SIZE = 50
+SUPABASE_BATCH_LINGER_SECONDS = 1.0
 
 # Google Sheets
 GOOGLE_SHEETS_CREDENTIALS_FILE = get_env("GOOGLE_SHEETS_CREDENTIALS_FILE", "credentials.json")
 GOOGLE_SHEET_ID = get_env("GOOGLE_SHEET_ID")
 GOOGLE_SHEET_TAB_NAME = get_env("GOOGLE_SHEET_TAB_NAME", "Instantly")
+# Buffered writes: rows per append_rows call, max seconds a row waits, and
+# retries (with exponential backoff) on quota errors.
+SHEETS_FLUSH_ROWS = 20
+SHEETS_FLUSH_SECONDS = 30
 INSTANTLY_HEADERS = [
     "name",             # A
     "email",            # B
@@ -50,6 +95,43 @@ INSTANTLY_HEADERS = [
     "product name"      # M
 ]
 
+# Local state (channel index, caches, checkpoints)
+LOCAL_STATE_DIR = get_env("LOCAL_STATE_DIR", ".leadgen")
+CHANNEL_INDEX_PATH = os.path.join(LOCAL_STATE_DIR, "channel_index.sqlite3")
+SHEETS_SPOOL_PATH = os.path.join(LOCAL_STATE_DIR, "sheets_spool.jsonl")
+PENDING_ENRICHMENT_PATH = os.path.join(LOCAL_STATE_DIR, "pending_enrichment.sqlite3")
+LLM_BATCH_DIR = os.path.join(LOCAL_STATE_DIR, "batches")
+CHECKPOINT_PATH = os.path.join(LOCAL_STATE_DIR, "checkpoints.sqlite3")
+RUN_REPORT_DIR = os.path.join(LOCAL_STATE_DIR, "reports")
+
+# Run instrumentation (see metrics.py). Estimated USD per unit of each
+# cost counter; YouTube quota is free up to the daily limit. Set
+# METRICS_PORT to serve Prometheus text on http://localhost:<port>/metrics
+# (only on localhost unless METRICS_HOST is set, e.g. to 0.0.0.0).
+COST_RATES = {
+    "compute_units": 0.40,                      # Apify
+    "prompt_tokens": 0.15 / 1_000_000,          # gpt-4o-mini
+    "cached_prompt_tokens": -0.075 / 1_000_000, # discount on prompt_tokens
+    "completion_tokens": 0.60 / 1_000_000,
+    "batch_prompt_tokens": 0.075 / 1_000_000,   # Batch API: half price
+    "batch_completion_tokens": 0.30 / 1_000_000
+}
+METRICS_PORT = get_env("METRICS_PORT")
+METRICS_HOST = get_env("METRICS_HOST", "127.0.0.1")
+
+# Response cache for YouTube, Apify and OpenAI calls.
+# CACHE_MODE: "use" (read + write), "refresh" (write only), "bypass" (off)
+CACHE_PATH = os.path.join(LOCAL_STATE_DIR, "response_cache.sqlite3")
+CACHE_MODE = get_env("CACHE_MODE", "use")
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+CACHE_TTLS = {                          # seconds
+    "youtube_search": 3 * 24 * 3600,
+    "youtube_channels": 24 * 3600,
+    "youtube_videos": 12 * 3600,
+    "apify": 14 * 24 * 3600,
+    "openai": 30 * 24 * 3600
+}
+
 # Configuration
 SEARCH_KEYWORDS = [
     "amazon fba",
@@ -61,13 +143,155 @@ SEARCH_KEYWORDS = [
 
 ALLOWED_COUNTRIES = ["US", "UK", "CA", "DE", "AU"]
 
+# Emails containing any of these are treated as role addresses and skipped
+IGNORED_EMAIL_KEYWORDS = ['support', 'info', 'contact', 'help', 'sales']
+
 MIN_SUBSCRIBERS = 1000
 MAX_SUBSCRIBERS = 500000
 
+# Further channel filters (see channel_scoring.py); 0 / None turns one off.
+# The upload recency filter costs a batched latest-upload lookup per
+# details batch (1 quota unit per channel), reused for the lead.
+MIN_VIEWS_PER_VIDEO = 0
+MAX_DAYS_SINCE_UPLOAD = None
+
+# Channels that pass the filters get a priority score in [0, 1], the
+# weighted mean of these features (see channel_scoring.priority_scores).
+# With a PAID_STAGE_BUDGET (channels per run; None for no limit), the paid
+# stages (Apify, LLM) take channels highest score first: each details batch
+# is ordered, the best PRIORITY_WINDOW leftovers are held for the next one,
+# and held channels go ahead after PRIORITY_LINGER_SECONDS.
+PRIORITY_WEIGHTS = {
+    "subscribers": 1.0,
+    "views_per_video": 1.0,
+    "recency": 0.5,
+    "description_email": 0.5
+}
+PRIORITY_WINDOW = 10
+PRIORITY_LINGER_SECONDS = 2.0
+PAID_STAGE_BUDGET = None
+
 MAX_CHANNELS_PER_KEYWORD = 10
 
+# Paginated search: when set, keep fetching result pages (50 channels each)
+# for a keyword until this many channels pass the filters and dedup check.
+# None searches a single page of MAX_CHANNELS_PER_KEYWORD results.
+TARGET_QUALIFIED_PER_KEYWORD = None
+
+# YouTube quota units a run may spend before it stops searching (each
+# search page costs 100 units; the default daily quota is 10,000).
+YOUTUBE_QUOTA_BUDGET = 5000
+
+# Latest-upload lookups per batched YouTube request, and how long the pipeline
+# waits for more channels before sending a partial batch.
+YOUTUBE_BATCH_SIZE = 50
+YOUTUBE_BATCH_LINGER_SECONDS = 0.5
+
+# Concurrency
+# Channels that pass the country/subscriber filters are processed by a pool of
+# this many workers. Set to 1 to process channels one at a time.
+PIPELINE_WORKERS = 8
+
+# Background job runner used by the Streamlit app (see jobs.py): pipeline
+# runs executed at once (queued runs wait their turn), and finished jobs kept
+# for display.
+JOB_WORKERS = 1
+JOB_HISTORY = 20
+
+# Headless runs (see cli.py): keywords are queued in tasks of
+# WORK_CHUNK_SIZE keywords in a shared SQLite file that any number of
+# worker processes (or machines sharing the file) claim work from. A task
+# whose worker stops renewing its lease for WORK_LEASE_SECONDS is picked up
+# by another worker; it is given up after WORK_MAX_ATTEMPTS tries.
+WORK_QUEUE_PATH = os.path.join(LOCAL_STATE_DIR, "work_queue.sqlite3")
+WORK_CHUNK_SIZE = 5
+WORK_LEASE_SECONDS = 600
+WORK_MAX_ATTEMPTS = 3
+
+# Every channel the pipeline details is recorded in a local channel store
+# (see channel_store.py): its last-seen statistics, description hash,
+# latest upload and email outcome. REFRESH_MODE "incremental" skips the
+# paid steps for channels whose cheap signals did not change since then
+# (no subscriber-threshold crossing, new upload or edited description),
+# reusing their stored emails; "full" processes every channel. An
+# unchanged channel is still re-checked after REFRESH_MAX_AGE_DAYS.
+CHANNEL_STORE_PATH = os.path.join(LOCAL_STATE_DIR, "channel_store.sqlite3")
+REFRESH_MODE = get_env("REFRESH_MODE", "full")
+REFRESH_MAX_AGE_DAYS = 30
+
+# Maximum number of in-flight calls per external service.
+STAGE_CONCURRENCY = {
+    "youtube": 4,
+    "supabase": 4,
+    "apify": 5,
+    "openai": 4,
+    "sheets": 1
+}
+
+# Rate limits per provider (calls per second, burst), shared by every
+# client and run in the process; a 429 halves the rate until calls succeed
+# again. Throttled and transient errors (429, 5xx, timeouts) are retried
+# with exponential backoff and jitter, honouring Retry-After; after
+# CIRCUIT_FAILURE_THRESHOLD consecutive transient failures a provider's
+# calls fail fast for CIRCUIT_RESET_SECONDS.
+RATE_LIMITS = {
+    "youtube": {"rate": 10, "burst": 20},
+    "supabase": {"rate": 20, "burst": 40},
+    "apify": {"rate": 2, "burst": 5},
+    "openai": {"rate": 5, "burst": 10},
+    "sheets": {"rate": 1, "burst": 5}      # 60 write requests/minute per user
+}
+RETRY_MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 60
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+
+# HTTP transport (see transport.py): each provider's calls share one pool of
+# keep-alive connections per process, sized to its STAGE_CONCURRENCY plus
+# HTTP_POOL_HEADROOM. Idle connections are kept for HTTP_KEEPALIVE_SECONDS.
+# HTTP_TIMEOUTS are read timeouts in seconds; HTTP2 turns on HTTP/2 (needs
+# the h2 package) for providers whose servers speak it.
+HTTP_POOL_HEADROOM = 4
+HTTP_KEEPALIVE_SECONDS = 60
+HTTP_CONNECT_TIMEOUT_SECONDS = 10
+HTTP_TIMEOUTS = {
+    "youtube": 30,
+    "supabase": 30,
+    "apify": 360,                       # actor runs are waited for
+    "openai": 120,
+    "sheets": 60
+}
+HTTP2 = {
+    "supabase": True,
+    "openai": True
+}
+
+# LLM enrichment: channels are packed into one JSON-mode request per
+# batch, within these limits. Missing entries are re-requested.
+LLM_BATCH_MAX_CHANNELS = 10
+LLM_BATCH_MAX_INPUT_TOKENS = 8000
+LLM_BATCH_MAX_OUTPUT_TOKENS = 4000
+LLM_OUTPUT_TOKENS_PER_CHANNEL = 250
+LLM_BATCH_RETRIES = 2
+LLM_BATCH_LINGER_SECONDS = 1.0
+# Channel descriptions are shortened to about this many tokens before they
+# are sent (see llm_client.trim_description).
+LLM_DESCRIPTION_TOKEN_BUDGET = 150
+# Strict JSON schema responses (structured outputs). Turn off for
+# OpenAI-compatible endpoints that only support JSON mode.
+LLM_STRUCTURED_OUTPUTS = True
+
+# "sync" enriches during the run. "batch" parks leads as pending and submits
+# them through the OpenAI Batch API; resume_pending_enrichment() finishes them.
+LLM_ENRICHMENT_MODE = get_env("LLM_ENRICHMENT_MODE", "sync")
+
 # Apify Actor
 APIFY_ACTOR_ID = "exporter24~youtube-email-scraper" 
+# Channel URLs submitted per actor run, and how long the pipeline waits for
+# more channels before starting a partially filled run.
+APIFY_BATCH_SIZE = 25
+APIFY_BATCH_LINGER_SECONDS = 2.0
 # Note: The user provided a full run URL, but we might use the client or just the requests. 
 # The URL provided: https://api.apify.com/v2/acts/exporter24~youtube-email-scraper/run-sync-get-dataset-items?token=...
 # This suggests we can just hit this endpoint with the input.
@@ -1,19 +1,82 @@
-from apify_client import ApifyClient
+from batching import MicroBatcher
+from response_cache import make_key
+from rate_limit import guard
+from metrics import Metrics
 import config
+import transport
+import json
+import re
+import threading
+
+CHANNEL_ID_RE = re.compile(r"(UC[\w-]{22})")
+
+def _source_key(value):
+    """
+    Normalises a channel URL (or anything containing a channel ID) so dataset
+    items can be matched back to the URL they were scraped from.
+    """
+    if not isinstance(value, str):
+        return None
+    match = CHANNEL_ID_RE.search(value)
+    if match:
+        return match.group(1)
+    return value.strip().rstrip('/').lower()
+
+def extract_item_emails(item):
+    """
+    Collects emails from a dataset item's 'email' and 'emails' fields,
+    which the actor returns either as a string or a list.
+    """
+    emails = []
+    # Handle 'email' field
+    if 'email' in item and item['email']:
+        if isinstance(item['email'], str):
+            emails.append(item['email'])
+        elif isinstance(item['email'], list):
+            emails.extend([e for e in item['email'] if isinstance(e, str)])
+
+    # Handle 'emails' field
+    if 'emails' in item and item['emails']:
+        if isinstance(item['emails'], list):
+            emails.extend([e for e in item['emails'] if isinstance(e, str)])
+        elif isinstance(item['emails'], str):
+            emails.append(item['emails'])
+    return emails
 
 class ApifyEmailClient:
-    def __init__(self, token=None):
+    # Dataset item fields that may identify the channel an item belongs to
+    SOURCE_FIELDS = ("inputUrl", "url", "channelUrl", "channelId", "channel_id")
+
+    def __init__(self, token=None, cache=None, metrics=None):
         self.token = token if token else config.APIFY_API_TOKEN
-        self.client = ApifyClient(self.token)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.guard = guard("apify")
+        self.metrics = metrics if metrics is not None else Metrics()
         self.actor_id = config.APIFY_ACTOR_ID
+        self.batch_size = config.APIFY_BATCH_SIZE
+        self.cache = cache
 
-    def get_emails(self, channel_url):
+    def _connect(self):
+        return transport.apify_client(self.token)
+
+    @property
+    def client(self):
         """
-        Runs the Apify actor to find emails for a given channel URL.
+        The Apify SDK client, created (and apify_client imported) on first use.
         """
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._connect()
+            return self._client
+
+    def _build_input(self, channel_urls):
+        # Multi-URL runs rely on the actor reading every `startUrls` entry
+        # and tagging its items with the URL they came from (SOURCE_FIELDS);
+        # items it can't be matched on are retried one URL per run
         run_input = {
-            "url": channel_url,
-            "maxItems": 1,
+            "startUrls": [{"url": url} for url in channel_urls],
+            "maxItems": len(channel_urls),
             "extendOutputFunction": """($) => {
                 return {}
             }""",
@@ -21,33 +84,133 @@ class ApifyEmailClient:
                 "useApifyProxy": True
             }
         }
-        
+        if len(channel_urls) == 1:
+            # Single-URL input the actor has always been called with
+            run_input["url"] = channel_urls[0]
+        return run_input
+
+    def _item_source(self, item, sources):
+        for field in self.SOURCE_FIELDS:
+            key = _source_key(item.get(field))
+            if key in sources:
+                return sources[key]
+        return None
+
+    def iter_emails(self, channel_urls):
+        """
+        Runs the Apify actor over many channel URLs, using one actor run per
+        `batch_size` URLs. Yields (channel_url, emails) for every input URL
+        as soon as its actor run has finished, with [] when nothing was found
+        and None when the run failed (so callers can tell the two apart).
+        """
+        channel_urls = list(dict.fromkeys(channel_urls))
+
+        if self.cache is not None:
+            uncached = []
+            for url in channel_urls:
+                cached = self.cache.get("apify", make_key(self.actor_id, url))
+                if cached is None:
+                    uncached.append(url)
+                else:
+                    yield url, cached
+            channel_urls = uncached
+
+        for start in range(0, len(channel_urls), self.batch_size):
+            batch = channel_urls[start:start + self.batch_size]
+            found, unmatched = self._run_batch(batch)
+            if unmatched:
+                # Items the actor did not tag with their channel: retry the
+                # channels that got no items, one URL per run
+                missing = [url for url in batch if url not in found]
+                print(f"⚠️ Apify: {unmatched} dataset items matched no channel URL;"
+                      f" retrying {len(missing)} channels one per run")
+                for url in missing:
+                    single, _ = self._run_batch([url])
+                    if single is not None and url in single:
+                        found[url] = single[url]
+
+            for url in batch:
+                # Deduplicate
+                emails = list(set(found.get(url, []))) if found is not None else None
+                # Failed runs are not cached so the next run retries them
+                if found is not None and self.cache is not None:
+                    self.cache.set("apify", make_key(self.actor_id, url), emails)
+                yield url, emails
+
+    def _run_batch(self, batch):
+        """
+        Runs the actor once over `batch`. Returns ({channel_url: [emails]}
+        for the URLs dataset items were matched to, number of items matched
+        to no URL), or (None, 0) when the run failed.
+        """
+        sources = {_source_key(url): url for url in batch}
+        found = {}
+        unmatched = 0
         try:
-            # Run the actor and wait for it to finish
-            run = self.client.actor(self.actor_id).call(run_input=run_input)
-            
-            # Fetch results from the dataset
-            dataset_items = self.client.dataset(run["defaultDatasetId"]).list_items().items
-            
-            emails = []
-            for item in dataset_items:
-                # Handle 'email' field
-                if 'email' in item and item['email']:
-                    if isinstance(item['email'], str):
-                        emails.append(item['email'])
-                    elif isinstance(item['email'], list):
-                        emails.extend([e for e in item['email'] if isinstance(e, str)])
-
-                # Handle 'emails' field
-                if 'emails' in item and item['emails']:
-                    if isinstance(item['emails'], list):
-                        emails.extend([e for e in item['emails'] if isinstance(e, str)])
-                    elif isinstance(item['emails'], str):
-                         emails.append(item['emails'])
-            
-            # Deduplicate
-            return list(set(emails))
-            
+            # Start the actor, then wait for that run to finish. Only the
+            # start is retried as a whole: retrying a failed wait starts
+            # nothing new, while retrying a start would pay for a second run
+            with self.metrics.measure("apify.run") as sample:
+                started = self.guard.call(self.client.actor(self.actor_id).start, run_input=self._build_input(batch))
+                run = self.guard.call(self.client.run(started.id).wait_for_finish)
+                if run is None or run.status != "SUCCEEDED":
+                    raise RuntimeError(f"actor run {started.id} ended {run.status if run else 'unknown'}")
+                # apify-client 3.x returns a Run model (see requirements.txt)
+                sample["compute_units"] += (run.stats.compute_units if run.stats else None) or 0
+
+            # Read the run's results from the dataset
+            dataset = self.client.dataset(run.default_dataset_id)
+            with self.metrics.measure("apify.dataset") as sample:
+                items = self.guard.call(lambda: list(dataset.iterate_items()))
+                sample["bytes"] += len(json.dumps(items, default=str))
+            for item in items:
+                source = self._item_source(item, sources)
+                if source is None and len(batch) == 1:
+                    source = batch[0]
+                if source is None:
+                    unmatched += 1
+                else:
+                    found.setdefault(source, []).extend(extract_item_emails(item))
+
         except Exception as e:
             print(f"Apify error: {e}")
-            return []
+            return None, 0
+        return found, unmatched
+
+    def get_emails_batch(self, channel_urls):
+        """
+        Returns {channel_url: [emails]} for many channel URLs, with None for
+        the URLs whose actor run failed.
+        """
+        return dict(self.iter_emails(channel_urls))
+
+    def get_emails(self, channel_url):
+        """
+        Runs the Apify actor to find emails for a given channel URL. Returns
+        None when the run failed.
+        """
+        return self.get_emails_batch([channel_url]).get(channel_url)
+
+class ApifyEmailBatcher(MicroBatcher):
+    """
+    Coalesces concurrent get_emails() calls from pipeline workers into shared
+    actor runs (see MicroBatcher).
+    """
+    def __init__(self, client, max_batch=None, linger=None, limit=None):
+        super().__init__(
+            self._fetch,
+            max_batch=max_batch or client.batch_size,
+            linger=config.APIFY_BATCH_LINGER_SECONDS if linger is None else linger,
+            limit=limit,
+            # A failed batch is not "no emails" (see iter_emails)
+            default=None,
+            name="Apify"
+        )
+        self.client = client
+
+    def _fetch(self, channel_urls):
+        found = self.client.get_emails_batch(channel_urls)
+        return [found.get(url) for url in channel_urls]
+
+    def get_emails(self, channel_url):
+        return self.submit(channel_url)
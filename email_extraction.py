@@ -0,0 +1,59 @@
+import re
+import config
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._%+-]*@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+
+# Common ways creators hide their address from scrapers:
+#   name [at] domain [dot] com, name (at) domain (dot) com,
+#   name AT domain DOT com, name @ domain . com, name＠domain．com
+BRACKETED_AT_RE = re.compile(r"\s*[\[\(\{<]\s*(?:at|@)\s*[\]\)\}>]\s*", re.IGNORECASE)
+BRACKETED_DOT_RE = re.compile(r"\s*[\[\(\{<]\s*(?:dot|\.)\s*[\]\)\}>]\s*", re.IGNORECASE)
+# Spelled-out "at"/"dot" also occurs in normal prose, so that form is only
+# accepted when it ends in a common top-level domain.
+COMMON_TLDS = "com|net|org|io|co|uk|us|ca|au|de|me|info|biz|tv|ai|app|dev|agency|email"
+SPELLED_RE = re.compile(
+    r"\b([A-Za-z0-9][A-Za-z0-9._%+-]*)\s+at\s+((?:[A-Za-z0-9-]+\s+dot\s+)+(?:" + COMMON_TLDS + r"))\b",
+    re.IGNORECASE
+)
+SPACED_RE = re.compile(r"([A-Za-z0-9._%+-]+)\s+@\s+([A-Za-z0-9-]+(?:\s*\.\s*[A-Za-z0-9-]+)+)")
+
+def _deobfuscate(text):
+    text = text.replace("＠", "@").replace("．", ".")
+    text = BRACKETED_AT_RE.sub("@", text)
+    text = BRACKETED_DOT_RE.sub(".", text)
+    text = SPELLED_RE.sub(
+        lambda m: m.group(1) + "@" + re.sub(r"\s+dot\s+", ".", m.group(2), flags=re.IGNORECASE),
+        text
+    )
+    text = SPACED_RE.sub(lambda m: m.group(1) + "@" + re.sub(r"\s+", "", m.group(2)), text)
+    return text
+
+def extract_emails(text):
+    """
+    Finds plain and lightly obfuscated email addresses in free text.
+    Returns them lower-cased, deduplicated, in order of appearance.
+    """
+    if not text:
+        return []
+    emails = []
+    for match in EMAIL_RE.findall(_deobfuscate(text)):
+        email = match.strip(".").lower()
+        if email not in emails:
+            emails.append(email)
+    return emails
+
+def channel_text(channel):
+    """
+    Collects the free-text fields of a Channel record (see records.py) that
+    may mention a contact address: the description and the branding
+    description.
+    """
+    parts = [channel.description, channel.branding_description]
+    return "\n".join(p for p in parts if p)
+
+def filter_personal_emails(emails, ignored_keywords=None):
+    """
+    Drops role addresses (support@, info@, ...) that rarely reach the creator.
+    """
+    ignored_keywords = config.IGNORED_EMAIL_KEYWORDS if ignored_keywords is None else ignored_keywords
+    return [e for e in emails if not any(k in e.lower() for k in ignored_keywords)]
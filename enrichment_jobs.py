@@ -0,0 +1,96 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+class PendingEnrichmentStore:
+    """
+    Durable local store for leads waiting on an offline (Batch API)
+    enrichment. A lead is added when its email is found, tagged with a
+    batch ID once submitted, and removed after it has been saved.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " channel_id TEXT PRIMARY KEY,"
+            " lead TEXT NOT NULL,"
+            " item TEXT NOT NULL,"
+            " batch_id TEXT,"
+            " created TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def __contains__(self, channel_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM pending WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def add(self, channel_id, lead_data, item):
+        """
+        Stores a lead and its enrichment request item (key, channel_data,
+        video_title) until the enrichment comes back.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending (channel_id, lead, item, batch_id, created)"
+                " VALUES (?, ?, ?, NULL, ?)",
+                (channel_id, json.dumps(lead_data), json.dumps(item), str(datetime.datetime.now()))
+            )
+            self._conn.commit()
+
+    def unsubmitted(self):
+        """
+        Returns [(channel_id, item)] for leads not yet part of a batch.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel_id, item FROM pending WHERE batch_id IS NULL ORDER BY created"
+            ).fetchall()
+        return [(channel_id, json.loads(item)) for channel_id, item in rows]
+
+    def mark_submitted(self, channel_ids, batch_id):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE pending SET batch_id = ? WHERE channel_id = ?",
+                [(batch_id, channel_id) for channel_id in channel_ids]
+            )
+            self._conn.commit()
+
+    def batches(self):
+        """
+        Returns {batch_id: [(channel_id, lead_data, item)]} for submitted leads.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT batch_id, channel_id, lead, item FROM pending"
+                " WHERE batch_id IS NOT NULL ORDER BY created"
+            ).fetchall()
+        batches = {}
+        for batch_id, channel_id, lead, item in rows:
+            batches.setdefault(batch_id, []).append((channel_id, json.loads(lead), json.loads(item)))
+        return batches
+
+    def remove(self, channel_ids):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM pending WHERE channel_id = ?",
+                [(channel_id,) for channel_id in channel_ids]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
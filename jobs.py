@@ -0,0 +1,160 @@
+"""
+Background job runner for pipeline runs.
+
+The Streamlit app submits runs here instead of calling run_pipeline in its
+script thread, so a long run neither blocks the page nor dies with it: jobs
+live in a process-wide runner, queue up behind each other, and expose their
+progress as an append-only log plus live per-stage counters that the page
+polls.
+"""
+import datetime
+import itertools
+import queue
+import threading
+import traceback
+import config
+import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+class Job:
+    """
+    One pipeline run: its overrides, status, log lines and (once finished)
+    result. Safe to read from any thread while it runs.
+    """
+    def __init__(self, job_id, overrides, label=None):
+        self.id = job_id
+        self.overrides = dict(overrides)
+        self.label = label or ", ".join(self.overrides.get("keywords") or [])[:80]
+        self.status = QUEUED
+        self.created = datetime.datetime.now()
+        self.started = None
+        self.finished = None
+        self.total = None
+        self.report = None
+        self.error = None
+        self.metrics = metrics.Metrics()
+        self._lines = []
+        self._lock = threading.Lock()
+
+    def log(self, message):
+        with self._lock:
+            self._lines.extend(str(message).split("\n"))
+
+    def lines_since(self, offset):
+        """
+        Returns (new_lines, next_offset): the log lines appended after the
+        first `offset` ones.
+        """
+        with self._lock:
+            return self._lines[offset:], len(self._lines)
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def stage_counters(self):
+        """
+        Returns {stage: {"calls", "errors", "p95_ms"}} for the calls made so far.
+        """
+        if self.status == QUEUED:
+            return {}
+        return {
+            stage: {"calls": stats["calls"], "errors": stats["errors"], "p95_ms": stats["p95_ms"]}
+            for stage, stats in self.metrics.report()["stages"].items()
+        }
+
+class JobRunner:
+    """
+    Runs submitted pipeline jobs on `workers` daemon threads, in submission
+    order. Keeps the last `history` finished jobs around.
+    Usage:
+        runner = JobRunner()
+        job = runner.submit({"keywords": ["amazon fba"]})
+        new_lines, offset = job.lines_since(offset)
+    """
+    def __init__(self, workers=None, history=None, run=None):
+        self.history = history or config.JOB_HISTORY
+        self._run = run
+        self._queue = queue.Queue()
+        self._jobs = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        for _ in range(max(1, int(workers or config.JOB_WORKERS))):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, overrides, label=None):
+        with self._lock:
+            job = Job(next(self._ids), overrides, label)
+            self._jobs.append(job)
+            self._prune()
+        self._queue.put(job)
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job. Returns False if it already started (a running
+        job can be resumed later from its Run ID instead).
+        """
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id and job.status == QUEUED:
+                    job.status = CANCELLED
+                    return True
+        return False
+
+    def jobs(self):
+        """
+        Returns every kept job, newest first.
+        """
+        with self._lock:
+            return list(reversed(self._jobs))
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def _prune(self):
+        finished = [job for job in self._jobs if not job.active]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            self._jobs.remove(job)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status == CANCELLED:
+                    continue
+                job.status = RUNNING
+                job.started = datetime.datetime.now()
+            self._execute(job)
+            with self._lock:
+                job.finished = datetime.datetime.now()
+                self._prune()
+
+    def _execute(self, job):
+        run = self._run
+        if run is None:
+            from pipeline import run_pipeline
+            run = run_pipeline
+        reports = []
+        try:
+            job.total = run(
+                config_overrides=job.overrides,
+                status_callback=job.log,
+                report_callback=reports.append,
+                run_metrics=job.metrics
+            )
+            job.report = reports[0] if reports else None
+            job.status = DONE
+        except Exception as e:
+            job.error = f"{e}\n{traceback.format_exc()}"
+            job.log(f"❌ Job failed: {e}")
+            job.status = FAILED
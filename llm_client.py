@@ -1,62 +1,422 @@
-from openai import OpenAI
+from response_cache import make_key
+from rate_limit import guard
+from metrics import Metrics
 import config
+import transport
+import datetime
 import json
+import os
+import re
+import threading
+
+# Fields every enrichment must contain
+ENRICHMENT_FIELDS = [
+    "contact_name",
+    "contact_name_confidence",
+    "product_type",
+    "product_description",
+    "product_name",
+    "last_video_paraphrase",
+    "channel_description_short"
+]
+
+# Product types the model may choose from
+PRODUCT_TYPES = [
+    "coaching", "consulting", "agency", "online course", "community",
+    "software", "physical product", "mixed", "unknown"
+]
+
+# Static instructions, identical in every request and sent first (as the
+# system message), so the provider can cache the prompt prefix; only the
+# channel blocks in the user message vary. OpenAI caches prefixes of 1024
+# tokens or more.
+SYSTEM_PROMPT = f"""
+You are an expert lead researcher. You receive one or more YouTube channels, each under a "### Channel <key>" header with its title, custom URL, a (possibly shortened) description and its latest video title.
+
+For every channel, return one entry in "channels" with its key and:
+- contact_name: the likely real first and last name of the creator. If unknown, guess from the channel name, or return "Unknown".
+- contact_name_confidence: High, Medium or Low.
+- product_type: the product or offer they sell, one of: {", ".join(PRODUCT_TYPES)}.
+- product_description: a short description of that product or offer ("" if none).
+- product_name: a short name that fits the sentence "I also checked out your [product name], good stuff." If the product is complex or mixed, return "offer".
+- last_video_paraphrase: the main topic of the latest video, completing the sentence "got your video about ...". Example: "AI agents" or "your trip to Japan". Do not include "I watched..." or a full sentence.
+- channel_description_short: a one-sentence summary of the channel description.
+
+Return exactly one entry per channel, with the key from its header.
+""".strip()
+
+# Structured output schema: responses that do not match are rejected by
+# the API instead of being parsed into the "Unknown" fallback.
+ENRICHMENT_SCHEMA = {
+    "name": "channel_enrichments",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["channels"],
+        "properties": {
+            "channels": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["key"] + ENRICHMENT_FIELDS,
+                    "properties": {
+                        "key": {"type": "string"},
+                        "contact_name": {"type": "string"},
+                        "contact_name_confidence": {"type": "string", "enum": ["High", "Medium", "Low"]},
+                        "product_type": {"type": "string", "enum": PRODUCT_TYPES},
+                        "product_description": {"type": "string"},
+                        "product_name": {"type": "string"},
+                        "last_video_paraphrase": {"type": "string"},
+                        "channel_description_short": {"type": "string"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+# Noise dropped from descriptions before they are trimmed to their budget
+URL_RE = re.compile(r"https?://\S+|www\.\S+")
+HASHTAG_LINE_RE = re.compile(r"^(?:\s*#\w+)+\s*$")
+
+def estimate_tokens(text):
+    """
+    Rough token count (about 4 characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+def trim_description(text, max_tokens):
+    """
+    Shortens a channel description to about `max_tokens` tokens: links,
+    hashtag lines and repeated lines are dropped, then the text is cut at
+    the last sentence (or word) boundary within the budget.
+    """
+    lines = []
+    for line in (text or "").splitlines():
+        line = " ".join(URL_RE.sub("", line).split())
+        if line and not HASHTAG_LINE_RE.match(line) and line not in lines:
+            lines.append(line)
+    text = "\n".join(lines)
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "), cut.rfind("\n"))
+    if boundary < max_chars // 2:
+        boundary = cut.rfind(" ")
+    if boundary <= 0:
+        boundary = max_chars - 1
+    return cut[:boundary + 1].rstrip() + " …"
+
+def default_enrichment():
+    return {
+        "contact_name": "Unknown",
+        "contact_name_confidence": "Low",
+        "product_type": "unknown",
+        "product_description": "",
+        "last_video_paraphrase": "",
+        "channel_description_short": ""
+    }
 
 class LLMClient:
-    def __init__(self):
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
+    def __init__(self, cache=None, metrics=None):
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.guard = guard("openai")
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.model = "gpt-4o-mini"
+        self.cache = cache
+        # Token counts of every chat request, and of the descriptions before
+        # and after trimming (see token_summary)
+        self._tokens_lock = threading.Lock()
+        self.calls = []
+        self.description_tokens = {"original": 0, "sent": 0}
 
-    def enrich_lead(self, channel_data, video_title):
+    def _connect(self):
+        from openai import OpenAI
+        # OPENAI_BASE_URL can point at a local stand-in (see standins/)
+        # Retries are handled by the shared guard (see rate_limit.py)
+        return OpenAI(
+            api_key=config.OPENAI_API_KEY,
+            base_url=config.OPENAI_BASE_URL,
+            max_retries=0,
+            http_client=transport.httpx_client("openai")
+        )
+
+    @property
+    def client(self):
         """
-        Uses LLM to extract name, product info, and paraphrase video title.
+        The OpenAI SDK client, created (and openai imported) on first use.
+        """
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._connect()
+            return self._client
+
+    def _channel_block(self, key, channel_data, video_title):
+        description = channel_data.get('description') or ""
+        trimmed = trim_description(description, config.LLM_DESCRIPTION_TOKEN_BUDGET)
+        with self._tokens_lock:
+            self.description_tokens["original"] += estimate_tokens(description)
+            self.description_tokens["sent"] += estimate_tokens(trimmed)
+        return (
+            f"### Channel {key}\n"
+            f"Channel Title: {channel_data.get('title')}\n"
+            f"Custom URL: {channel_data.get('customUrl')}\n"
+            f"Latest Video Title: {video_title}\n"
+            f"Description: {trimmed}\n"
+        )
+
+    def pack_requests(self, blocks):
+        """
+        Groups (key, block) pairs into requests that stay within the input
+        token budget, the expected output size and the channels-per-request
+        cap. A block too large to share a request is sent on its own.
+        """
+        base = estimate_tokens(SYSTEM_PROMPT)
+        max_channels = min(
+            config.LLM_BATCH_MAX_CHANNELS,
+            max(1, config.LLM_BATCH_MAX_OUTPUT_TOKENS // config.LLM_OUTPUT_TOKENS_PER_CHANNEL)
+        )
+        requests, current, used = [], [], base
+        for key, block in blocks:
+            tokens = estimate_tokens(block)
+            if current and (used + tokens > config.LLM_BATCH_MAX_INPUT_TOKENS or len(current) >= max_channels):
+                requests.append(current)
+                current, used = [], base
+            current.append((key, block))
+            used += tokens
+        if current:
+            requests.append(current)
+        return requests
+
+    def _request_body(self, packed):
+        if config.LLM_STRUCTURED_OUTPUTS:
+            response_format = {"type": "json_schema", "json_schema": ENRICHMENT_SCHEMA}
+        else:
+            response_format = {"type": "json_object"}
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": "\n".join(block for _, block in packed)}
+            ],
+            "response_format": response_format,
+            "max_tokens": config.LLM_OUTPUT_TOKENS_PER_CHANNEL * len(packed) + 100
+        }
+
+    def _parse_entries(self, content, keys):
+        """
+        Returns {key: enrichment} for the requested keys that are present and
+        complete in a JSON response; missing or malformed ones are left out.
+        Reads the structured output shape ({"channels": [{"key", ...}]}) and
+        the older JSON-mode shape keyed by channel ({key: {...}}), which
+        batches submitted before the switch still return.
         """
-        
-        prompt = f"""
-        You are an expert lead researcher. Analyze the following YouTube channel data and the latest video title.
-        
-        Channel Title: {channel_data.get('title')}
-        Description: {channel_data.get('description')}
-        Custom URL: {channel_data.get('customUrl')}
-        Latest Video Title: {video_title}
-        
-        Task 1: Extract the likely real name of the creator. If unknown, guess based on channel name or return "Unknown".
-        Task 2: Detect the product or offer they sell. Choose from: coaching, consulting, agency, online course, community, software, physical product, mixed, unknown. Also provide a short description.
-        Task 3: Extract the main topic of the video to complete the sentence 'got your video about...'. Example: 'AI agents' or 'your trip to Japan'. Do not include 'I watched...' or the full sentence.
-        Task 4: Summarize the channel description into a short blurb.
-        Task 5: Extract a short 'product name' that fits into the sentence: 'I also checked out your [Product name], good stuff.' If the product is complex or mixed, just return 'offer'.
-        
-        Return JSON format:
-        {{
-            "contact_name": "Name",
-            "contact_name_confidence": "High/Medium/Low",
-            "product_type": "Type",
-            "product_description": "Description",
-            "product_name": "Product Name",
-            "last_video_paraphrase": "Paraphrase",
-            "channel_description_short": "Summary"
-        }}
-        """
-        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            return json.loads(content)
-            
-        except Exception as e:
+            content = json.loads(content)
+        except (TypeError, ValueError) as e:
             print(f"LLM error: {e}")
-            return {
-                "contact_name": "Unknown",
-                "contact_name_confidence": "Low",
-                "product_type": "unknown",
-                "product_description": "",
-                "last_video_paraphrase": "",
-                "channel_description_short": ""
+            return {}
+        if not isinstance(content, dict):
+            return {}
+        if isinstance(content.get("channels"), list):
+            content = {
+                str(entry.get("key")): entry
+                for entry in content["channels"] if isinstance(entry, dict)
             }
+        results = {}
+        for key in keys:
+            entry = content.get(key)
+            if isinstance(entry, dict) and all(field in entry for field in ENRICHMENT_FIELDS):
+                results[key] = {field: entry[field] for field in ENRICHMENT_FIELDS}
+        return results
+
+    def _record_usage(self, sample, usage, channels):
+        """
+        Adds a response's token counts to the metrics sample and the
+        per-call log.
+        """
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        if isinstance(details, dict):
+            cached = details.get("cached_tokens") or 0
+        else:
+            cached = getattr(details, "cached_tokens", 0) or 0
+        sample["prompt_tokens"] += prompt
+        sample["cached_prompt_tokens"] += cached
+        sample["completion_tokens"] += completion
+        with self._tokens_lock:
+            self.calls.append({
+                "channels": channels,
+                "prompt_tokens": prompt,
+                "cached_prompt_tokens": cached,
+                "completion_tokens": completion
+            })
+
+    def token_summary(self):
+        """
+        Returns the token counts of the chat requests made so far: totals,
+        averages per call and per channel, and the estimated description
+        tokens before and after trimming.
+        """
+        with self._tokens_lock:
+            calls = list(self.calls)
+            descriptions = dict(self.description_tokens)
+        channels = sum(call["channels"] for call in calls)
+        summary = {"calls": len(calls), "channels": channels, "descriptions": descriptions}
+        for field in ("prompt_tokens", "cached_prompt_tokens", "completion_tokens"):
+            total = sum(call[field] for call in calls)
+            summary[field] = total
+            summary[f"{field}_per_call"] = round(total / len(calls), 1) if calls else 0.0
+            summary[f"{field}_per_channel"] = round(total / channels, 1) if channels else 0.0
+        return summary
+
+    def _request(self, packed):
+        """
+        Sends one batched request. Returns {key: enrichment} for the entries
+        that came back complete.
+        """
+        try:
+            with self.metrics.measure("openai.chat") as sample:
+                response = self.guard.call(self.client.chat.completions.create, **self._request_body(packed))
+                message = response.choices[0].message
+                content = message.content
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    self._record_usage(sample, usage, len(packed))
+                sample["bytes"] += len(content or "")
+        except Exception as e:
+            print(f"LLM error: {e}")
+            return {}
+        if getattr(message, "refusal", None):
+            print(f"LLM refusal: {message.refusal}")
+            return {}
+        return self._parse_entries(content, [key for key, _ in packed])
+
+    def enrich_leads(self, items):
+        """
+        Enriches many channels with as few requests as possible.
+        `items` is a list of (key, channel_data, video_title), where key is
+        usually the channel ID. Channels missing from a response (or returned
+        malformed) are re-requested up to LLM_BATCH_RETRIES times, then get
+        the "Unknown" fallback. Returns enrichments aligned with `items`.
+        """
+        results = {}
+        blocks = []
+        cache_keys = {}
+        queued = set()
+        for key, channel_data, video_title in items:
+            key = str(key)
+            block = self._channel_block(key, channel_data, video_title)
+            cache_keys[key] = make_key(self.model, SYSTEM_PROMPT, block)
+            cached = self.cache.get("openai", cache_keys[key]) if self.cache is not None else None
+            if cached is not None:
+                results[key] = cached
+            elif key not in queued:
+                queued.add(key)
+                blocks.append((key, block))
+
+        for attempt in range(config.LLM_BATCH_RETRIES + 1):
+            if not blocks:
+                break
+            for packed in self.pack_requests(blocks):
+                for key, enrichment in self._request(packed).items():
+                    results[key] = enrichment
+                    if self.cache is not None:
+                        self.cache.set("openai", cache_keys[key], enrichment)
+            blocks = [(key, block) for key, block in blocks if key not in results]
+            if blocks and attempt < config.LLM_BATCH_RETRIES:
+                print(f"LLM: re-requesting {len(blocks)} missing enrichments")
+
+        return [results.get(str(key)) or default_enrichment() for key, _, _ in items]
+
+    def enrich_lead(self, channel_data, video_title):
+        """
+        Uses LLM to extract name, product info, and paraphrase video title.
+        """
+        return self.enrich_leads([("channel", channel_data, video_title)])[0]
+
+    # Offline enrichment through the OpenAI Batch API (results within 24h,
+    # at a lower price and outside the synchronous rate limits)
+
+    def write_batch_file(self, items, path):
+        """
+        Writes Batch API request lines for `items` (key, channel_data,
+        video_title) to a JSONL file, one line per packed request.
+        """
+        blocks = [
+            (str(key), self._channel_block(str(key), channel_data, video_title))
+            for key, channel_data, video_title in items
+        ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for i, packed in enumerate(self.pack_requests(blocks)):
+                f.write(json.dumps({
+                    "custom_id": f"enrich-{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._request_body(packed)
+                }) + "\n")
+        return path
+
+    def submit_batch(self, items):
+        """
+        Uploads the request file for `items` and starts a batch.
+        Returns the batch ID.
+        """
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = self.write_batch_file(items, os.path.join(config.LLM_BATCH_DIR, f"enrichment-{stamp}.jsonl"))
+
+        def upload():
+            # Reopened on every attempt so a retry sends the whole file
+            with open(path, "rb") as f:
+                return self.client.files.create(file=f, purpose="batch")
+
+        with self.metrics.measure("openai.batch_submit") as sample:
+            uploaded = self.guard.call(upload)
+            batch = self.guard.call(
+                self.client.batches.create,
+                input_file_id=uploaded.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            sample["bytes"] += os.path.getsize(path)
+        return batch.id
+
+    def get_batch(self, batch_id):
+        with self.metrics.measure("openai.batch_poll"):
+            return self.guard.call(self.client.batches.retrieve, batch_id)
+
+    def batch_results(self, batch, keys):
+        """
+        Reads a finished batch's output file. Returns {key: enrichment} for
+        the requested keys that came back complete.
+        """
+        keys = [str(key) for key in keys]
+        results = {}
+        if not getattr(batch, "output_file_id", None):
+            return results
+        with self.metrics.measure("openai.batch_results") as sample:
+            text = self.guard.call(self.client.files.content, batch.output_file_id).text
+            sample["bytes"] += len(text)
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    body = record["response"]["body"]
+                    content = body["choices"][0]["message"]["content"]
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    print(f"LLM batch error: {e}")
+                    continue
+                usage = body.get("usage") or {}
+                sample["batch_prompt_tokens"] += usage.get("prompt_tokens", 0)
+                sample["batch_completion_tokens"] += usage.get("completion_tokens", 0)
+                results.update(self._parse_entries(content, keys))
+        return results
@@ -0,0 +1,222 @@
+"""
+Latency and cost instrumentation for external calls.
+
+Clients wrap every external call in `metrics.measure(operation)` and add
+what the call cost to the yielded sample (bytes received, or sent for
+writes; YouTube quota units, Apify compute units, OpenAI tokens). A run's Metrics aggregates them per
+operation and per pipeline stage into a JSON run report and Prometheus
+text exposition.
+"""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import datetime
+import json
+import os
+import threading
+import time
+import config
+
+# Pipeline stage each instrumented operation belongs to
+STAGE_OF = {
+    "youtube.search": "search",
+    "youtube.channels": "details",
+    "supabase.check": "dedup",
+    "supabase.index": "dedup",
+    "apify.run": "email",
+    "apify.dataset": "email",
+    "youtube.videos": "enrich",
+    "openai.chat": "enrich",
+    "openai.batch_submit": "enrich",
+    "openai.batch_poll": "enrich",
+    "openai.batch_results": "enrich",
+    "supabase.save": "sink",
+    "sheets.append": "sink",
+    "sheets.open": "sink"
+}
+
+# Cost counters a sample may carry (besides "bytes" and "usd")
+COST_FIELDS = (
+    "quota_units",
+    "compute_units",
+    "prompt_tokens",
+    "cached_prompt_tokens",
+    "completion_tokens",
+    "batch_prompt_tokens",
+    "batch_completion_tokens"
+)
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+class Metrics:
+    """
+    Thread-safe collector for one run.
+    Usage:
+        with metrics.measure("openai.chat") as sample:
+            response = ...
+            sample["prompt_tokens"] += response.usage.prompt_tokens
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops = {}
+        self.started = time.time()
+
+    def _new_op(self):
+        op = {"calls": 0, "errors": 0, "latencies": [], "bytes": 0, "usd": 0.0}
+        op.update({field: 0 for field in COST_FIELDS})
+        return op
+
+    def _op(self, operation):
+        if operation not in self._ops:
+            self._ops[operation] = self._new_op()
+        return self._ops[operation]
+
+    def record(self, operation, seconds, error=False, **sample):
+        with self._lock:
+            op = self._op(operation)
+            op["calls"] += 1
+            op["errors"] += 1 if error else 0
+            op["latencies"].append(seconds)
+            for field, value in sample.items():
+                if field in op and value:
+                    op[field] += value
+
+    @contextmanager
+    def measure(self, operation):
+        sample = {"bytes": 0, "usd": 0.0}
+        sample.update({field: 0 for field in COST_FIELDS})
+        start = time.perf_counter()
+        error = False
+        try:
+            yield sample
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(operation, time.perf_counter() - start, error, **sample)
+
+    def _summarise(self, op):
+        summary = {
+            "calls": op["calls"],
+            "errors": op["errors"],
+            "p50_ms": round(percentile(op["latencies"], 50) * 1000, 1),
+            "p95_ms": round(percentile(op["latencies"], 95) * 1000, 1),
+            "total_seconds": round(sum(op["latencies"]), 3),
+            "bytes": op["bytes"]
+        }
+        for field in COST_FIELDS:
+            summary[field] = op[field]
+        usd = op["usd"] + sum(op[field] * config.COST_RATES.get(field, 0) for field in COST_FIELDS)
+        summary["cost_usd"] = round(usd, 6)
+        return summary
+
+    def report(self):
+        """
+        Returns {"operations": {...}, "stages": {...}, "totals": {...}}.
+        Stage rows pool the latencies of their operations.
+        """
+        with self._lock:
+            operations = {name: self._summarise(op) for name, op in sorted(self._ops.items())}
+            pooled = {}
+            for name, op in self._ops.items():
+                stage = pooled.setdefault(STAGE_OF.get(name, name.split(".")[0]), self._new_op())
+                stage["calls"] += op["calls"]
+                stage["errors"] += op["errors"]
+                stage["latencies"].extend(op["latencies"])
+                for field in ("bytes", "usd") + COST_FIELDS:
+                    stage[field] += op[field]
+            stages = {name: self._summarise(op) for name, op in pooled.items()}
+
+        totals = {"calls": 0, "errors": 0, "bytes": 0, "cost_usd": 0.0}
+        totals.update({field: 0 for field in COST_FIELDS})
+        for stage in stages.values():
+            for field in totals:
+                totals[field] += stage[field]
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        return {"operations": operations, "stages": stages, "totals": totals}
+
+    def prometheus(self):
+        """
+        Returns the per-operation metrics in Prometheus text format.
+        """
+        operations = self.report()["operations"]
+        lines = []
+
+        def family(name, kind, help_text, field, scale=1):
+            lines.append(f"# HELP leadgen_{name} {help_text}")
+            lines.append(f"# TYPE leadgen_{name} {kind}")
+            for operation, summary in operations.items():
+                stage = STAGE_OF.get(operation, operation.split(".")[0])
+                labels = f'operation="{operation}",stage="{stage}"'
+                lines.append(f"leadgen_{name}{{{labels}}} {summary[field] * scale}")
+
+        family("calls_total", "counter", "External calls made.", "calls")
+        family("errors_total", "counter", "External calls that raised.", "errors")
+        family("latency_p50_seconds", "gauge", "Median call latency.", "p50_ms", 0.001)
+        family("latency_p95_seconds", "gauge", "95th percentile call latency.", "p95_ms", 0.001)
+        family("bytes_total", "counter", "Bytes received (sent, for writes).", "bytes")
+        for field in COST_FIELDS:
+            family(f"{field}_total", "counter", f"{field.replace('_', ' ').capitalize()} used.", field)
+        family("cost_usd_total", "counter", "Estimated cost in USD.", "cost_usd")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path, **extra):
+        """
+        Writes the run report (plus `extra` fields such as run_id and leads)
+        as JSON. Returns the report dict.
+        """
+        report = dict(extra)
+        report["started"] = str(datetime.datetime.fromtimestamp(self.started))
+        report["finished"] = str(datetime.datetime.now())
+        report["duration_seconds"] = round(time.time() - self.started, 3)
+        report.update(self.report())
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+# Prometheus endpoint: serves the metrics of the run in progress (or the
+# last one) on /metrics.
+
+_current = None
+_server = None
+_server_lock = threading.Lock()
+
+def set_current(metrics):
+    global _current
+    _current = metrics
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = (_current.prometheus() if _current is not None else "").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port, host=None):
+    """
+    Starts the /metrics endpoint on `host` (config.METRICS_HOST, localhost
+    by default) and `port` once per process (in a daemon thread). Returns
+    the server.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host or config.METRICS_HOST, int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
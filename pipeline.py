@@ -1,175 +1,372 @@
 import config
-from youtube_client import YouTubeClient
-from supabase_client import SupabaseClient
-from email_discovery_client import ApifyEmailClient
-from sheets_client import SheetsClient
-from llm_client import LLMClient
-import datetime
-import time
-
-def run_pipeline(config_overrides=None, status_callback=None):
+from youtube_client import YouTubeClient, MAX_CHANNEL_IDS
+from supabase_client import SupabaseClient, SupabaseLeadBatcher
+from email_discovery_client import ApifyEmailClient, ApifyEmailBatcher
+from sheets_client import SheetsClient, BufferedSheetsWriter
+from llm_client import LLMClient, default_enrichment
+from enrichment_jobs import PendingEnrichmentStore
+from response_cache import ResponseCache
+from batching import MicroBatcher
+from checkpoints import RunCheckpoints, new_run_id
+from channel_store import ChannelStore
+from records import Lead
+import rate_limit
+import transport
+import metrics
+import os
+from pipeline_stages import (
+    apply_enrichment, ChannelRegistry, search_batches, merge_hits,
+    resumed_batches, detail_channels, observe_channels,
+    filter_channels, skip_unchanged, dedup_channels, prioritize,
+    ChannelSteps, run_workers
+)
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import threading
+
+class StageLimits:
+    """
+    Per-service concurrency limits shared by all pipeline workers.
+    Usage: `with stages("apify"): ...`
+    """
+    def __init__(self, limits):
+        self._semaphores = {
+            name: threading.BoundedSemaphore(max(1, int(limit)))
+            for name, limit in limits.items()
+        }
+
+    def __call__(self, stage):
+        if stage not in self._semaphores:
+            self._semaphores[stage] = threading.BoundedSemaphore(1)
+        return self._semaphores[stage]
+
+def resume_pending_enrichment(status_callback=None, llm=None, supabase=None, sheets_writer=None, store=None):
+    """
+    Finishes leads parked by a batch-mode run: submits any that were never
+    submitted, collects finished batches, enriches the leads and saves them
+    to Supabase and Google Sheets. Leads missing from a finished batch are
+    enriched synchronously. Returns the number of leads saved.
+    """
+
+    def log(message):
+        print(message)
+        if status_callback:
+            status_callback(message)
+
+    store = store or PendingEnrichmentStore(config.PENDING_ENRICHMENT_PATH)
+    if not len(store):
+        return 0
+
+    llm = llm or LLMClient()
+    supabase = supabase or SupabaseClient()
+    own_writer = sheets_writer is None
+    sheets_writer = sheets_writer or BufferedSheetsWriter(SheetsClient())
+
+    unsubmitted = store.unsubmitted()
+    if unsubmitted:
+        batch_id = llm.submit_batch([item for _, item in unsubmitted])
+        store.mark_submitted([channel_id for channel_id, _ in unsubmitted], batch_id)
+        log(f"⏳ Submitted {len(unsubmitted)} leads for batch enrichment ({batch_id}).")
+
+    saved_total = 0
+    for batch_id, rows in store.batches().items():
+        batch = llm.get_batch(batch_id)
+        if batch.status in ("validating", "in_progress", "finalizing"):
+            log(f"⏳ Batch {batch_id}: {batch.status} ({len(rows)} leads).")
+            continue
+
+        results = {}
+        if batch.status == "completed":
+            results = llm.batch_results(batch, [channel_id for channel_id, _, _ in rows])
+        else:
+            log(f"⚠️ Batch {batch_id} {batch.status}; enriching its leads directly.")
+
+        missing = [tuple(item) for channel_id, _, item in rows if channel_id not in results]
+        if missing:
+            for (key, _, _), enrichment in zip(missing, llm.enrich_leads(missing)):
+                results[key] = enrichment
+
+        leads = [apply_enrichment(Lead.from_dict(lead), results[channel_id]).to_dict() for channel_id, lead, _ in rows]
+        saved = supabase.save_leads(leads)
+        done = []
+        for lead, ok in zip(leads, saved):
+            if ok:
+                sheets_writer.add(lead)
+                done.append(lead["channel_id"])
+                log(f"   💾 Saved enriched lead: {lead['channel_title']} ({lead['channel_id']})")
+            else:
+                log(f"   ⚠️ Failed to save to Supabase: {lead['channel_title']} ({lead['channel_id']})")
+        store.remove(done)
+        saved_total += len(done)
+
+    if own_writer:
+        sheets_writer.close()
+    return saved_total
+
+def run_pipeline(config_overrides=None, status_callback=None, extra_filters=None, extra_sinks=None, report_callback=None, run_metrics=None):
     """
     Runs the lead generation pipeline.
-    
+
     Args:
         config_overrides (dict): Optional dictionary to override config settings.
         status_callback (func): Optional function to handle log messages.
+        extra_filters (list): Optional channel filters run after the built-in
+            ones. Each takes a Channel record (see records.py) and returns
+            a reason string to reject it, or None to keep it.
+        extra_sinks (list): Optional steps run after the Supabase and Sheets
+            sinks. Each takes a Candidate (with its Lead) and returns
+            False to stop.
+        report_callback (func): Optional function called with the run
+            report (per-stage latency and cost, see metrics.py) at the end.
+        run_metrics (metrics.Metrics): Optional collector for the run's
+            external calls, e.g. to follow its progress from another
+            thread. A new one is created by default.
     """
-    
+
     def log(message):
         print(message)
         if status_callback:
             status_callback(message)
 
     log("🚀 Starting YouTube Lead Gen System...")
-    
+
+    # Run checkpoints. Passing the ID of an earlier run resumes it with the
+    # settings it was started with.
+    config_overrides = dict(config_overrides or {})
+    run_id = config_overrides.pop('run_id', None) or new_run_id()
+    checkpoints = RunCheckpoints(config.CHECKPOINT_PATH, run_id)
+    resuming = checkpoints.exists()
+    if resuming:
+        config_overrides.update(checkpoints.settings())
+        log(f"🔁 Resuming run {run_id}")
+    else:
+        log(f"🆔 Run ID: {run_id}")
+
     # Apply overrides
     keywords = config.SEARCH_KEYWORDS
     allowed_countries = config.ALLOWED_COUNTRIES
     min_subs = config.MIN_SUBSCRIBERS
     max_subs = config.MAX_SUBSCRIBERS
+    min_views_per_video = config.MIN_VIEWS_PER_VIDEO
+    max_days_since_upload = config.MAX_DAYS_SINCE_UPLOAD
+    priority_weights = config.PRIORITY_WEIGHTS
+    paid_budget = config.PAID_STAGE_BUDGET
     max_channels = config.MAX_CHANNELS_PER_KEYWORD
-    
+    target_qualified = config.TARGET_QUALIFIED_PER_KEYWORD
+    quota_budget = config.YOUTUBE_QUOTA_BUDGET
+    cache_mode = config.CACHE_MODE
+    enrichment_mode = config.LLM_ENRICHMENT_MODE
+    refresh_mode = config.REFRESH_MODE
+    workers = config.PIPELINE_WORKERS
+    stage_limits = dict(config.STAGE_CONCURRENCY)
+
     if config_overrides:
         keywords = config_overrides.get('keywords', keywords)
         allowed_countries = config_overrides.get('allowed_countries', allowed_countries)
         min_subs = config_overrides.get('min_subs', min_subs)
         max_subs = config_overrides.get('max_subs', max_subs)
+        min_views_per_video = config_overrides.get('min_views_per_video', min_views_per_video)
+        max_days_since_upload = config_overrides.get('max_days_since_upload', max_days_since_upload)
+        priority_weights = config_overrides.get('priority_weights', priority_weights)
+        paid_budget = config_overrides.get('paid_budget', paid_budget)
         max_channels = config_overrides.get('max_channels', max_channels)
+        target_qualified = config_overrides.get('target_qualified', target_qualified)
+        quota_budget = config_overrides.get('quota_budget', quota_budget)
+        cache_mode = config_overrides.get('cache_mode', cache_mode)
+        enrichment_mode = config_overrides.get('enrichment_mode', enrichment_mode)
+        refresh_mode = config_overrides.get('refresh_mode', refresh_mode)
+        workers = config_overrides.get('workers', workers)
+        stage_limits.update(config_overrides.get('stage_concurrency') or {})
+
+    checkpoints.start({
+        'keywords': keywords,
+        'allowed_countries': allowed_countries,
+        'min_subs': min_subs,
+        'max_subs': max_subs,
+        'min_views_per_video': min_views_per_video,
+        'max_days_since_upload': max_days_since_upload,
+        'priority_weights': priority_weights,
+        'paid_budget': paid_budget,
+        'max_channels': max_channels,
+        'target_qualified': target_qualified,
+        'quota_budget': quota_budget,
+        'enrichment_mode': enrichment_mode,
+        'refresh_mode': refresh_mode
+    })
+
+    # Instrumentation of every external call (see metrics.py)
+    run_metrics = run_metrics if run_metrics is not None else metrics.Metrics()
+    metrics.set_current(run_metrics)
+    if config.METRICS_PORT:
+        metrics.serve(config.METRICS_PORT)
+    connections_before = transport.summary()
 
     # Initialize Clients
-    youtube = YouTubeClient()
-    supabase = SupabaseClient()
-    
+    cache = ResponseCache(
+        config.CACHE_PATH,
+        ttls=config.CACHE_TTLS,
+        max_bytes=config.CACHE_MAX_BYTES,
+        mode=cache_mode
+    )
+    youtube = YouTubeClient(cache=cache, metrics=run_metrics)
+    supabase = SupabaseClient(metrics=run_metrics)
+    indexed = supabase.warm_index()
+    log(f"📇 Channel index: {len(supabase.index)} known channels ({indexed} new).")
+
     apify_token = None
     if config_overrides:
         apify_token = config_overrides.get('apify_token')
-        
-    apify = ApifyEmailClient(token=apify_token)
-    sheets = SheetsClient()
-    llm = LLMClient()
-    
+
+    apify = ApifyEmailClient(token=apify_token, cache=cache, metrics=run_metrics)
+    sheets = SheetsClient(metrics=run_metrics)
+    llm = LLMClient(cache=cache, metrics=run_metrics)
+    stages = StageLimits(stage_limits)
+    apify_batcher = ApifyEmailBatcher(apify, limit=stages("apify"))
+    sheets_writer = BufferedSheetsWriter(sheets)
+    if sheets_writer.recovered:
+        log(f"📝 Recovered {sheets_writer.recovered} unsaved Google Sheet rows from the last run.")
+    lead_batcher = SupabaseLeadBatcher(supabase, limit=stages("supabase"))
+    latest_videos = MicroBatcher(
+        youtube.get_latest_videos,
+        max_batch=config.YOUTUBE_BATCH_SIZE,
+        linger=config.YOUTUBE_BATCH_LINGER_SECONDS,
+        limit=stages("youtube"),
+        name="YouTube latest videos"
+    )
+    enrichments = MicroBatcher(
+        llm.enrich_leads,
+        max_batch=config.LLM_BATCH_MAX_CHANNELS,
+        linger=config.LLM_BATCH_LINGER_SECONDS,
+        limit=stages("openai"),
+        default=default_enrichment(),
+        name="LLM"
+    )
+    clients = (latest_videos, lead_batcher, apify_batcher, sheets_writer, enrichments)
+
+    # Leads waiting on an offline (Batch API) enrichment from earlier runs
+    pending_leads = PendingEnrichmentStore(config.PENDING_ENRICHMENT_PATH)
+    if len(pending_leads):
+        log(f"⏳ Resuming {len(pending_leads)} leads pending batch enrichment...")
+        resumed = resume_pending_enrichment(status_callback, llm, supabase, sheets_writer, pending_leads)
+        log(f"⏳ Saved {resumed} leads from earlier batches.")
+
+    # State of every channel at its last email lookup in earlier runs
+    channel_store = ChannelStore(config.CHANNEL_STORE_PATH)
+    if refresh_mode == "incremental":
+        log(f"♻️ Incremental refresh: {len(channel_store)} known channels are re-checked only if they changed.")
+
+    # Every channel seen in this run, with all keywords that found it
+    registry = ChannelRegistry()
+
+    def report(item):
+        for line in item.log:
+            log(line)
+
+    settings = {
+        'target_qualified': target_qualified,
+        'quota_budget': quota_budget,
+        'max_channels': max_channels
+    }
+    rules = {
+        'allowed_countries': allowed_countries,
+        'min_subs': min_subs,
+        'max_subs': max_subs,
+        'min_views_per_video': min_views_per_video,
+        'max_days_since_upload': max_days_since_upload,
+        'priority_weights': priority_weights
+    }
+    steps = ChannelSteps(
+        clients, stages, checkpoints,
+        pending_leads if enrichment_mode == "batch" else None,
+        channel_store
+    ).steps(extra_sinks)
+    # Qualified channels per keyword, counted by the dedup stage
+    qualified = {}
+
     total_leads_generated = 0
-    
-    for keyword in keywords:
-        log(f"\n🔎 Searching for keyword: {keyword}")
-        
-        # 1. Search Channels
-        log(f"   🔎 Searching with limit: {max_channels}")
-        channel_ids = youtube.search_channels(keyword, max_results=max_channels)
-        log(f"   Found {len(channel_ids)} channels.")
-        
-        if not channel_ids:
-            continue
-            
-        # 2. Get Channel Details
-        channels_data = youtube.get_channel_details(channel_ids)
-        
-        for channel in channels_data:
-            channel_id = channel['id']
-            title = channel['snippet']['title']
-            log(f"   👉 Processing: {title} ({channel_id})")
-            
-            # 3. Filter by Country
-            country = channel['snippet'].get('country')
-            if country not in allowed_countries:
-                log(f"      ❌ Skipped: Country {country} not in allowed list.")
-                continue
-                
-            # 4. Filter by Subscribers
-            stats = channel['statistics']
-            subs = int(stats.get('subscriberCount', 0))
-            if not (min_subs <= subs <= max_subs):
-                log(f"      ❌ Skipped: Subscribers {subs} out of range.")
-                continue
-                
-            # 5. Duplicate Check
-            if supabase.check_channel_exists(channel_id):
-                log(f"      ❌ Skipped: Already in database.")
-                continue
-                
-            # 6. Email Discovery
-            # Always use channel ID for the URL as requested
-            channel_url = f"https://www.youtube.com/channel/{channel_id}"
-                
-            log(f"      🕵️ Scraping emails from {channel_url}...")
-            emails = apify.get_emails(channel_url)
-            
-            # Filter emails
-            valid_emails = []
-            ignored_keywords = ['support', 'info', 'contact', 'help', 'sales']
-            for email in emails:
-                if not any(k in email.lower() for k in ignored_keywords):
-                    valid_emails.append(email)
-            
-            if not valid_emails:
-                log(f"      ❌ Skipped: No valid personal emails found (Found: {emails}).")
-                continue
-                
-            primary_email = valid_emails[0]
-            log(f"      ✅ Found email: {primary_email}")
-            
-            # 7. Enrichment (LLM)
-            log(f"      🧠 Enriching with AI...")
-            latest_video = youtube.get_latest_video(channel_id)
-            last_video_title = latest_video['title'] if latest_video else "No video found"
-            
-            enrichment = llm.enrich_lead(channel['snippet'], last_video_title)
-            
-            # Process contact name (First Name only)
-            raw_name = enrichment.get('contact_name', 'Unknown')
-            if raw_name and raw_name.lower() != 'unknown':
-                contact_name = raw_name.split()[0] # First name
-            else:
-                contact_name = "there"
-                
-            # Process product name
-            product_name = enrichment.get('product_name')
-            if not product_name or product_name.lower() == 'unknown':
-                product_name = "offer"
-
-            # 8. Prepare Lead Data
-            lead_data = {
-                "timestamp": str(datetime.datetime.now()),
-                "source_keyword": keyword,
-                "email": primary_email,
-                "email_source": "Apify",
-                "all_emails": valid_emails,
-                "channel_id": channel_id,
-                "channel_url": channel_url,
-                "channel_title": title,
-                "channel_description_short": enrichment.get('channel_description_short'),
-                "country": country,
-                "subscriber_count": subs,
-                "view_count": stats.get('viewCount'),
-                "video_count": stats.get('videoCount'),
-                "contact_name": contact_name,
-                "contact_name_confidence": enrichment.get('contact_name_confidence'),
-                "product_type": enrichment.get('product_type'),
-                "product_description": enrichment.get('product_description'),
-                "product_name": product_name,
-                "website_url": "",
-                "last_video_title": last_video_title,
-                "last_video_paraphrase": enrichment.get('last_video_paraphrase'),
-                "email_status": "Found",
-                "notes": "",
-                "supabase_id": ""
-            }
-            
-            # 9. Save to Storage
-            if supabase.save_lead(lead_data):
-                log(f"      💾 Saved to Supabase.")
-            else:
-                log(f"      ⚠️ Failed to save to Supabase.")
-                
-            if sheets.append_lead(lead_data):
-                log(f"      📝 Saved to Google Sheet.")
-            else:
-                log(f"      ⚠️ Failed to save to Google Sheet.")
-                
-            total_leads_generated += 1
-            
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        # 1. Search (page by page), merging repeat hits across keywords.
+        # A resumed run first finishes its unfinished channels.
+        batches = search_batches(youtube, keywords, settings, stages, checkpoints, qualified, log)
+        batches = merge_hits(batches, registry, log)
+        if resuming:
+            batches = itertools.chain(
+                resumed_batches(checkpoints, registry, pending_leads),
+                batches
+            )
+        # 2. Channel details, 50 IDs per lookup across pages and keywords
+        batches = detail_channels(
+            batches, youtube, stages, checkpoints,
+            batch_size=MAX_CHANNEL_IDS,
+            flush_each=bool(target_qualified)
+        )
+        batches = observe_channels(batches, channel_store, min_subs, max_subs)
+        # 3-4. Vectorized filters and priority scores, then extra filters
+        batches = filter_channels(batches, rules, list(extra_filters or []), youtube, stages, checkpoints, report)
+        if refresh_mode == "incremental":
+            batches = skip_unchanged(batches, checkpoints, report, config.REFRESH_MAX_AGE_DAYS)
+        # 5. Duplicate check (one lookup per batch)
+        batches = dedup_channels(batches, supabase, stages, checkpoints, pending_leads, qualified, report)
+        # Highest priority first into the paid stages, within the budget
+        batches = prioritize(batches, config.PRIORITY_WINDOW, paid_budget, report, checkpoints, config.PRIORITY_LINGER_SECONDS)
+        # 6-9. Email, enrichment and sinks, run concurrently. Logging happens
+        # on this thread only, since status_callback may touch UI state
+        # (e.g. Streamlit).
+        for item, generated in run_workers(batches, steps, executor, max_in_flight=max(1, int(workers)) * 4):
+            if generated:
+                total_leads_generated += 1
+            report(item)
+
+    if enrichment_mode == "batch" and pending_leads.unsubmitted():
+        log(f"\n⏳ Submitting leads for batch enrichment...")
+        resume_pending_enrichment(status_callback, llm, supabase, sheets_writer, pending_leads)
+        log(f"⏳ Run again (or call resume_pending_enrichment) once the batch completes to save them.")
+
+    with stages("sheets"):
+        unsaved = sheets_writer.close()
+    if unsaved:
+        log(f"\n⚠️ {unsaved} rows could not be written to Google Sheet; they are kept in {sheets_writer.spool_path} for the next run.")
+    else:
+        log(f"\n📝 Wrote {sheets_writer.rows_written} rows to Google Sheet.")
+    log(f"📊 YouTube quota used: {youtube.quota_used} units {youtube.quota_by_method}")
+    log(f"🗃️ Cache ({cache_mode}): {cache.summary()}")
+    for provider, stats in rate_limit.summary().items():
+        if stats["retries"] or stats["throttled"] or stats["rejected"]:
+            log(f"🚦 {provider}: {stats['retries']} retries, {stats['throttled']} throttled, circuit {stats['state']}")
+    connections = transport.summary(since=connections_before)
+    for provider, stats in connections.items():
+        log(f"🔌 {provider}: {stats['requests']} requests over {stats['connections']} new connections ({stats['reused']:.0%} reused)")
+    llm_tokens = llm.token_summary()
+    if llm_tokens["calls"]:
+        log(
+            f"🧠 LLM: {llm_tokens['calls']} calls for {llm_tokens['channels']} channels, per call "
+            f"{llm_tokens['prompt_tokens_per_call']} prompt tokens ({llm_tokens['cached_prompt_tokens_per_call']} cached) "
+            f"and {llm_tokens['completion_tokens_per_call']} completion tokens; "
+            f"{llm_tokens['prompt_tokens_per_channel']} prompt tokens per channel, descriptions trimmed from "
+            f"~{llm_tokens['descriptions']['original']} to ~{llm_tokens['descriptions']['sent']} tokens"
+        )
+    checkpoints.finish()
+    checkpoints.close()
+    channel_store.close()
+
+    run_report = run_metrics.write_report(
+        os.path.join(config.RUN_REPORT_DIR, f"{run_id}.json"),
+        run_id=run_id,
+        leads=total_leads_generated,
+        youtube_quota_by_method=youtube.quota_by_method,
+        cache=cache.stats,
+        rate_limits=rate_limit.summary(),
+        connections=connections,
+        llm_tokens=dict(llm_tokens, per_call=llm.calls)
+    )
+    for stage, stats in run_report["stages"].items():
+        log(f"⏱️ {stage}: {stats['calls']} calls, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, ${stats['cost_usd']:.4f}")
+    log(f"🧾 Run report: {os.path.join(config.RUN_REPORT_DIR, f'{run_id}.json')} (est. ${run_report['totals']['cost_usd']:.4f})")
+    if report_callback:
+        report_callback(run_report)
+
     log(f"\n🎉 Run Complete. Total Leads Generated: {total_leads_generated}")
+    log(f"🆔 Run ID: {run_id}")
     return total_leads_generated
 
 if __name__ == "__main__":
@@ -0,0 +1,631 @@
+"""
+Streaming stages of the lead generation pipeline.
+
+Channels flow through the stages in small batches (one search page at a
+time): search -> details -> filter and score -> (unchanged) -> dedup ->
+priority -> workers (email -> enrich -> sinks). Each stage is a generator
+over the previous one, so the first page is being scraped and enriched
+while later pages and keywords are still being searched, and only the
+batch in hand, the priority window and the channels in flight are held in
+memory.
+
+A channel is carried through the stages as a `Candidate` record (see
+records.py). Its log lines are collected in `item.log` and emitted by the
+caller on its own thread.
+"""
+import datetime
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+from checkpoints import REJECTED, STAGES
+from channel_store import changes
+from records import Candidate, Channel, Lead
+from email_extraction import extract_emails, channel_text, filter_personal_emails
+
+def _video_id(video):
+    return (video or {}).get('resourceId', {}).get('videoId')
+
+def _log_header(item):
+    verb = "Resuming" if item.resumed_stage else "Processing"
+    item.log.append(f"   👉 {verb}: {item.channel.title} ({item.channel_id})")
+
+def apply_enrichment(lead, enrichment):
+    """
+    Fills the LLM-derived fields of a Lead from an enrichment result.
+    """
+    # Process contact name (First Name only)
+    raw_name = enrichment.get('contact_name', 'Unknown')
+    if raw_name and raw_name.lower() != 'unknown':
+        contact_name = raw_name.split()[0] # First name
+    else:
+        contact_name = "there"
+
+    # Process product name
+    product_name = enrichment.get('product_name')
+    if not product_name or product_name.lower() == 'unknown':
+        product_name = "offer"
+
+    lead.channel_description_short = enrichment.get('channel_description_short')
+    lead.contact_name = contact_name
+    lead.contact_name_confidence = enrichment.get('contact_name_confidence')
+    lead.product_type = enrichment.get('product_type')
+    lead.product_description = enrichment.get('product_description')
+    lead.product_name = product_name
+    lead.last_video_paraphrase = enrichment.get('last_video_paraphrase')
+    return lead
+
+class ChannelRegistry:
+    """
+    Run-scoped registry of every channel seen, merging search hits from all
+    keywords. The first hit goes through the pipeline; later hits for other
+    keywords only add their keyword to it, so each channel is detailed,
+    checked and scraped once per run.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keywords = {}
+
+    def __contains__(self, channel_id):
+        return channel_id in self._keywords
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def add(self, channel_id, keywords):
+        """
+        Registers a channel hit. `keywords` is the hit's keyword list; the
+        first hit's list is kept and shared, later hits extend it.
+        Returns True if the channel is new to this run.
+        """
+        with self._lock:
+            known = self._keywords.get(channel_id)
+            if known is None:
+                self._keywords[channel_id] = keywords
+                return True
+            known.extend(k for k in keywords if k not in known)
+            return False
+
+    def keywords(self, channel_id):
+        with self._lock:
+            return list(self._keywords.get(channel_id, []))
+
+# 1. Search
+
+def search_batches(youtube, keywords, settings, stages, checkpoints, qualified, log):
+    """
+    Yields one batch of channel items per search results page, keyword by
+    keyword. With a qualification target, a keyword stops paging once
+    `qualified[keyword]` (counted by the dedup stage) reaches it.
+    A keyword is checkpointed as done only when its search ran to its end
+    (or the target); one stopped by the quota budget or an error is
+    searched again when the run is resumed.
+    """
+    target = settings['target_qualified']
+    quota_budget = settings['quota_budget']
+
+    for keyword in keywords:
+        if checkpoints.keyword_done(keyword):
+            log(f"\n⏭️ Keyword already searched in this run: {keyword}")
+            continue
+
+        log(f"\n🔎 Searching for keyword: {keyword}")
+        if target:
+            log(f"   🔎 Searching until {target} channels qualify")
+            pages = youtube.iter_search_pages(keyword, page_size=50, quota_budget=quota_budget)
+        else:
+            log(f"   🔎 Searching with limit: {settings['max_channels']}")
+            pages = youtube.iter_search_pages(keyword, page_size=settings['max_channels'], max_pages=1, quota_budget=quota_budget)
+
+        page_number = 0
+        stop_reason = None
+        while True:
+            with stages("youtube"):
+                channel_ids = next(pages, None)
+            if channel_ids is None:
+                stop_reason = youtube.search_stop_reason
+                break
+            page_number += 1
+            if page_number == 1:
+                log(f"   Found {len(channel_ids)} channels.")
+            else:
+                log(f"   Found {len(channel_ids)} more channels (page {page_number}).")
+
+            if channel_ids:
+                checkpoints.mark_many(channel_ids, "searched", keyword)
+                yield [Candidate(keyword, channel_id) for channel_id in channel_ids]
+
+            if target and qualified.get(keyword, 0) >= target:
+                pages.close()
+                stop_reason = "target"
+                break
+
+        if page_number == 0 and stop_reason in ("exhausted", "max_pages"):
+            log(f"   Found 0 channels.")
+        if stop_reason == "quota":
+            log(f"   ⛔ YouTube quota budget reached ({youtube.quota_used}/{quota_budget} units).")
+        elif stop_reason == "error":
+            log(f"   ⚠️ Search failed; the keyword is searched again if the run is resumed.")
+        else:
+            checkpoints.mark_keyword_done(keyword)
+
+def merge_hits(batches, registry, log):
+    """
+    Drops search hits for channels already found in this run (by an earlier
+    page or keyword), recording the extra keyword on the first hit.
+    """
+    for batch in batches:
+        new = [item for item in batch if registry.add(item.channel_id, item.keywords)]
+        if len(new) < len(batch):
+            log(f"   🔁 {len(batch) - len(new)} of them already found in this run.")
+        if new:
+            yield new
+
+def resumed_batches(checkpoints, registry, pending_leads, batch_size=50):
+    """
+    Yields the unfinished channels of a resumed run, each starting from its
+    last completed stage. Every channel of the run is registered, so a
+    repeated search does not process finished ones again.
+    """
+    batches = {}
+    for channel_id, keyword, stage, data in checkpoints.channels():
+        channel = Channel.from_dict(data['channel']) if data.get('channel') else None
+        item = Candidate(keyword, channel_id, channel, resumed_stage=stage)
+        if channel is not None:
+            _log_header(item)
+        registry.add(channel_id, item.keywords)
+        if stage in (REJECTED, "saved_sheets") or channel_id in pending_leads:
+            continue
+        batch = batches.setdefault(keyword, [])
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batches.pop(keyword)
+    for batch in batches.values():
+        yield batch
+
+# 2. Details
+
+def detail_channels(batches, youtube, stages, checkpoints, batch_size=50, flush_each=False):
+    """
+    Fetches the channels of items that do not have one yet, keeping only
+    their parsed Channel records.
+    Items are pooled across pages and keywords into lookups of `batch_size`
+    IDs (the most channels().list accepts); with `flush_each`, every
+    incoming batch is looked up right away instead (needed when the search
+    stage waits on qualification counts). Channels YouTube does not return
+    are dropped.
+    """
+    waiting = []
+
+    def lookup(items):
+        with stages("youtube"):
+            channels_data = youtube.get_channel_details([item.channel_id for item in items])
+        found = {channel['id']: channel for channel in channels_data}
+        detailed = []
+        for item in items:
+            resource = found.get(item.channel_id)
+            if resource is None:
+                continue
+            item.channel = Channel.from_resource(resource)
+            _log_header(item)
+            checkpoints.mark(item.channel_id, "detailed", item.keyword, channel=item.channel.to_dict())
+            detailed.append(item)
+        return detailed
+
+    for batch in batches:
+        ready = [item for item in batch if item.channel is not None]
+        if ready:
+            yield ready
+        waiting.extend(item for item in batch if item.channel is None)
+        while len(waiting) >= batch_size or (flush_each and waiting):
+            items, waiting = waiting[:batch_size], waiting[batch_size:]
+            yield lookup(items)
+
+    while waiting:
+        items, waiting = waiting[:batch_size], waiting[batch_size:]
+        yield lookup(items)
+
+def observe_channels(batches, store, min_subs, max_subs):
+    """
+    Notes on every detailed channel what changed since its last email lookup
+    (one channel store read per batch). The store is only updated once the
+    channel's email step has run (see ChannelSteps.find_email).
+    """
+    for batch in batches:
+        previous = store.get_many(item.channel_id for item in batch)
+        for item in batch:
+            item.previous = previous.get(item.channel_id)
+            item.changes = changes(item.channel, item.previous, min_subs, max_subs)
+        yield batch
+
+# 3-4. Filters
+
+def filter_channels(batches, rules, extra_filters, youtube, stages, checkpoints, report):
+    """
+    Filters each batch as a DataFrame (see channel_scoring.py): country,
+    subscriber range, views per video and, when `rules` has a
+    max_days_since_upload, upload recency. The latest uploads are looked up
+    (one batched request) only for channels that passed the other rules,
+    and kept for the lead. Passing channels get their priority score, then
+    go through the extra filters, each taking a Channel record and returning
+    a reason string to reject it, or None to keep it.
+    """
+    # pandas is imported on first use, not with the pipeline
+    from channel_scoring import channel_frame, set_upload_dates, rejection_reasons, priority_scores
+
+    for batch in batches:
+        if not batch:
+            yield batch
+            continue
+        frame = channel_frame([item.channel for item in batch])
+        reasons = rejection_reasons(frame, dict(rules, max_days_since_upload=None))
+        if rules.get("max_days_since_upload"):
+            passed = [item for item, reason in zip(batch, reasons) if reason is None]
+            if passed:
+                with stages("youtube"):
+                    videos = youtube.get_latest_videos([item.channel.uploads_playlist or item.channel_id for item in passed])
+                published = {}
+                for item, video in zip(passed, videos):
+                    item.latest_video = video
+                    if video:
+                        published[item.channel_id] = video.get('publishedAt')
+                    if item.previous is not None and _video_id(video):
+                        # The upload itself is a sharper change signal than the video count
+                        item.changes = changes(item.channel, item.previous, rules['min_subs'], rules['max_subs'], _video_id(video))
+                set_upload_dates(frame, published)
+                reasons = rejection_reasons(frame, rules)
+        scores = priority_scores(frame, rules["priority_weights"])
+
+        kept = []
+        for item, reason, score in zip(batch, reasons, scores):
+            if reason is None:
+                item.score = float(score)
+                for check in extra_filters:
+                    reason = check(item.channel)
+                    if reason:
+                        break
+            if reason:
+                item.log.append(f"      ❌ Skipped: {reason}")
+                checkpoints.mark(item.channel_id, REJECTED)
+                report(item)
+            else:
+                checkpoints.mark(item.channel_id, "filtered")
+                kept.append(item)
+        yield kept
+
+def skip_unchanged(batches, checkpoints, report, max_age_days):
+    """
+    Incremental refresh: channels whose cheap signals did not change since
+    their email lookup (less than `max_age_days` ago) skip the paid steps.
+    Those where nothing was found are dropped; those with emails reuse them.
+    Channels never looked up before, or resumed by this run, go through.
+    """
+    cutoff = str(datetime.datetime.now() - datetime.timedelta(days=max_age_days))
+    for batch in batches:
+        kept = []
+        for item in batch:
+            previous = item.previous
+            if (item.resumed_stage or item.changes or previous is None
+                    or not previous["email_outcome"] or previous["email_checked"] < cutoff):
+                if item.changes:
+                    item.log.append(f"      🔄 Changed since last run: {', '.join(item.changes)}.")
+                kept.append(item)
+            elif previous["email_outcome"] == "none":
+                item.log.append(f"      ❌ Skipped: Unchanged since {previous['email_checked'][:10]}, when no email was found.")
+                checkpoints.mark(item.channel_id, REJECTED)
+                report(item)
+            else:
+                item.emails, item.email_source = previous["emails"], previous["email_source"]
+                kept.append(item)
+        yield kept
+
+# 5. Dedup
+
+def dedup_channels(batches, supabase, stages, checkpoints, pending_leads, qualified, report):
+    """
+    Drops channels already in the database or parked for batch enrichment,
+    with one database lookup per batch. Channels this run already saved to
+    Supabase skip the lookup. (Repeat hits within the run never get here;
+    see merge_hits.)
+    """
+    for batch in batches:
+        lookup = [item.channel_id for item in batch if item.resumed_stage != "saved_supabase"]
+        existing = set()
+        if lookup:
+            with stages("supabase"):
+                existing = supabase.check_channels_exist(lookup)
+
+        kept = []
+        for item in batch:
+            channel_id = item.channel_id
+            if item.resumed_stage == "saved_supabase":
+                # Saved by this run, so the lookup would report it as a duplicate
+                kept.append(item)
+                continue
+
+            if channel_id in existing:
+                item.log.append(f"      ❌ Skipped: Already in database.")
+                checkpoints.mark(channel_id, REJECTED)
+            elif channel_id in pending_leads:
+                item.log.append(f"      ❌ Skipped: Pending batch enrichment.")
+            else:
+                qualified[item.keyword] = qualified.get(item.keyword, 0) + 1
+                kept.append(item)
+                continue
+            report(item)
+        yield kept
+
+def prioritize(batches, window, budget, report, checkpoints, linger=2.0):
+    """
+    Hands at most `budget` channels per run to the paid stages (Apify, LLM),
+    highest priority score first; the others are skipped (and checkpointed
+    as rejected). Without a budget (None), channels pass straight through.
+
+    Each incoming batch is released best first down to `window` held
+    channels, so the order is exact within a batch plus the window; held
+    channels are flushed once the oldest has waited `linger` seconds (checked
+    as batches arrive) or the input ends. Channels a resumed run already
+    sent on pass through without counting against the budget again.
+    """
+    if budget is None:
+        for batch in batches:
+            for item in batch:
+                item.log.append(f"      ⭐ Priority score {item.score:.2f}")
+            yield batch
+        return
+
+    after_filter = STAGES[STAGES.index("filtered") + 1:]
+    paid = {
+        channel_id for channel_id, _, stage, data in checkpoints.channels()
+        if data.get('paid') or stage in after_filter
+    }
+    sent = len(paid)
+    held = []
+    order = itertools.count()
+
+    def release(count):
+        nonlocal sent
+        released = []
+        for _ in range(count):
+            _, _, _, item = heapq.heappop(held)
+            if sent >= budget:
+                item.log.append(f"      💸 Skipped: Paid-stage budget of {budget} channels reached (score {item.score:.2f}).")
+                checkpoints.mark(item.channel_id, REJECTED)
+                report(item)
+                continue
+            sent += 1
+            item.log.append(f"      ⭐ Priority score {item.score:.2f}")
+            checkpoints.mark(item.channel_id, "filtered", paid=True)
+            released.append(item)
+        return released
+
+    for batch in batches:
+        resumed = [item for item in batch if item.channel_id in paid]
+        if resumed:
+            yield resumed
+        now = time.monotonic()
+        for item in batch:
+            if item.channel_id not in paid:
+                heapq.heappush(held, (-item.score, next(order), now, item))
+        if held and now - min(entry[2] for entry in held) >= linger:
+            released = release(len(held))
+        else:
+            released = release(max(0, len(held) - max(0, window)))
+        if released:
+            yield released
+    released = release(len(held))
+    if released:
+        yield released
+
+# 6-9. Workers
+
+class ChannelSteps:
+    """
+    The per-channel steps run by the worker pool: email discovery,
+    enrichment (or parking for batch enrichment) and the sinks. Each step
+    takes an item and returns False to stop processing it.
+    Stages a resumed channel already completed are not repeated.
+    """
+    def __init__(self, clients, stages, checkpoints, pending=None, store=None):
+        self.latest_videos, self.supabase, self.apify, self.sheets, self.llm = clients
+        self.stages = stages
+        self.checkpoints = checkpoints
+        self.pending = pending
+        # Channel store: email outcomes and latest uploads are recorded
+        self.store = store
+
+    def _reached(self, item, stage):
+        return self.checkpoints.reached(item.channel_id, stage)
+
+    def _mark(self, item, stage, **data):
+        self.checkpoints.mark(item.channel_id, stage, item.keyword, **data)
+
+    def steps(self, extra_sinks=None):
+        """
+        Returns the step chain: email -> enrich (or park) -> sinks.
+        """
+        if self.pending is not None:
+            return [self.find_email, self.park]
+        return [self.find_email, self.enrich, self.save_supabase, self.queue_sheets] + list(extra_sinks or [])
+
+    def find_email(self, item):
+        log = item.log.append
+        channel = item.channel
+        # Always use channel ID for the URL as requested
+        channel_url = f"https://www.youtube.com/channel/{item.channel_id}"
+
+        if self._reached(item, "emails_found"):
+            _, data = self.checkpoints.get(item.channel_id)
+            item.emails, item.email_source = data['emails'], data['email_source']
+            log(f"      ⏭️ Emails already found in this run.")
+        elif item.emails:
+            # Unchanged since an earlier run found them (see skip_unchanged)
+            log(f"      ♻️ Unchanged since last run; reusing its emails.")
+            self._mark(item, "emails_found", emails=item.emails, email_source=item.email_source)
+        else:
+            # 6a. Free: addresses published in the channel description
+            local_emails = extract_emails(channel_text(channel))
+            valid_emails = filter_personal_emails(local_emails)
+            email_source = "Description"
+
+            # 6b. Paid: Apify scrape, only when nothing usable was found locally
+            if valid_emails:
+                log(f"      🔍 Found email in channel description.")
+            else:
+                log(f"      🕵️ Scraping emails from {channel_url}...")
+                # Batched with other workers' URLs into a shared actor run
+                emails = self.apify.get_emails(channel_url)
+                if emails is None:
+                    # The run failed: nothing is known about the channel, so
+                    # the store keeps no outcome and the channel stays at its
+                    # last checkpoint, so resuming the run retries it
+                    log(f"      ⚠️ Skipped: Apify run failed; retried if the run is resumed.")
+                    return False
+                valid_emails = filter_personal_emails(emails)
+                email_source = "Apify"
+
+                if not valid_emails:
+                    log(f"      ❌ Skipped: No valid personal emails found (Found: {sorted(set(local_emails) | set(emails))}).")
+                    if self.store is not None:
+                        self.store.record_emails(channel, [])
+                        self._record_upload(item, item.latest_video)
+                    self._mark(item, REJECTED)
+                    return False
+
+            item.emails, item.email_source = valid_emails, email_source
+            if self.store is not None:
+                self.store.record_emails(channel, valid_emails, email_source)
+                self._record_upload(item, item.latest_video)
+            self._mark(item, "emails_found", emails=valid_emails, email_source=email_source)
+
+        log(f"      ✅ Found email: {item.emails[0]}")
+        return True
+
+    def _record_upload(self, item, latest_video):
+        # Compared by the next incremental run (see channel_store.changes)
+        if self.store is not None and _video_id(latest_video):
+            self.store.record_upload(item.channel_id, _video_id(latest_video))
+
+    def _build_lead(self, item):
+        channel = item.channel
+
+        # Looked up by the recency filter, or here from the uploads playlist
+        # in the channel details (no extra channels().list call), batched
+        # with other workers' lookups
+        latest_video = item.latest_video
+        if latest_video is None:
+            latest_video = self.latest_videos.submit(channel.uploads_playlist or channel.id)
+        last_video_title = latest_video['title'] if latest_video else "No video found"
+        self._record_upload(item, latest_video)
+
+        lead = Lead(
+            channel_id=item.channel_id,
+            email=item.emails[0],
+            email_source=item.email_source,
+            all_emails=item.emails,
+            source_keyword=item.keyword,
+            source_keywords=list(item.keywords),
+            channel_url=f"https://www.youtube.com/channel/{item.channel_id}",
+            channel_title=channel.title,
+            country=channel.country,
+            subscriber_count=channel.subscribers,
+            view_count=channel.views,
+            video_count=channel.videos,
+            last_video_title=last_video_title
+        )
+        return lead, (item.channel_id, channel.enrichment_data(), last_video_title)
+
+    def enrich(self, item):
+        if self._reached(item, "enriched"):
+            item.lead = Lead.from_dict(self.checkpoints.get(item.channel_id)[1]['lead'])
+            item.log.append(f"      ⏭️ Already enriched in this run.")
+            return True
+
+        lead, enrichment_item = self._build_lead(item)
+        item.log.append(f"      🧠 Enriching with AI...")
+        # Packed with other workers' channels into one request
+        item.lead = apply_enrichment(lead, self.llm.submit(enrichment_item))
+        self._mark(item, "enriched", lead=item.lead.to_dict())
+        return True
+
+    def park(self, item):
+        """
+        Batch enrichment mode: stores the lead for the OpenAI Batch API
+        instead of enriching and saving it now.
+        """
+        lead, enrichment_item = self._build_lead(item)
+        self.pending.add(item.channel_id, lead.to_dict(), enrichment_item)
+        item.log.append(f"      ⏳ Queued for batch enrichment.")
+        return False
+
+    def save_supabase(self, item):
+        if self._reached(item, "saved_supabase"):
+            item.saved = True
+            item.log.append(f"      ⏭️ Already saved to Supabase in this run.")
+            return True
+
+        # Batched with other workers' leads into one bulk upsert
+        item.saved = self.supabase.save_lead(item.lead.to_dict())
+        if item.saved:
+            item.log.append(f"      💾 Saved to Supabase.")
+            self._mark(item, "saved_supabase")
+        else:
+            item.log.append(f"      ⚠️ Failed to save to Supabase.")
+        return True
+
+    def queue_sheets(self, item):
+        # Buffered; rows are written in batches (see BufferedSheetsWriter).
+        # A queued row is in the durable local spool, so it counts as saved.
+        with self.stages("sheets"):
+            queued = self.sheets.add(item.lead.to_dict())
+        if queued:
+            item.log.append(f"      📝 Queued for Google Sheet.")
+        else:
+            item.log.append(f"      ⚠️ Google Sheet write delayed (row kept in local spool).")
+        # A failed Supabase save leaves the channel at "enriched", so resuming
+        # the run retries it.
+        if item.saved:
+            self._mark(item, "saved_sheets")
+        return True
+
+def run_steps(item, steps):
+    """
+    Runs an item through the step chain. Returns True if it passed every
+    step (a lead was generated).
+    """
+    for step in steps:
+        if not step(item):
+            return False
+    return True
+
+def run_workers(batches, steps, executor, max_in_flight):
+    """
+    Submits every item to the worker pool and yields (item, generated) as
+    channels finish. Stops pulling new batches while `max_in_flight`
+    channels are in progress, so upstream stages never run far ahead.
+    A step that raises is logged on the item and counts as not generated.
+    """
+    in_flight = {}
+
+    def finished(futures):
+        for future in futures:
+            item = in_flight.pop(future)
+            try:
+                generated = future.result()
+            except Exception as e:
+                item.log.append(f"      ⚠️ Error: {e}")
+                generated = False
+            yield item, generated
+
+    for batch in batches:
+        for item in batch:
+            in_flight[executor.submit(run_steps, item, steps)] = item
+        yield from finished([future for future in in_flight if future.done()])
+        while len(in_flight) >= max_in_flight:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            yield from finished(done)
+
+    while in_flight:
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        yield from finished(done)
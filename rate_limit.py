@@ -0,0 +1,294 @@
+"""
+Shared rate limiting, retries and circuit breaking for the API clients.
+
+Every provider ("youtube", "supabase", "apify", "openai", "sheets") has one
+process-wide ApiGuard (see `guard`), so all clients, worker threads and
+concurrent runs in a process draw from the same token bucket. Calls that
+fail with a throttling or transient error are retried with exponential
+backoff and jitter, honouring Retry-After; a 429 also slows the provider's
+bucket down, and it speeds back up as calls succeed.
+"""
+import email.utils
+import random
+import threading
+import time
+import config
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Exception class names (anywhere in the MRO) of network-level failures
+# raised by the client libraries (httplib2, requests, httpx, openai)
+TRANSIENT_ERROR_NAMES = (
+    "Timeout", "TimeoutError", "ConnectionError", "ConnectError",
+    "RemoteProtocolError", "ReadError", "APIConnectionError",
+    "APITimeoutError", "ServerNotFoundError", "RemoteDisconnected"
+)
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose circuit is open.
+    """
+
+def error_status(error):
+    """
+    Returns the HTTP status of an exception raised by one of the client
+    libraries, or None.
+    """
+    # openai, apify_client
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status
+    # googleapiclient HttpError (httplib2 response)
+    resp = getattr(error, "resp", None)
+    if resp is not None and hasattr(resp, "status"):
+        return int(resp.status)
+    # gspread APIError (requests), httpx.HTTPStatusError
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status
+    # postgrest APIError sometimes carries the HTTP status as its code
+    code = getattr(error, "code", None)
+    if isinstance(code, str) and code.isdigit():
+        return int(code)
+    return None
+
+def retry_after(error):
+    """
+    Returns the Retry-After delay in seconds sent with an error, or None.
+    """
+    headers = None
+    resp = getattr(error, "resp", None)
+    if resp is not None and hasattr(resp, "get"):
+        headers = resp
+    response = getattr(error, "response", None)
+    if headers is None and response is not None:
+        headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_transient(error):
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    names = {cls.__name__ for cls in type(error).__mro__}
+    return any(name in names for name in TRANSIENT_ERROR_NAMES)
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` calls per second with bursts of `burst`.
+    The rate adapts: a throttled call halves it (down to `rate / 10`), and
+    every successful call wins back a twentieth of the configured rate.
+    """
+    def __init__(self, rate, burst):
+        self.max_rate = float(rate)
+        self.min_rate = self.max_rate / 10
+        self.rate = self.max_rate
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a call may be made. Returns the seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self, pause=None):
+        """
+        Slows down after a 429. `pause` (e.g. Retry-After) holds back every
+        caller for that many seconds.
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if pause:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive transient failures; while open,
+    calls fail fast with CircuitOpenError. After `reset_seconds` one trial
+    call is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+    def __init__(self, name, threshold, reset_seconds):
+        self.name = name
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial or time.monotonic() - self._opened_at < self.reset_seconds:
+                raise CircuitOpenError(f"{self.name} circuit is open after {self._failures} consecutive failures")
+            self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def record_throttled(self):
+        """
+        A 429: the provider is up but busy, which neither closes nor opens
+        the circuit. A throttled trial call frees the slot for the next one.
+        """
+        with self._lock:
+            self._trial = False
+
+class ApiGuard:
+    """
+    Rate limit, retry and circuit breaker for one provider.
+    Usage: `guard("youtube").call(request.execute)`
+    """
+    def __init__(self, name, rate, burst, max_attempts=None, base_delay=None, max_delay=None,
+                 failure_threshold=None, reset_seconds=None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD,
+            config.CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        )
+        self.max_attempts = max_attempts or config.RETRY_MAX_ATTEMPTS
+        self.base_delay = config.RETRY_BASE_DELAY_SECONDS if base_delay is None else base_delay
+        self.max_delay = config.RETRY_MAX_DELAY_SECONDS if max_delay is None else max_delay
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0, "rejected": 0, "waited": 0.0}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def backoff(self, attempt, error=None):
+        """
+        Seconds to wait before retry number `attempt` (1-based): full-jitter
+        exponential backoff, but never less than the server's Retry-After.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        hinted = retry_after(error) if error is not None else None
+        if hinted is not None:
+            delay = max(delay, min(hinted, self.max_delay))
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Calls `fn(*args, **kwargs)` within the provider's rate limit,
+        retrying throttling and transient errors. Non-transient errors are
+        raised at once; transient ones after the last attempt. Raises
+        CircuitOpenError while the provider's circuit is open.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("rejected")
+                raise
+            self._count("waited", self.bucket.acquire())
+            self._count("calls")
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    # The provider answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                status = error_status(e)
+                if status == 429:
+                    self._count("throttled")
+                    self.bucket.throttled(retry_after(e))
+                    self.breaker.record_throttled()
+                else:
+                    self.breaker.record_failure()
+                if attempt == self.max_attempts or self.breaker.state == "open":
+                    self._count("failures")
+                    raise
+                delay = self.backoff(attempt, e)
+                self._count("retries")
+                print(f"{self.name}: {status or type(e).__name__}, retrying in {delay:.1f}s ({attempt}/{self.max_attempts - 1})...")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self.bucket.succeeded()
+            return result
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+def guard(name):
+    """
+    Returns the process-wide ApiGuard for a provider, configured from
+    config.RATE_LIMITS.
+    """
+    with _guards_lock:
+        if name not in _guards:
+            limits = config.RATE_LIMITS.get(name, {})
+            _guards[name] = ApiGuard(name, **limits) if limits else ApiGuard(name, rate=5, burst=5)
+        return _guards[name]
+
+def summary():
+    """
+    Returns {provider: stats} for every guard used in this process.
+    """
+    with _guards_lock:
+        return {name: dict(g.stats, state=g.breaker.state, rate=round(g.bucket.rate, 2)) for name, g in _guards.items()}
+
+def reset():
+    """
+    Forgets every guard (and its adapted rate, breaker state and stats),
+    e.g. between benchmark scenarios.
+    """
+    with _guards_lock:
+        _guards.clear()
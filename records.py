@@ -0,0 +1,154 @@
+"""
+Compact typed records carried through the pipeline.
+
+A raw channels().list resource holds every part the API returned (long
+descriptions twice over, thumbnails, localizations, ...). `Channel` keeps
+only the fields the filters, enrichment and sinks read, and replaces the
+resource as soon as the details come back. `Candidate` is a channel on its
+way through the stages and `Lead` the row built for the sinks. All three
+are slotted, so they carry no per-instance __dict__.
+
+Records are turned into plain dicts (`to_dict`) only where they leave the
+process: checkpoints, the pending-enrichment store, Supabase and Sheets.
+"""
+from dataclasses import dataclass, field, fields
+import datetime
+import time
+
+def _to_dict(record):
+    return {f.name: getattr(record, f.name) for f in fields(record)}
+
+@dataclass(slots=True)
+class Channel:
+    id: str
+    title: str
+    description: str = ""
+    custom_url: str | None = None
+    country: str | None = None
+    subscribers: int = 0
+    views: int = 0
+    videos: int = 0
+    uploads_playlist: str | None = None
+    # Only kept when it differs from the snippet description
+    branding_description: str = ""
+
+    @classmethod
+    def from_resource(cls, resource):
+        """
+        Parses a channel resource as returned by channels().list.
+        """
+        snippet = resource.get('snippet', {})
+        stats = resource.get('statistics', {})
+        description = snippet.get('description') or ""
+        branding = resource.get('brandingSettings', {}).get('channel', {}).get('description') or ""
+        return cls(
+            id=resource['id'],
+            title=snippet.get('title') or "",
+            description=description,
+            custom_url=snippet.get('customUrl'),
+            country=snippet.get('country'),
+            subscribers=int(stats.get('subscriberCount', 0) or 0),
+            views=int(stats.get('viewCount', 0) or 0),
+            videos=int(stats.get('videoCount', 0) or 0),
+            uploads_playlist=resource.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads') or None,
+            branding_description=branding if branding != description else ""
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Restores a channel saved with `to_dict`, or parses a raw resource
+        (checkpoints written before records were introduced).
+        """
+        if 'snippet' in data:
+            return cls.from_resource(data)
+        return cls(**data)
+
+    def to_dict(self):
+        return _to_dict(self)
+
+    def enrichment_data(self):
+        """
+        The fields the LLM prompt uses, as a JSON-serializable dict.
+        """
+        return {"title": self.title, "description": self.description, "customUrl": self.custom_url}
+
+@dataclass(slots=True)
+class Lead:
+    channel_id: str
+    email: str
+    email_source: str | None
+    all_emails: list
+    source_keyword: str
+    source_keywords: list
+    channel_url: str
+    channel_title: str
+    country: str | None
+    subscriber_count: int
+    view_count: int
+    video_count: int
+    last_video_title: str
+    # Seconds since the epoch; rendered as a string by to_dict
+    timestamp: float = field(default_factory=time.time)
+    channel_description_short: str | None = None
+    contact_name: str | None = None
+    contact_name_confidence: str | None = None
+    product_type: str | None = None
+    product_description: str | None = None
+    product_name: str | None = None
+    website_url: str = ""
+    last_video_paraphrase: str | None = None
+    email_status: str = "Found"
+    notes: str = ""
+    supabase_id: str = ""
+
+    # Key order of the lead dicts the sinks receive
+    KEYS = (
+        "timestamp", "source_keyword", "source_keywords", "email", "email_source", "all_emails",
+        "channel_id", "channel_url", "channel_title", "channel_description_short", "country",
+        "subscriber_count", "view_count", "video_count", "contact_name", "contact_name_confidence",
+        "product_type", "product_description", "product_name", "website_url", "last_video_title",
+        "last_video_paraphrase", "email_status", "notes", "supabase_id"
+    )
+
+    @classmethod
+    def from_dict(cls, data):
+        data = {key: data[key] for key in cls.KEYS if key in data}
+        if isinstance(data.get("timestamp"), str):
+            data["timestamp"] = datetime.datetime.fromisoformat(data["timestamp"]).timestamp()
+        return cls(**data)
+
+    def to_dict(self):
+        data = {key: getattr(self, key) for key in self.KEYS}
+        data["timestamp"] = str(datetime.datetime.fromtimestamp(self.timestamp))
+        return data
+
+@dataclass(slots=True)
+class Candidate:
+    """
+    A channel on its way through the pipeline stages. Its log lines are
+    collected in `log` and emitted by the caller on its own thread.
+    """
+    keyword: str
+    channel_id: str
+    channel: Channel | None = None
+    # Every keyword that found the channel (see ChannelRegistry)
+    keywords: list = None
+    log: list = field(default_factory=list)
+    resumed_stage: str | None = None
+    # The channel store's record from an earlier run, and the cheap
+    # signals that changed since (see observe_channels)
+    previous: dict | None = None
+    changes: list | None = None
+    # Priority score (see channel_scoring.py) and the latest upload, when
+    # the recency filter looked it up
+    score: float = 0.0
+    latest_video: dict | None = None
+    emails: list | None = None
+    email_source: str | None = None
+    lead: Lead | None = None
+    saved: bool = False
+
+    def __post_init__(self):
+        if self.keywords is None:
+            self.keywords = [self.keyword]
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Cache modes
+USE = "use"          # read and write
+REFRESH = "refresh"  # skip reads, overwrite entries with fresh responses
+BYPASS = "bypass"    # neither read nor write
+
+def make_key(*parts):
+    """
+    Derives a cache key from request inputs (any JSON-serialisable values).
+    """
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Persistent SQLite cache for API responses, shared by the API clients.
+    Entries expire after a per-source TTL (seconds) and the least recently
+    used entries are evicted once the cache grows past `max_bytes`.
+    """
+    def __init__(self, path, ttls=None, max_bytes=None, mode=USE):
+        if mode not in (USE, REFRESH, BYPASS):
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.path = path
+        self.ttls = ttls or {}
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.stats = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Shared by parallel `cli work` processes: WAL and a long busy timeout
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " source TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " PRIMARY KEY (source, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        self._total_bytes = row[0]
+
+    def _record(self, source, outcome):
+        counts = self.stats.setdefault(source, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def get(self, source, key):
+        """
+        Returns the cached value, or None on a miss (or an expired entry).
+        A cache locked by another process for longer than the busy timeout
+        counts as a miss rather than failing the caller.
+        """
+        if self.mode != USE:
+            with self._lock:
+                self._record(source, "misses")
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT value, created FROM entries WHERE source = ? AND key = ?",
+                    (source, key)
+                ).fetchone()
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ Response cache unavailable ({e}); treating as a miss.")
+                row = None
+            ttl = self.ttls.get(source)
+            if row is None or (ttl is not None and now - row[1] > ttl):
+                self._record(source, "misses")
+                return None
+            try:
+                # Only for LRU eviction, so a lost update is harmless
+                self._conn.execute(
+                    "UPDATE entries SET accessed = ? WHERE source = ? AND key = ?",
+                    (now, source, key)
+                )
+                self._conn.commit()
+            except sqlite3.OperationalError:
+                self._conn.rollback()
+            self._record(source, "hits")
+        return json.loads(row[0])
+
+    def set(self, source, key, value):
+        if self.mode == BYPASS:
+            return
+        raw = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            try:
+                old = self._conn.execute(
+                    "SELECT size FROM entries WHERE source = ? AND key = ?", (source, key)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (source, key, value, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, key, raw, len(raw), now, now)
+                )
+                self._total_bytes += len(raw) - (old[0] if old else 0)
+                self._evict()
+                self._conn.commit()
+            except sqlite3.OperationalError as e:
+                # The response is still returned; it is just not cached
+                self._conn.rollback()
+                print(f"⚠️ Response cache unavailable ({e}); not cached.")
+
+    def _evict(self):
+        """
+        Drops least recently used entries until the cache is back under 90%
+        of max_bytes. Called with the lock held.
+        """
+        if not self.max_bytes or self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT source, key, size FROM entries ORDER BY accessed").fetchall()
+        for source, key, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM entries WHERE source = ? AND key = ?", (source, key))
+            self._total_bytes -= size
+
+    def summary(self):
+        """
+        One-line hit/miss summary per source, e.g. for the end of a run.
+        """
+        if not self.stats:
+            return "no lookups"
+        parts = []
+        for source, counts in sorted(self.stats.items()):
+            parts.append(f"{source} {counts['hits']}/{counts['hits'] + counts['misses']} hits")
+        return ", ".join(parts)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,27 +1,41 @@
-import gspread
-from google.oauth2.service_account import Credentials
 import config
+from rate_limit import guard
+from metrics import Metrics
+import transport
 import os
-import streamlit as st
 import json
+import threading
 
 class SheetsClient:
-    def __init__(self):
+    def __init__(self, metrics=None):
+        self.sheet_id = config.GOOGLE_SHEET_ID
+        self.tab_name = config.GOOGLE_SHEET_TAB_NAME
+        self._gc = None
+        self._gc_lock = threading.Lock()
+        self._worksheet = None
+        self._has_headers = None
+        self.guard = guard("sheets")
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def _connect(self):
+        import gspread
+        from google.oauth2.service_account import Credentials
+
         scopes = [
             'https://www.googleapis.com/auth/spreadsheets',
             'https://www.googleapis.com/auth/drive'
         ]
         
         creds_file = config.GOOGLE_SHEETS_CREDENTIALS_FILE
+        creds_dict = config.get_env("google_credentials")
         
         if os.path.exists(creds_file):
             credentials = Credentials.from_service_account_file(
                 creds_file,
                 scopes=scopes
             )
-        elif hasattr(st, "secrets") and "google_credentials" in st.secrets:
+        elif creds_dict:
             # Load from secrets
-            creds_dict = st.secrets["google_credentials"]
             # If it's a string (JSON), parse it. If it's already a dict (TOML), use it.
             if isinstance(creds_dict, str):
                  creds_dict = json.loads(creds_dict)
@@ -33,72 +47,252 @@ class SheetsClient:
         else:
             raise FileNotFoundError(f"Could not find credentials file '{creds_file}' or 'google_credentials' in secrets.")
 
-        self.gc = gspread.authorize(credentials)
+        gc = gspread.authorize(credentials, session=transport.requests_session("sheets", credentials))
+        gc.set_timeout((config.HTTP_CONNECT_TIMEOUT_SECONDS, transport.timeout("sheets")))
         print(f"DEBUG: Service Account Email: {credentials.service_account_email}")
-        self.sheet_id = config.GOOGLE_SHEET_ID
-        self.tab_name = config.GOOGLE_SHEET_TAB_NAME
+        return gc
+
+    @property
+    def gc(self):
+        """
+        The gspread client, authorized (and gspread imported) on first use.
+        """
+        with self._gc_lock:
+            if self._gc is None:
+                self._gc = self._connect()
+            return self._gc
+
+    def get_worksheet(self):
+        """
+        Returns the target worksheet, opening it (and creating it if needed)
+        only on the first call.
+        """
+        if self._worksheet is None:
+            from gspread.exceptions import WorksheetNotFound
+            with self.metrics.measure("sheets.open"):
+                sh = self.guard.call(self.gc.open_by_key, self.sheet_id)
+                try:
+                    self._worksheet = self.guard.call(sh.worksheet, self.tab_name)
+                except WorksheetNotFound:
+                    # Create worksheet if it doesn't exist
+                    self._worksheet = self.guard.call(sh.add_worksheet, title=self.tab_name, rows=1000, cols=25)
+        return self._worksheet
+
+    def has_headers(self):
+        """
+        Checks row 1 once and caches the answer.
+        """
+        if self._has_headers is None:
+            worksheet = self.get_worksheet()
+            with self.metrics.measure("sheets.open"):
+                self._has_headers = not (worksheet.row_count == 0 or not self.guard.call(worksheet.row_values, 1))
+        return self._has_headers
+
+    def lead_to_row(self, lead_data):
+        """
+        Maps lead_data to columns based on config.INSTANTLY_HEADERS.
+        """
+        row = []
+        for header in config.INSTANTLY_HEADERS:
+            if header == "name":
+                row.append(lead_data.get('contact_name', ''))
+            elif header == "email":
+                row.append(lead_data.get('email', ''))
+            elif header == "YouTube handle":
+                row.append(lead_data.get('channel_url', ''))
+            elif header == "about link":
+                row.append("") # Placeholder as requested
+            elif header == "transcript":
+                row.append(lead_data.get('last_video_paraphrase', ''))
+            elif header == "Loom code":
+                row.append("") # Placeholder for manual entry
+            elif header == "Loom URL":
+                row.append("") # Placeholder for manual entry
+            elif header == "Spacer H":
+                row.append("") # Spacer
+            elif header == "channel name":
+                row.append(lead_data.get('channel_title', ''))
+            elif header == "Spacer J":
+                row.append("") # Spacer
+            elif header == "channel ID":
+                row.append(lead_data.get('channel_id', ''))
+            elif header == "product":
+                # Use description as requested, fallback to type
+                desc = lead_data.get('product_description', '')
+                ptype = lead_data.get('product_type', '')
+                if desc:
+                    row.append(desc)
+                else:
+                    row.append(ptype)
+            elif header == "product name":
+                row.append(lead_data.get('product_name', ''))
+            else:
+                row.append("")
+        return row
+
+    def append_rows(self, rows):
+        """
+        Appends rows with a single API call, adding headers first if the sheet
+        is empty. Quota (429) and transient errors are retried (see
+        rate_limit.py); raises once retries are exhausted.
+        """
+        if not self.has_headers():
+            rows = [config.INSTANTLY_HEADERS] + list(rows)
+
+        worksheet = self.get_worksheet()
+        with self.metrics.measure("sheets.append") as sample:
+            sample["bytes"] += len(json.dumps(rows, default=str))
+            self.guard.call(worksheet.append_rows, rows)
+        self._has_headers = True
 
     def append_lead(self, lead_data):
         """
         Appends a lead row to the Google Sheet.
         """
         try:
-            sh = self.gc.open_by_key(self.sheet_id)
-            try:
-                worksheet = sh.worksheet(self.tab_name)
-            except gspread.exceptions.WorksheetNotFound:
-                # Create worksheet if it doesn't exist
-                worksheet = sh.add_worksheet(title=self.tab_name, rows=1000, cols=25)
-                # Add headers
-            # Map lead_data to columns based on config.INSTANTLY_HEADERS
-            # Headers: name, email, YouTube handle, about link, transcript, channel name, channel ID, product, product name
-            
-            # If worksheet is empty, add headers
-            if worksheet.row_count == 0 or not worksheet.row_values(1):
-                 worksheet.append_row(config.INSTANTLY_HEADERS)
-
-            row = []
-            for header in config.INSTANTLY_HEADERS:
-                if header == "name":
-                    row.append(lead_data.get('contact_name', ''))
-                elif header == "email":
-                    row.append(lead_data.get('email', ''))
-                elif header == "YouTube handle":
-                    row.append(lead_data.get('channel_url', ''))
-                elif header == "about link":
-                    row.append("") # Placeholder as requested
-                elif header == "transcript":
-                    row.append(lead_data.get('last_video_paraphrase', ''))
-                elif header == "Loom code":
-                    row.append("") # Placeholder for manual entry
-                elif header == "Loom URL":
-                    row.append("") # Placeholder for manual entry
-                elif header == "Spacer H":
-                    row.append("") # Spacer
-                elif header == "channel name":
-                    row.append(lead_data.get('channel_title', ''))
-                elif header == "Spacer J":
-                    row.append("") # Spacer
-                elif header == "channel ID":
-                    row.append(lead_data.get('channel_id', ''))
-                elif header == "product":
-                    # Use description as requested, fallback to type
-                    desc = lead_data.get('product_description', '')
-                    ptype = lead_data.get('product_type', '')
-                    if desc:
-                        row.append(desc)
-                    else:
-                        row.append(ptype)
-                elif header == "product name":
-                    row.append(lead_data.get('product_name', ''))
-                else:
-                    row.append("")
-
-            
-            worksheet.append_row(row)
+            self.append_rows([self.lead_to_row(lead_data)])
             return True
         except Exception as e:
             print(f"Google Sheets error: {repr(e)}")
             import traceback
             traceback.print_exc()
             return False
+
+class BufferedSheetsWriter:
+    """
+    Collects lead rows and writes them with one append_rows call once
+    `flush_rows` rows are buffered, `flush_seconds` after the first row was
+    buffered (a linger timer, like batching.MicroBatcher's), or when close()
+    is called at the end of a run.
+
+    Every row is first appended to a local spool file and only removed from
+    it after a successful flush, so rows buffered when the process dies are
+    written by the next writer that opens the same spool.
+    """
+    def __init__(self, sheets, spool_path=None, flush_rows=None, flush_seconds=None):
+        self.sheets = sheets
+        self.spool_path = spool_path or config.SHEETS_SPOOL_PATH
+        self.flush_rows = flush_rows or config.SHEETS_FLUSH_ROWS
+        self.flush_seconds = config.SHEETS_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        # _lock guards the buffer and the spool; _flush_lock keeps one
+        # append_rows call in flight, so rows reach the sheet in order
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._closed = False
+        self._rows = self._load_spool()
+        # Rows left in the spool by an interrupted run
+        self.recovered = len(self._rows)
+        self.rows_written = 0
+        if self._rows:
+            with self._lock:
+                self._arm()
+
+    def _load_spool(self):
+        if not os.path.exists(self.spool_path):
+            return []
+        rows = []
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Partial last line from a crash mid-write
+                    continue
+        return rows
+
+    def _write_spool(self, rows):
+        directory = os.path.dirname(self.spool_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.spool_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def _arm(self):
+        # Called with self._lock held
+        if self._timer is None and not self._closed:
+            self._timer = threading.Timer(self.flush_seconds, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+        with self._lock:
+            # Rows that failed to write, or arrived during the flush
+            if self._rows:
+                self._arm()
+
+    def add(self, lead_data):
+        """
+        Buffers a lead. Returns False if a triggered flush failed (the rows
+        stay buffered and spooled for the next attempt).
+        """
+        row = self.sheets.lead_to_row(lead_data)
+        with self._lock:
+            directory = os.path.dirname(self.spool_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._rows.append(row)
+            self._arm()
+            due = len(self._rows) >= self.flush_rows
+        if due:
+            # A flush already in flight leaves these rows to the next one
+            return self.flush(wait=False)
+        return True
+
+    def flush(self, wait=True):
+        """
+        Writes all buffered rows. Returns True on success (or nothing to do).
+        The buffer is swapped out under the lock and written outside it, so
+        add() never waits on the network. With `wait=False`, returns at once
+        if another flush is in flight.
+        """
+        if not self._flush_lock.acquire(blocking=wait):
+            return True
+        try:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return True
+            try:
+                self.sheets.append_rows(rows)
+            except Exception as e:
+                print(f"Google Sheets error: {repr(e)}")
+                with self._lock:
+                    # Still in the spool; back in front of newer rows
+                    self._rows = rows + self._rows
+                return False
+            with self._lock:
+                self._write_spool(self._rows)
+                self.rows_written += len(rows)
+            return True
+        finally:
+            self._flush_lock.release()
+
+    def close(self):
+        """
+        Flushes remaining rows at the end of a run. Returns the number of rows
+        still pending (0 when everything was written).
+        """
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.flush()
+        with self._lock:
+            return len(self._rows)
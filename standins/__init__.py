@@ -0,0 +1,4 @@
+"""
+Local stand-ins for the external services, for offline testing and
+benchmarking without spending real quota.
+"""
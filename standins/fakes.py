@@ -0,0 +1,525 @@
+"""
+In-process fakes of the YouTube, Apify, OpenAI, Supabase and Google Sheets
+SDK objects the clients talk to, for offline benchmarks.
+
+Only the SDK layer is replaced, so the real clients (caching, batching,
+rate limiting, retries, instrumentation) are exercised end to end:
+
+    services = FakeServices(FakeWorld(seed=1), PROFILES["realistic"])
+    with services.install():
+        run_pipeline(...)
+    services.call_counts()
+
+Each service has a Backend with configurable latency, error rate and rate
+limit. Throttled calls raise a 429 carrying Retry-After and failed calls a
+503, in the shape each SDK uses, so the shared retry engine handles them
+as it would in production.
+"""
+from contextlib import contextmanager
+from types import SimpleNamespace
+import collections
+import datetime
+import json
+import random
+import threading
+import time
+import zlib
+
+from googleapiclient.errors import HttpError
+import httplib2
+
+from standins.openai_batch import fake_completion
+
+class FakeApiError(Exception):
+    """
+    Error raised by the Apify, OpenAI, Supabase and Sheets fakes. Carries
+    `status_code` and a response with Retry-After, like the SDK errors.
+    """
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"fake service returned {status}")
+        self.status_code = status
+        headers = {"retry-after": str(retry_after)} if retry_after else {}
+        self.response = SimpleNamespace(status_code=status, headers=headers)
+
+def fake_api_error(status, retry_after=None):
+    return FakeApiError(status, retry_after)
+
+def youtube_http_error(status, retry_after=None):
+    headers = {"status": status}
+    if retry_after:
+        headers["retry-after"] = str(retry_after)
+    return HttpError(httplib2.Response(headers), b'{"error": "fake"}')
+
+class Backend:
+    """
+    Latency, error-rate and rate-limit behaviour of one fake service.
+    A call sleeps `latency + per_item * items` seconds; `error_rate` of
+    calls fail with a 503; more than `rate_limit` calls within one second
+    are rejected with a 429.
+    """
+    def __init__(self, name, latency=0.0, per_item=0.0, error_rate=0.0, rate_limit=None,
+                 seed=0, error=fake_api_error):
+        self.name = name
+        self.latency = latency
+        self.per_item = per_item
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.error = error
+        self._random = random.Random(seed)
+        self._recent = collections.deque()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.items = 0
+        self.failed = 0
+        self.throttled = 0
+        self.first_call = None
+
+    def call(self, items=1):
+        with self._lock:
+            self.calls += 1
+            if self.first_call is None:
+                self.first_call = time.time()
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if self.rate_limit and len(self._recent) >= self.rate_limit:
+                self.throttled += 1
+                raise self.error(429, retry_after=round(1.0 - (now - self._recent[0]), 2))
+            self._recent.append(now)
+            if self._random.random() < self.error_rate:
+                self.failed += 1
+                raise self.error(503)
+            self.items += items
+        time.sleep(self.latency + self.per_item * items)
+
+    def counts(self):
+        return {"calls": self.calls, "items": self.items, "failed": self.failed, "throttled": self.throttled}
+
+# Latency (seconds), error rate and rate limit (calls/second) per service.
+PROFILES = {
+    "instant": {},
+    "realistic": {
+        "youtube": {"latency": 0.05},
+        "apify": {"latency": 1.0, "per_item": 0.05},
+        "openai": {"latency": 0.4, "per_item": 0.1},
+        "supabase": {"latency": 0.03},
+        "sheets": {"latency": 0.2}
+    },
+    "flaky": {
+        "youtube": {"latency": 0.05, "error_rate": 0.05, "rate_limit": 20},
+        "apify": {"latency": 1.0, "per_item": 0.05, "error_rate": 0.05, "rate_limit": 2},
+        "openai": {"latency": 0.4, "per_item": 0.1, "error_rate": 0.05, "rate_limit": 5},
+        "supabase": {"latency": 0.03, "error_rate": 0.05, "rate_limit": 20},
+        "sheets": {"latency": 0.2, "error_rate": 0.05, "rate_limit": 1}
+    }
+}
+
+def _stable_hash(*parts):
+    return zlib.crc32("|".join(str(p) for p in parts).encode("utf-8"))
+
+class FakeWorld:
+    """
+    Deterministic fake data shared by the services: a universe of channels
+    (so different keywords find overlapping channels), their details,
+    emails and latest uploads.
+    """
+    COUNTRIES = ["US", "US", "US", "UK", "CA", "AU", "DE", "FR", "IN", "BR"]
+    LANGUAGES = ["en", "es", "de", "fr", "pt"]
+    WORDS = ["growth", "marketing", "coaching", "business", "weekly", "videos", "strategy",
+             "online", "course", "tips", "creator", "subscribe", "community", "podcast"]
+
+    def __init__(self, seed=1, universe=20000, results_per_keyword=150,
+                 description_email_rate=0.2, scraped_email_rate=0.5, existing_rate=0.1):
+        self.seed = seed
+        self.universe = universe
+        self.results_per_keyword = results_per_keyword
+        self.description_email_rate = description_email_rate
+        self.scraped_email_rate = scraped_email_rate
+        self.existing_rate = existing_rate
+
+    def _rand(self, *parts):
+        return random.Random(_stable_hash(self.seed, *parts))
+
+    def channel_id(self, n):
+        return f"UC{n:022d}"
+
+    def search(self, keyword, max_results, page_token):
+        """
+        Returns (channel_ids, next_page_token) for one results page.
+        """
+        offset = int(page_token or 0)
+        rng = self._rand("search", keyword)
+        results = [self.channel_id(rng.randrange(self.universe)) for _ in range(self.results_per_keyword)]
+        page = results[offset:offset + max_results]
+        next_offset = offset + max_results
+        return page, (str(next_offset) if next_offset < len(results) else None)
+
+    def channel(self, channel_id):
+        """
+        Returns a channels().list resource with the parts the pipeline
+        requests, sized like real ones (long descriptions, thumbnails,
+        branding keywords, localizations).
+        """
+        rng = self._rand("channel", channel_id)
+        title = f"Creator {channel_id[-6:]}"
+        description = "Business tips every week. " + " ".join(
+            rng.choice(self.WORDS) for _ in range(rng.randrange(20, 300))
+        )
+        if rng.random() < self.description_email_rate:
+            description += f"\nBusiness inquiries: creator{channel_id[-6:]} [at] gmail [dot] com"
+        country = rng.choice(self.COUNTRIES)
+        thumbnail = f"https://yt3.ggpht.com/{channel_id}"
+        return {
+            "kind": "youtube#channel",
+            "etag": f"etag-{_stable_hash(channel_id)}",
+            "id": channel_id,
+            "snippet": {
+                "title": title,
+                "description": description,
+                "customUrl": f"@creator{channel_id[-6:]}",
+                "publishedAt": f"20{rng.randrange(10, 24)}-0{rng.randrange(1, 10)}-1{rng.randrange(10)}T12:00:00Z",
+                "thumbnails": {
+                    size: {"url": f"{thumbnail}=s{px}-c-k-c0x00ffffff-no-rj", "width": px, "height": px}
+                    for size, px in (("default", 88), ("medium", 240), ("high", 800))
+                },
+                "localized": {"title": title, "description": description},
+                "country": country
+            },
+            "statistics": {
+                "subscriberCount": str(int(10 ** rng.uniform(2, 6))),
+                "viewCount": str(rng.randrange(10 ** 7)),
+                "hiddenSubscriberCount": False,
+                "videoCount": str(rng.randrange(1, 500))
+            },
+            "contentDetails": {"relatedPlaylists": {"likes": "", "uploads": "UU" + channel_id[2:]}},
+            "brandingSettings": {
+                "channel": {
+                    "title": title,
+                    "description": description,
+                    "keywords": " ".join(rng.choice(self.WORDS) for _ in range(15)),
+                    "unsubscribedTrailer": channel_id[-11:],
+                    "country": country
+                },
+                "image": {"bannerExternalUrl": f"{thumbnail}/banner"}
+            },
+            "localizations": {
+                language: {"title": title, "description": description}
+                for language in rng.sample(self.LANGUAGES, rng.randrange(0, 3))
+            }
+        }
+
+    def latest_video(self, playlist_id):
+        days_ago = self._rand("upload", playlist_id).expovariate(1 / 60)
+        published = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days_ago)
+        return {
+            "title": f"How I grew {playlist_id[-6:]} to 10k",
+            "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "resourceId": {"videoId": playlist_id[-11:]}
+        }
+
+    def scraped_emails(self, url):
+        rng = self._rand("apify", url)
+        if rng.random() < self.scraped_email_rate:
+            return [f"hello{_stable_hash(url) % 100000}@creatormail.com"]
+        return ["info@creatormail.com"] if rng.random() < 0.5 else []
+
+    def existing(self, channel_id):
+        return self._rand("existing", channel_id).random() < self.existing_rate
+
+# YouTube (googleapiclient service)
+
+class _FakeRequest:
+    def __init__(self, backend, handler, items=1):
+        self.backend = backend
+        self.handler = handler
+        self.items = items
+
+    def execute(self):
+        self.backend.call(self.items)
+        return self.handler()
+
+class _FakeBatch:
+    def __init__(self, backend, callback):
+        self.backend = backend
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id or str(len(self.requests)), request))
+
+    def execute(self):
+        self.backend.call(len(self.requests))
+        for request_id, request in self.requests:
+            self.callback(request_id, request.handler(), None)
+
+class FakeYouTube:
+    def __init__(self, world, backend):
+        self.world = world
+        self.backend = backend
+
+    def search(self):
+        world, backend = self.world, self.backend
+
+        def list(q, maxResults, pageToken=None, **kwargs):
+            def handler():
+                ids, token = world.search(q, maxResults, pageToken)
+                return {"items": [{"snippet": {"channelId": i}} for i in ids], "nextPageToken": token}
+            return _FakeRequest(backend, handler)
+        return SimpleNamespace(list=list)
+
+    def channels(self):
+        world, backend = self.world, self.backend
+
+        def list(id, **kwargs):
+            ids = id.split(",")
+            return _FakeRequest(backend, lambda: {"items": [world.channel(i) for i in ids]}, items=len(ids))
+        return SimpleNamespace(list=list)
+
+    def playlistItems(self):
+        world, backend = self.world, self.backend
+
+        def list(playlistId, **kwargs):
+            return _FakeRequest(backend, lambda: {"items": [{"snippet": world.latest_video(playlistId)}]})
+        return SimpleNamespace(list=list)
+
+    def new_batch_http_request(self, callback):
+        return _FakeBatch(self.backend, callback)
+
+# Apify (apify_client.ApifyClient)
+
+def apify_run(run_id, dataset_id, status="SUCCEEDED", compute_units=0.0):
+    """
+    An actor run as apify-client 3.x returns it: a pydantic Run model.
+    """
+    from apify_client._models import Run
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return Run.model_validate({
+        "id": run_id,
+        "actId": "fake-actor",
+        "userId": "fake-user",
+        "startedAt": now,
+        "finishedAt": now if status != "RUNNING" else None,
+        "status": status,
+        "meta": {"origin": "API"},
+        "stats": {"computeUnits": compute_units},
+        "options": {"build": "latest", "timeoutSecs": 3600, "memoryMbytes": 1024, "diskMbytes": 2048},
+        "buildId": "fake-build",
+        "defaultKeyValueStoreId": f"store-{run_id}",
+        "defaultDatasetId": dataset_id,
+        "defaultRequestQueueId": f"queue-{run_id}"
+    })
+
+class FakeApifyClient:
+    def __init__(self, world, backend):
+        self.world = world
+        self.backend = backend
+        self._datasets = {}
+        self._runs = {}
+        self._lock = threading.Lock()
+        self.started = 0
+
+    def actor(self, actor_id):
+        def start(run_input):
+            urls = [start["url"] for start in run_input.get("startUrls", [])]
+            self.backend.call(len(urls))
+            items = [
+                {"inputUrl": url, "emails": self.world.scraped_emails(url)}
+                for url in urls
+            ]
+            with self._lock:
+                self.started += 1
+                dataset_id = f"dataset-{len(self._datasets) + 1}"
+                self._datasets[dataset_id] = items
+                run = apify_run(f"run-{dataset_id}", dataset_id, compute_units=0.002 * len(urls))
+                self._runs[run.id] = run
+            return run
+        return SimpleNamespace(start=start)
+
+    def run(self, run_id):
+        def wait_for_finish(wait_duration=None):
+            # The scraping time was spent in start()
+            with self._lock:
+                return self._runs.get(run_id)
+        return SimpleNamespace(wait_for_finish=wait_for_finish)
+
+    def dataset(self, dataset_id):
+        with self._lock:
+            items = self._datasets.get(dataset_id, [])
+        return SimpleNamespace(iterate_items=lambda: iter(items))
+
+# OpenAI (openai.OpenAI, chat completions only)
+
+class FakeOpenAI:
+    def __init__(self, backend):
+        self.backend = backend
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **body):
+        completion = fake_completion(body)
+        content = completion["choices"][0]["message"]["content"]
+        parsed = json.loads(content)
+        channels = len(parsed["channels"]) if isinstance(parsed.get("channels"), list) else len(parsed)
+        self.backend.call(max(1, channels))
+        usage = dict(completion["usage"])
+        usage["prompt_tokens_details"] = SimpleNamespace(**usage["prompt_tokens_details"])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content, refusal=None))],
+            usage=SimpleNamespace(**usage)
+        )
+
+# Supabase (supabase.Client, the query builder calls SupabaseClient uses)
+
+class _FakeQuery:
+    def __init__(self, db, op=None, rows=None):
+        self.db = db
+        self.op = op
+        self.rows = rows
+        self.ids = None
+        self.after = {}
+        self.order_by = None
+        self.count = None
+
+    def select(self, *columns):
+        self.op = "select"
+        return self
+
+    def in_(self, column, values):
+        self.ids = list(values)
+        return self
+
+    def gt(self, column, value):
+        self.after[column] = value
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = column
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def upsert(self, rows, **kwargs):
+        self.op = "upsert"
+        self.rows = rows
+        return self
+
+    def execute(self):
+        return self.db.execute(self)
+
+class FakeSupabase:
+    def __init__(self, world, backend):
+        self.world = world
+        self.backend = backend
+        self.saved = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return _FakeQuery(self)
+
+    def _exists(self, channel_id):
+        return channel_id in self.saved or self.world.existing(channel_id)
+
+    def execute(self, query):
+        if query.op == "upsert":
+            self.backend.call(len(query.rows))
+            with self._lock:
+                for row in query.rows:
+                    self.saved.setdefault(row["channel_id"], row)
+            return SimpleNamespace(data=[])
+        if query.ids is not None:
+            self.backend.call(len(query.ids))
+            with self._lock:
+                return SimpleNamespace(data=[{"channel_id": i} for i in query.ids if self._exists(i)])
+        # Index warm-up: only rows saved by this fake (pre-existing ones
+        # are discovered by the `in_` checks)
+        self.backend.call()
+        with self._lock:
+            ids = sorted(self.saved)
+        if "channel_id" in query.after:
+            ids = [i for i in ids if i > query.after["channel_id"]]
+        return SimpleNamespace(data=[{"channel_id": i} for i in ids[:query.count]])
+
+# Google Sheets (gspread client)
+
+class FakeWorksheet:
+    def __init__(self, backend):
+        self.backend = backend
+        self.rows = []
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    def row_values(self, index):
+        self.backend.call()
+        return self.rows[index - 1] if len(self.rows) >= index else []
+
+    def append_rows(self, rows):
+        self.backend.call(len(rows))
+        with self._lock:
+            self.rows.extend(rows)
+
+class FakeGspread:
+    def __init__(self, backend):
+        self.backend = backend
+        self.worksheet = FakeWorksheet(backend)
+
+    def open_by_key(self, key):
+        self.backend.call()
+        return SimpleNamespace(
+            worksheet=lambda name: self.worksheet,
+            add_worksheet=lambda **kwargs: self.worksheet
+        )
+
+# Wiring
+
+class FakeServices:
+    """
+    The five fake services over one FakeWorld. `install()` connects the clients
+    to them instead of the real SDKs for the duration of a `with` block.
+    """
+    SERVICES = ("youtube", "apify", "openai", "supabase", "sheets")
+
+    def __init__(self, world=None, profile=None, seed=0):
+        self.world = world or FakeWorld()
+        profile = profile or {}
+        self.backends = {}
+        for name in self.SERVICES:
+            error = youtube_http_error if name == "youtube" else fake_api_error
+            self.backends[name] = Backend(name, seed=seed, error=error, **profile.get(name, {}))
+        self.apify = FakeApifyClient(self.world, self.backends["apify"])
+        self.supabase = FakeSupabase(self.world, self.backends["supabase"])
+        self.gspread = FakeGspread(self.backends["sheets"])
+
+    def call_counts(self):
+        return {name: backend.counts() for name, backend in self.backends.items()}
+
+    @contextmanager
+    def install(self):
+        """
+        Points every client's SDK connection (see their `_connect`) at the
+        fakes while the block runs.
+        """
+        from youtube_client import YouTubeClient
+        from email_discovery_client import ApifyEmailClient
+        from llm_client import LLMClient
+        from supabase_client import SupabaseClient
+        from sheets_client import SheetsClient
+
+        patches = [
+            (YouTubeClient, lambda client: FakeYouTube(self.world, self.backends["youtube"])),
+            (ApifyEmailClient, lambda client: self.apify),
+            (LLMClient, lambda client: FakeOpenAI(self.backends["openai"])),
+            (SupabaseClient, lambda client: self.supabase),
+            (SheetsClient, lambda client: self.gspread)
+        ]
+        originals = [(cls, cls.__dict__["_connect"]) for cls, _ in patches]
+        try:
+            for cls, connect in patches:
+                cls._connect = connect
+            yield self
+        finally:
+            for cls, connect in originals:
+                cls._connect = connect
@@ -0,0 +1,209 @@
+"""
+Minimal local stand-in for the OpenAI chat completions, files and Batch
+API endpoints used by LLMClient.
+
+    python -m standins.openai_batch --port 8765 --delay 5
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test ...
+
+Enrichments are canned: every "### Channel <key>" block in a prompt gets an
+entry derived from its channel title, in the structured output shape when
+the request asks for a JSON schema. Batches complete `delay` seconds after
+they are created.
+"""
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+
+CHANNEL_RE = re.compile(r"^### Channel (\S+)\s*$\nChannel Title: (.*)$", re.MULTILINE)
+
+def fake_enrichment(title):
+    first = (title or "Unknown").split()[0]
+    return {
+        "contact_name": first,
+        "contact_name_confidence": "Low",
+        "product_type": "online course",
+        "product_description": f"Course by {title}",
+        "product_name": "course",
+        "last_video_paraphrase": "growing a business",
+        "channel_description_short": f"{title} channel"
+    }
+
+def fake_completion(body):
+    messages = body.get("messages", [])
+    prompt = "\n".join(m.get("content", "") for m in messages)
+    entries = {key: fake_enrichment(title) for key, title in CHANNEL_RE.findall(prompt)}
+    if body.get("response_format", {}).get("type") == "json_schema":
+        content = {"channels": [dict(entry, key=key) for key, entry in entries.items()]}
+    else:
+        content = entries
+    # Like OpenAI: a system prompt of 1024 tokens or more is served from the
+    # prompt cache, in 128-token increments
+    system = sum(len(m.get("content", "")) // 4 for m in messages if m.get("role") == "system")
+    cached = system // 128 * 128 if system >= 1024 else 0
+    return {
+        "id": "chatcmpl-standin",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "standin"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": json.dumps(content)}
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "prompt_tokens_details": {"cached_tokens": cached},
+            "completion_tokens": 60 * len(entries),
+            "total_tokens": len(prompt) // 4 + 60 * len(entries)
+        }
+    }
+
+class StandinState:
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.files = {}
+        self.batches = {}
+
+    def new_id(self, prefix):
+        with self.lock:
+            return f"{prefix}-{next(self.ids)}"
+
+    def file_object(self, file_id):
+        data = self.files[file_id]
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data["content"]),
+            "created_at": data["created_at"],
+            "filename": data["filename"],
+            "purpose": data["purpose"],
+            "status": "processed"
+        }
+
+    def batch_object(self, batch_id):
+        batch = self.batches[batch_id]
+        if batch["status"] == "in_progress" and time.time() - batch["created_at"] >= self.delay:
+            self.complete(batch)
+        return dict(batch)
+
+    def complete(self, batch):
+        lines = []
+        for line in self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            lines.append(json.dumps({
+                "id": self.new_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": fake_completion(request["body"])},
+                "error": None
+            }))
+        output_id = self.new_id("file")
+        self.files[output_id] = {
+            "content": ("\n".join(lines) + "\n").encode("utf-8"),
+            "created_at": int(time.time()),
+            "filename": f"{batch['id']}_output.jsonl",
+            "purpose": "batch_output"
+        }
+        batch.update({
+            "status": "completed",
+            "output_file_id": output_id,
+            "completed_at": int(time.time()),
+            "request_counts": {"total": len(lines), "completed": len(lines), "failed": 0}
+        })
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, payload, status=200, raw=None):
+            body = raw if raw is not None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json" if raw is None else "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_POST(self):
+            path = self.path.split("?")[0].rstrip("/")
+            if path.endswith("/chat/completions"):
+                return self._send(fake_completion(json.loads(self._body())))
+
+            if path.endswith("/files"):
+                raw = self._body()
+                message = BytesParser(policy=default_policy).parsebytes(
+                    b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + raw
+                )
+                fields = {}
+                for part in message.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    fields[name] = (part.get_filename(), part.get_payload(decode=True))
+                file_id = state.new_id("file")
+                state.files[file_id] = {
+                    "content": fields["file"][1],
+                    "created_at": int(time.time()),
+                    "filename": fields["file"][0] or "upload.jsonl",
+                    "purpose": fields.get("purpose", (None, b"batch"))[1].decode()
+                }
+                return self._send(state.file_object(file_id))
+
+            if path.endswith("/batches"):
+                request = json.loads(self._body())
+                batch_id = state.new_id("batch")
+                state.batches[batch_id] = {
+                    "id": batch_id,
+                    "object": "batch",
+                    "endpoint": request["endpoint"],
+                    "input_file_id": request["input_file_id"],
+                    "completion_window": request.get("completion_window", "24h"),
+                    "status": "in_progress",
+                    "created_at": int(time.time()),
+                    "output_file_id": None,
+                    "error_file_id": None
+                }
+                return self._send(state.batch_object(batch_id))
+
+            self._send({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+        def do_GET(self):
+            path = self.path.split("?")[0].rstrip("/")
+            parts = path.split("/")
+            if "batches" in parts and parts[-1] in state.batches:
+                return self._send(state.batch_object(parts[-1]))
+            if path.endswith("/content") and parts[-2] in state.files:
+                return self._send(None, raw=state.files[parts[-2]]["content"])
+            if "files" in parts and parts[-1] in state.files:
+                return self._send(state.file_object(parts[-1]))
+            self._send({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+    return Handler
+
+def serve(port=0, delay=0.0):
+    """
+    Starts the stand-in on a background thread. Returns (server, base_url);
+    call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(StandinState(delay)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=5.0, help="Seconds until a batch completes")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(StandinState(args.delay)))
+    print(f"OpenAI stand-in listening on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
@@ -1,52 +1,196 @@
-from supabase import create_client, Client
+from batching import MicroBatcher
+from channel_index import ChannelIndex
+from rate_limit import guard
+from metrics import Metrics
 import config
+import transport
+import json
+import threading
 
 class SupabaseClient:
-    def __init__(self):
+    # Max channel IDs per `in_` filter, to keep the request URL short
+    IN_CHUNK_SIZE = 200
+
+    def __init__(self, index=None, metrics=None):
         self.url: str = config.SUPABASE_URL
         self.key: str = config.SUPABASE_KEY
-        self.supabase: Client = create_client(self.url, self.key)
+        self._supabase = None
+        self._supabase_lock = threading.Lock()
         self.table_name = "leads" # Assuming table name is 'leads'
+        self.index = index if index is not None else ChannelIndex(config.CHANNEL_INDEX_PATH)
+        self.guard = guard("supabase")
+        self.metrics = metrics if metrics is not None else Metrics()
 
-    def check_channel_exists(self, channel_id):
+    def _connect(self):
+        from supabase import create_client, ClientOptions
+        return create_client(self.url, self.key, options=ClientOptions(httpx_client=transport.httpx_client("supabase")))
+
+    @property
+    def supabase(self):
         """
-        Checks if a channel ID already exists in the database.
+        The Supabase SDK client, created (and supabase imported) on first use.
+        """
+        with self._supabase_lock:
+            if self._supabase is None:
+                self._supabase = self._connect()
+            return self._supabase
+
+    def fetch_channel_ids(self, since=None, page_size=1000):
+        """
+        Yields every channel ID in the database, or only those saved after
+        `since` (a timestamp string), one page at a time.
+        Pages are ordered by channel_id and each starts after the last ID of
+        the previous one (not at an offset), so rows inserted meanwhile
+        cannot make pages overlap or skip rows.
+        """
+        last = None
+        while True:
+            query = self.supabase.table(self.table_name).select("channel_id")
+            if since:
+                query = query.gt("timestamp", since)
+            if last is not None:
+                query = query.gt("channel_id", last)
+            query = query.order("channel_id").limit(page_size)
+            with self.metrics.measure("supabase.index") as sample:
+                response = self.guard.call(query.execute)
+                sample["bytes"] += len(json.dumps(response.data or []))
+            rows = response.data or []
+            for row in rows:
+                yield row["channel_id"]
+            if len(rows) < page_size:
+                return
+            last = rows[-1]["channel_id"]
+
+    def warm_index(self):
+        """
+        Loads channel IDs saved since the last warm into the local index.
+        Returns the number of newly indexed channels.
         """
         try:
-            response = self.supabase.table(self.table_name).select("channel_id", count="exact").eq("channel_id", channel_id).execute()
-            # If count is greater than 0, it exists
-            # Note: The response format depends on the supabase-py version, but generally .data or .count works
-            if response.data:
-                return True
-            return False
+            return self.index.warm(self.fetch_channel_ids)
         except Exception as e:
-            print(f"Supabase check error: {e}")
-            # If error, assume it doesn't exist to be safe, or handle otherwise?
-            # Better to log and maybe fail open or closed. Failsafe: return False (process it)
-            return False
+            print(f"Supabase index warm error: {e}")
+            return 0
+
+    def check_channels_exist(self, channel_ids):
+        """
+        Returns the subset of channel IDs that already exist in the database.
+        IDs in the local index are answered without a network call; the rest
+        are resolved with one `in_` query per IN_CHUNK_SIZE IDs.
+        """
+        existing = {cid for cid in channel_ids if cid in self.index}
+        unknown = list(dict.fromkeys(cid for cid in channel_ids if cid not in existing))
+
+        for start in range(0, len(unknown), self.IN_CHUNK_SIZE):
+            chunk = unknown[start:start + self.IN_CHUNK_SIZE]
+            try:
+                query = self.supabase.table(self.table_name).select("channel_id").in_("channel_id", chunk)
+                with self.metrics.measure("supabase.check") as sample:
+                    response = self.guard.call(query.execute)
+                    sample["bytes"] += len(json.dumps(response.data or []))
+                found = {row["channel_id"] for row in response.data or []}
+                self.index.add(found)
+                existing.update(found)
+            except Exception as e:
+                print(f"Supabase check error: {e}")
+                # Failsafe: treat unresolved channels as new (process them)
+
+        return existing
+
+    def check_channel_exists(self, channel_id):
+        """
+        Checks if a channel ID already exists in the database.
+        """
+        return channel_id in self.check_channels_exist([channel_id])
+
+    def lead_to_row(self, lead_data):
+        """
+        Prepares lead data to match the table schema.
+        """
+        return {
+            "channel_id": lead_data.get("channel_id"),
+            "primary_email": lead_data.get("email"),
+            "all_emails": lead_data.get("all_emails", []), # JSON array
+            "subscriber_count": lead_data.get("subscriber_count"),
+            "contact_name": lead_data.get("contact_name"),
+            "product_type": lead_data.get("product_type"),
+            "product_description": lead_data.get("product_description"),
+            "website_url": lead_data.get("website_url"),
+            "last_video_title": lead_data.get("last_video_title"),
+            "last_video_paraphrase": lead_data.get("last_video_paraphrase"),
+            "timestamp": lead_data.get("timestamp")
+        }
+
+    def _upsert(self, rows):
+        from postgrest.types import ReturnMethod
+        # A row whose channel_id already exists is a no-op, not an error.
+        query = self.supabase.table(self.table_name).upsert(
+            rows,
+            on_conflict="channel_id",
+            ignore_duplicates=True,
+            returning=ReturnMethod.minimal
+        )
+        with self.metrics.measure("supabase.save") as sample:
+            sample["bytes"] += len(json.dumps(rows, default=str))
+            self.guard.call(query.execute)
+
+    def save_leads(self, leads, chunk_size=None):
+        """
+        Saves many leads with one bulk upsert (keyed on channel_id) per chunk.
+        If a chunk fails, its rows are retried one by one so a single bad row
+        doesn't fail the others. Returns a list of booleans, one per lead.
+        """
+        chunk_size = chunk_size or config.SUPABASE_BATCH_SIZE
+        rows = [self.lead_to_row(lead) for lead in leads]
+        results = [False] * len(rows)
+
+        for start in range(0, len(rows), chunk_size):
+            indexes = range(start, min(start + chunk_size, len(rows)))
+            # Duplicates within one statement would conflict with each other
+            unique = {}
+            for i in indexes:
+                unique.setdefault(rows[i]["channel_id"], rows[i])
+
+            try:
+                self._upsert(list(unique.values()))
+                saved = set(unique)
+            except Exception as e:
+                print(f"Supabase save error: {e}")
+                saved = set()
+                for channel_id, row in unique.items():
+                    try:
+                        self._upsert([row])
+                        saved.add(channel_id)
+                    except Exception as row_error:
+                        print(f"Supabase save error ({channel_id}): {row_error}")
+
+            self.index.add(saved)
+            for i in indexes:
+                results[i] = rows[i]["channel_id"] in saved
+
+        return results
 
     def save_lead(self, lead_data):
         """
         Saves a lead to the database.
         """
-        try:
-            # Prepare data to match schema
-            data = {
-                "channel_id": lead_data.get("channel_id"),
-                "primary_email": lead_data.get("email"),
-                "all_emails": lead_data.get("all_emails", []), # JSON array
-                "subscriber_count": lead_data.get("subscriber_count"),
-                "contact_name": lead_data.get("contact_name"),
-                "product_type": lead_data.get("product_type"),
-                "product_description": lead_data.get("product_description"),
-                "website_url": lead_data.get("website_url"),
-                "last_video_title": lead_data.get("last_video_title"),
-                "last_video_paraphrase": lead_data.get("last_video_paraphrase"),
-                "timestamp": lead_data.get("timestamp")
-            }
-            
-            self.supabase.table(self.table_name).insert(data).execute()
-            return True
-        except Exception as e:
-            print(f"Supabase save error: {e}")
-            return False
+        return self.save_leads([lead_data])[0]
+
+class SupabaseLeadBatcher(MicroBatcher):
+    """
+    Coalesces concurrent save_lead() calls from pipeline workers into bulk
+    upserts (see MicroBatcher). Each caller still gets its own row's result.
+    """
+    def __init__(self, client, max_batch=None, linger=None, limit=None):
+        super().__init__(
+            client.save_leads,
+            max_batch=max_batch or config.SUPABASE_BATCH_SIZE,
+            linger=config.SUPABASE_BATCH_LINGER_SECONDS if linger is None else linger,
+            limit=limit,
+            default=False,
+            name="Supabase save"
+        )
+        self.client = client
+
+    def save_lead(self, lead_data):
+        return self.submit(lead_data)
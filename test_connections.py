@@ -16,7 +16,7 @@ def test_youtube():
         details = client.get_channel_details(channels)
         if details:
             print(f"✅ Fetched details for {details[0]['snippet']['title']}")
-            latest_video = client.get_latest_video(channels[0])
+            latest_video = client.get_latest_video(details[0])
             if latest_video:
                 print(f"✅ Fetched latest video: {latest_video['title']}")
             else:
@@ -75,6 +75,7 @@ def test_apify():
     print("✅ Apify Client instantiated (Skipping actual run to save time/credits for now)")
 
 if __name__ == "__main__":
+    config.print_debug()
     test_youtube()
     test_supabase()
     test_llm()
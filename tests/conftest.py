@@ -0,0 +1,43 @@
+"""
+Shared fixtures. The tests run the real clients against the in-process
+fakes of standins/fakes.py, with every local state file in a temporary
+directory.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import rate_limit
+from benchmarks.run import STATE_PATHS
+from standins.fakes import FakeServices, FakeWorld, PROFILES
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """
+    Points every local state file at a temporary directory and shortens the
+    batching lingers and retry delays, so tests against instant fakes
+    stay fast.
+    """
+    for attr, filename in STATE_PATHS.items():
+        monkeypatch.setattr(config, attr, str(tmp_path / filename))
+    for attr in ("APIFY_BATCH_LINGER_SECONDS", "LLM_BATCH_LINGER_SECONDS",
+                 "SUPABASE_BATCH_LINGER_SECONDS", "YOUTUBE_BATCH_LINGER_SECONDS"):
+        monkeypatch.setattr(config, attr, 0.05)
+    monkeypatch.setattr(config, "METRICS_PORT", None)
+    monkeypatch.setattr(config, "RETRY_BASE_DELAY_SECONDS", 0.01)
+    rate_limit.reset()
+    yield tmp_path
+    rate_limit.reset()
+
+@pytest.fixture
+def services(state_dir):
+    """
+    Instant fake services, installed for the duration of the test.
+    """
+    fakes = FakeServices(FakeWorld(seed=1), PROFILES["instant"])
+    with fakes.install():
+        yield fakes
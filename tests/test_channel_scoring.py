@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+
+from channel_scoring import channel_frame, priority_scores, rejection_reasons, set_upload_dates
+from records import Channel
+
+RULES = {"allowed_countries": ["US", "UK"], "min_subs": 1000, "max_subs": 100000}
+
+# The per-channel filters the vectorized ones replaced
+def legacy_reason(channel, rules):
+    if channel.country not in rules["allowed_countries"]:
+        return f"Country {channel.country} not in allowed list."
+    if not (rules["min_subs"] <= channel.subscribers <= rules["max_subs"]):
+        return f"Subscribers {channel.subscribers} out of range."
+    return None
+
+CHANNELS = [
+    Channel("UC1", "in range", country="US", subscribers=5000, views=50000, videos=10),
+    Channel("UC2", "wrong country", country="DE", subscribers=5000),
+    Channel("UC3", "no country", country=None, subscribers=5000),
+    Channel("UC4", "too small", country="UK", subscribers=999),
+    Channel("UC5", "too big", country="US", subscribers=100001),
+    Channel("UC6", "both", country="FR", subscribers=5),
+    Channel("UC7", "lower bound", country="UK", subscribers=1000),
+    Channel("UC8", "upper bound", country="US", subscribers=100000),
+]
+
+def test_rejection_messages_match_the_per_channel_filters():
+    reasons = rejection_reasons(channel_frame(CHANNELS), RULES)
+    assert list(reasons) == [legacy_reason(channel, RULES) for channel in CHANNELS]
+
+def test_views_per_video_and_recency_rules():
+    channels = [
+        Channel("UC1", "busy", country="US", subscribers=5000, views=100000, videos=10),
+        Channel("UC2", "few views", country="US", subscribers=5000, views=100, videos=10),
+        Channel("UC3", "stale", country="US", subscribers=5000, views=100000, videos=10),
+        Channel("UC4", "no uploads", country="US", subscribers=5000, views=100000, videos=10),
+    ]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    frame = set_upload_dates(channel_frame(channels), {
+        "UC1": (now - datetime.timedelta(days=3)).isoformat(),
+        "UC2": (now - datetime.timedelta(days=3)).isoformat(),
+        "UC3": (now - datetime.timedelta(days=90)).isoformat(),
+    })
+    rules = dict(RULES, min_views_per_video=1000, max_days_since_upload=30)
+
+    assert list(rejection_reasons(frame, rules)) == [
+        None,
+        "Views per video 10 below 1000.",
+        "No upload in the last 30 days.",
+        "No upload in the last 30 days.",
+    ]
+
+def test_priority_scores_rank_and_validate_features():
+    channels = [
+        Channel("UC1", "small", subscribers=1000, views=10000, videos=10),
+        Channel("UC2", "big", subscribers=500000, views=5000000, videos=10, description="biz: a@b.com"),
+    ]
+    scores = priority_scores(channel_frame(channels), {"subscribers": 1.0, "description_email": 1.0})
+    assert 0 <= scores[0] < scores[1] <= 1
+
+    with pytest.raises(ValueError):
+        priority_scores(channel_frame(channels), {"followers": 1.0})
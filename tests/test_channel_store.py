@@ -0,0 +1,53 @@
+import sqlite3
+
+import config
+from channel_store import ChannelStore, changes
+from pipeline import run_pipeline
+from records import Channel
+
+SETTINGS = {
+    "keywords": ["growth coaching", "weekly podcast"], "max_channels": 20,
+    "cache_mode": "bypass", "refresh_mode": "incremental"
+}
+
+def test_stats_are_stored_with_the_email_outcome(tmp_path):
+    store = ChannelStore(str(tmp_path / "store.sqlite3"))
+    channel = Channel("UC1", "Creator", "About me", subscribers=5000, videos=10)
+    store.record_emails(channel, [])
+    record = store.get("UC1")
+    assert (record["email_outcome"], record["subscribers"], record["video_count"]) == ("none", 5000, 10)
+    assert changes(channel, record, 1000, 100000) == []
+
+    channel.videos = 11
+    assert changes(channel, record, 1000, 100000) == ["new upload"]
+    store.record_emails(channel, ["me@example.com"], "Apify")
+    record = store.get("UC1")
+    assert (record["email_outcome"], record["emails"], record["video_count"]) == ("found", ["me@example.com"], 11)
+    store.close()
+
+def test_changes_dropped_by_the_budget_are_seen_by_the_next_run(services):
+    run_pipeline(dict(SETTINGS, run_id="run-1"), status_callback=lambda message: None)
+    store = sqlite3.connect(config.CHANNEL_STORE_PATH)
+    changed = store.execute("SELECT channel_id FROM channels WHERE email_outcome = 'none' LIMIT 1").fetchone()[0]
+    store.close()
+
+    # A new upload on a channel where no email was found last time
+    channel = services.world.channel
+
+    def with_new_upload(channel_id):
+        resource = channel(channel_id)
+        if channel_id == changed:
+            resource["statistics"]["videoCount"] = str(int(resource["statistics"]["videoCount"]) + 1)
+        return resource
+
+    services.world.channel = with_new_upload
+    log = []
+    run_pipeline(dict(SETTINGS, run_id="run-2", paid_budget=0), status_callback=log.append)
+    assert any("Changed since last run: new upload" in line for line in log)
+
+    # The budget kept the change from being looked at, so it still counts
+    started = services.apify.started
+    log = []
+    run_pipeline(dict(SETTINGS, run_id="run-3"), status_callback=log.append)
+    assert any("Changed since last run: new upload" in line for line in log)
+    assert services.apify.started > started
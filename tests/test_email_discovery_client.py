@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import pytest
+
+from email_discovery_client import ApifyEmailBatcher, ApifyEmailClient
+from response_cache import ResponseCache
+from standins.fakes import Backend, FakeApifyClient, FakeWorld, fake_api_error
+
+@pytest.fixture
+def apify(state_dir):
+    world = FakeWorld(seed=1)
+    fake = FakeApifyClient(world, Backend("apify"))
+    client = ApifyEmailClient(token="test")
+    client._client = fake
+    urls = [f"https://www.youtube.com/channel/{world.channel_id(n)}" for n in range(5)]
+    expected = {url: sorted(set(world.scraped_emails(url))) for url in urls}
+    return client, fake, urls, expected
+
+def found(client, urls):
+    return {url: sorted(emails) for url, emails in client.get_emails_batch(urls).items()}
+
+def test_one_actor_run_per_batch(apify):
+    client, fake, urls, expected = apify
+    assert found(client, urls) == expected
+    assert fake.started == 1
+
+def test_a_failed_wait_is_retried_without_a_second_run(apify):
+    client, fake, urls, expected = apify
+    run = fake.run
+    failures = [fake_api_error(503)]
+
+    def flaky_run(run_id):
+        wait = run(run_id).wait_for_finish
+
+        def wait_for_finish(**kwargs):
+            if failures:
+                raise failures.pop()
+            return wait(**kwargs)
+        return SimpleNamespace(wait_for_finish=wait_for_finish)
+
+    fake.run = flaky_run
+    assert found(client, urls) == expected
+    assert fake.started == 1
+
+def test_unmatched_items_fall_back_to_single_url_runs(apify, capsys):
+    client, fake, urls, expected = apify
+    actor = fake.actor
+
+    def untagged_actor(actor_id):
+        start = actor(actor_id).start
+
+        def untagged_start(run_input):
+            run = start(run_input)
+            if len(run_input["startUrls"]) > 1:
+                # An actor that does not say which URL an item came from
+                for item in fake._datasets[run.default_dataset_id]:
+                    item.pop("inputUrl")
+            return run
+        return SimpleNamespace(start=untagged_start)
+
+    fake.actor = untagged_actor
+    assert found(client, urls) == expected
+    assert fake.started == 1 + len(urls)
+    assert "5 dataset items matched no channel URL" in capsys.readouterr().out
+
+def test_failed_run_is_none_and_not_cached(apify, tmp_path):
+    client, fake, urls, expected = apify
+    client.cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+    def broken_actor(actor_id):
+        def start(run_input):
+            raise ValueError("actor not found")
+        return SimpleNamespace(start=start)
+
+    actor = fake.actor
+    fake.actor = broken_actor
+    assert client.get_emails_batch(urls) == {url: None for url in urls}
+    assert ApifyEmailBatcher(client, linger=0).get_emails(urls[0]) is None
+
+    fake.actor = actor
+    assert found(client, urls) == expected
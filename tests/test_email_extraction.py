@@ -0,0 +1,34 @@
+import pytest
+
+from email_extraction import channel_text, extract_emails, filter_personal_emails
+from records import Channel
+
+@pytest.mark.parametrize("text, expected", [
+    ("Business: jane.doe@gmail.com", ["jane.doe@gmail.com"]),
+    ("jane [at] gmail [dot] com", ["jane@gmail.com"]),
+    ("jane (at) studio (dot) co (dot) uk", ["jane@studio.co.uk"]),
+    ("jane{@}gmail{.}com", ["jane@gmail.com"]),
+    ("jane AT gmail DOT com", ["jane@gmail.com"]),
+    ("jane @ gmail . com", ["jane@gmail.com"]),
+    ("jane＠gmail．com", ["jane@gmail.com"]),
+    ("Mail Jane@Gmail.com or jane@gmail.com.", ["jane@gmail.com"]),
+])
+def test_obfuscated_addresses_are_found(text, expected):
+    assert extract_emails(text) == expected
+
+@pytest.mark.parametrize("text", [
+    "Meet me at the studio dot by the door",
+    "New videos at 5 pm, see you there",
+    "",
+    None,
+])
+def test_prose_is_not_taken_for_an_address(text):
+    assert extract_emails(text) == []
+
+def test_role_addresses_are_dropped():
+    emails = ["info@brand.com", "jane@brand.com", "support@brand.com"]
+    assert filter_personal_emails(emails, ignored_keywords=["info", "support"]) == ["jane@brand.com"]
+
+def test_channel_text_includes_the_branding_description():
+    channel = Channel("UC1", "Jane", description="Videos weekly", branding_description="jane [at] gmail [dot] com")
+    assert extract_emails(channel_text(channel)) == ["jane@gmail.com"]
@@ -0,0 +1,96 @@
+import pytest
+
+import config
+from enrichment_jobs import PendingEnrichmentStore
+from llm_client import LLMClient, estimate_tokens
+from pipeline import resume_pending_enrichment
+from records import Lead
+from standins.openai_batch import serve
+
+def blocks(sizes):
+    return [(f"c{n}", "word " * size) for n, size in enumerate(sizes)]
+
+def test_pack_requests_caps_channels_per_request(monkeypatch):
+    monkeypatch.setattr(config, "LLM_BATCH_MAX_CHANNELS", 3)
+    packed = LLMClient().pack_requests(blocks([10] * 7))
+    assert [len(request) for request in packed] == [3, 3, 1]
+    assert [key for request in packed for key, _ in request] == [f"c{n}" for n in range(7)]
+
+def test_pack_requests_caps_expected_output(monkeypatch):
+    monkeypatch.setattr(config, "LLM_BATCH_MAX_CHANNELS", 10)
+    monkeypatch.setattr(config, "LLM_BATCH_MAX_OUTPUT_TOKENS", 1000)
+    monkeypatch.setattr(config, "LLM_OUTPUT_TOKENS_PER_CHANNEL", 250)
+    packed = LLMClient().pack_requests(blocks([10] * 6))
+    assert [len(request) for request in packed] == [4, 2]
+
+def test_pack_requests_stays_within_the_input_budget(monkeypatch):
+    monkeypatch.setattr(config, "LLM_BATCH_MAX_CHANNELS", 10)
+    monkeypatch.setattr(config, "LLM_BATCH_MAX_INPUT_TOKENS", 2000)
+    llm = LLMClient()
+    packed = llm.pack_requests(blocks([300, 300, 300, 5000, 300]))
+    sizes = [[key for key, _ in request] for request in packed]
+    # The oversized block goes on its own rather than being dropped
+    assert ["c3"] in sizes
+    assert sum(len(keys) for keys in sizes) == 5
+    for request in packed:
+        if len(request) > 1:
+            assert sum(estimate_tokens(block) for _, block in request) <= config.LLM_BATCH_MAX_INPUT_TOKENS
+
+@pytest.fixture
+def standin(state_dir, monkeypatch):
+    server, url = serve(delay=0.0)
+    monkeypatch.setattr(config, "OPENAI_BASE_URL", url)
+    monkeypatch.setattr(config, "OPENAI_API_KEY", "test")
+    yield url
+    server.shutdown()
+
+ITEMS = [
+    ("UC1", {"title": "Jane Doe", "description": "Courses for creators", "customUrl": "@jane"}, "My first video"),
+    ("UC2", {"title": "Bob Stone", "description": "Woodworking", "customUrl": "@bob"}, "A table")
+]
+
+def test_batch_round_trip_through_the_standin(standin):
+    llm = LLMClient()
+    batch_id = llm.submit_batch(ITEMS)
+    batch = llm.get_batch(batch_id)
+    assert batch.status == "completed"
+
+    results = llm.batch_results(batch, ["UC1", "UC2"])
+
+    assert results["UC1"]["contact_name"] == "Jane"
+    assert results["UC2"]["contact_name"] == "Bob"
+
+class SavingSupabase:
+    def __init__(self):
+        self.saved = []
+
+    def save_leads(self, leads):
+        self.saved.extend(leads)
+        return [True] * len(leads)
+
+class CollectingSheets:
+    def __init__(self):
+        self.rows = []
+
+    def add(self, lead):
+        self.rows.append(lead)
+        return True
+
+def test_pending_leads_are_enriched_from_the_batch(standin):
+    store = PendingEnrichmentStore(config.PENDING_ENRICHMENT_PATH)
+    for channel_id, channel_data, video_title in ITEMS:
+        lead = Lead(
+            channel_id=channel_id, email=f"{channel_id.lower()}@example.com", email_source="Apify",
+            all_emails=[], source_keyword="k", source_keywords=["k"],
+            channel_url=f"https://www.youtube.com/channel/{channel_id}", channel_title=channel_data["title"],
+            country="US", subscriber_count=1000, view_count=0, video_count=0, last_video_title=video_title
+        )
+        store.add(channel_id, lead.to_dict(), (channel_id, channel_data, video_title))
+    supabase, sheets = SavingSupabase(), CollectingSheets()
+
+    saved = resume_pending_enrichment(llm=LLMClient(), supabase=supabase, sheets_writer=sheets, store=store)
+
+    assert saved == 2
+    assert len(store) == 0
+    assert {lead["channel_id"]: lead["contact_name"] for lead in sheets.rows} == {"UC1": "Jane", "UC2": "Bob"}
+    assert all(lead["product_name"] == "course" for lead in supabase.saved)
@@ -0,0 +1,77 @@
+import sqlite3
+from types import SimpleNamespace
+
+import config
+from pipeline import run_pipeline
+
+SETTINGS = {"keywords": ["growth coaching", "weekly podcast"], "max_channels": 20, "cache_mode": "bypass"}
+
+def paid_calls(services):
+    counts = services.call_counts()
+    return counts["apify"]["calls"], counts["openai"]["calls"]
+
+def test_finished_run_resumes_without_paid_calls(services):
+    first = run_pipeline(dict(SETTINGS, run_id="run-1"), status_callback=lambda message: None)
+    assert first > 0
+    before = paid_calls(services)
+    saved = len(services.supabase.saved)
+
+    log = []
+    again = run_pipeline({"run_id": "run-1"}, status_callback=log.append)
+
+    assert again == 0
+    assert paid_calls(services) == before
+    assert len(services.supabase.saved) == saved
+    assert any("Resuming run run-1" in line for line in log)
+
+def test_interrupted_channels_resume_from_their_last_stage(services):
+    run_pipeline(dict(SETTINGS, run_id="run-2"), status_callback=lambda message: None)
+    db = sqlite3.connect(config.CHECKPOINT_PATH)
+    saved = [row[0] for row in db.execute(
+        "SELECT channel_id FROM channels WHERE run_id = 'run-2' AND stage = 'saved_sheets' ORDER BY channel_id"
+    )]
+    assert len(saved) >= 2
+    # As if the run died after the email step of one channel (so it never
+    # reached the database) and before the Sheets write of another
+    db.execute("UPDATE channels SET stage = 'emails_found' WHERE channel_id = ?", (saved[0],))
+    db.execute("UPDATE channels SET stage = 'saved_supabase' WHERE channel_id = ?", (saved[1],))
+    db.commit()
+    db.close()
+    del services.supabase.saved[saved[0]]
+    index = sqlite3.connect(config.CHANNEL_INDEX_PATH)
+    index.execute("DELETE FROM channels WHERE channel_id = ?", (saved[0],))
+    index.commit()
+    index.close()
+    apify_before, openai_before = paid_calls(services)
+    rows_before = len(services.gspread.worksheet.rows)
+
+    resumed = run_pipeline({"run_id": "run-2"}, status_callback=lambda message: None)
+
+    apify_after, openai_after = paid_calls(services)
+    assert resumed == 2
+    # Emails come from the checkpoint; only the enrichment is repeated
+    assert apify_after == apify_before
+    assert openai_after == openai_before + 1
+    assert len(services.gspread.worksheet.rows) == rows_before + 2
+
+def test_channels_whose_apify_run_failed_are_retried_on_resume(services):
+    def broken_actor(actor_id):
+        def start(run_input):
+            raise ValueError("actor not found")
+        return SimpleNamespace(start=start)
+
+    actor = services.apify.actor
+    services.apify.actor = broken_actor
+    log = []
+    run_pipeline(dict(SETTINGS, run_id="run-3"), status_callback=log.append)
+    assert any("Apify run failed" in line for line in log)
+    store = sqlite3.connect(config.CHANNEL_STORE_PATH)
+    outcomes = [row[0] for row in store.execute("SELECT email_outcome FROM channels")]
+    store.close()
+    # Only channels with an address in their description got an outcome
+    assert "none" not in outcomes
+
+    services.apify.actor = actor
+    resumed = run_pipeline({"run_id": "run-3"}, status_callback=lambda message: None)
+    assert services.apify.started > 0
+    assert resumed > 0
@@ -0,0 +1,81 @@
+from pipeline_stages import prioritize
+from checkpoints import RunCheckpoints, REJECTED
+from records import Candidate
+
+def candidates(checkpoints, scores, prefix="UC"):
+    items = []
+    for n, score in enumerate(scores):
+        item = Candidate("keyword", f"{prefix}{n}")
+        item.score = score
+        checkpoints.mark(item.channel_id, "filtered", item.keyword)
+        items.append(item)
+    return items
+
+def ids(batches):
+    return [item.channel_id for batch in batches for item in batch]
+
+def checkpoints_for(tmp_path):
+    checkpoints = RunCheckpoints(str(tmp_path / "checkpoints.sqlite3"), "run")
+    checkpoints.start({})
+    return checkpoints
+
+def test_without_budget_batches_pass_straight_through(tmp_path):
+    checkpoints = checkpoints_for(tmp_path)
+    first = candidates(checkpoints, [0.1, 0.9], "A")
+    second = candidates(checkpoints, [0.5], "B")
+    pulled = []
+
+    def source():
+        for batch in (first, second):
+            pulled.append(batch)
+            yield batch
+
+    stream = prioritize(source(), window=10, budget=None, report=lambda item: None, checkpoints=checkpoints)
+    # The first batch comes out before the second is pulled
+    assert next(stream) is first
+    assert len(pulled) == 1
+    assert list(stream) == [second]
+
+def test_budget_takes_the_best_and_rejects_the_rest(tmp_path):
+    checkpoints = checkpoints_for(tmp_path)
+    batch = candidates(checkpoints, [0.1, 0.9, 0.5, 0.3, 0.8, 0.2])
+    skipped = []
+
+    sent = ids(prioritize(iter([batch]), window=2, budget=3, report=skipped.append, checkpoints=checkpoints))
+
+    assert sent == ["UC1", "UC4", "UC2"]
+    assert sorted(item.channel_id for item in skipped) == ["UC0", "UC3", "UC5"]
+    assert checkpoints.get("UC0")[0] == REJECTED
+    assert checkpoints.get("UC1")[1].get("paid") is True
+
+def test_budget_releases_each_batch_down_to_the_window(tmp_path):
+    checkpoints = checkpoints_for(tmp_path)
+    first = candidates(checkpoints, [0.2, 0.4, 0.6, 0.8], "A")
+    second = candidates(checkpoints, [0.9], "B")
+    stream = prioritize(iter([first, second]), window=1, budget=100, report=lambda item: None, checkpoints=checkpoints)
+
+    # Everything but the best held channel goes ahead at once
+    assert [item.channel_id for item in next(stream)] == ["A3", "A2", "A1"]
+    assert ids(stream) == ["B0", "A0"]
+
+def test_held_channels_are_flushed_after_the_linger(tmp_path):
+    checkpoints = checkpoints_for(tmp_path)
+    batch = candidates(checkpoints, [0.2, 0.4])
+    stream = prioritize(iter([batch]), window=5, budget=100, report=lambda item: None,
+                        checkpoints=checkpoints, linger=0)
+
+    assert [item.channel_id for item in next(stream)] == ["UC1", "UC0"]
+
+def test_resumed_channels_do_not_spend_the_budget_twice(tmp_path):
+    checkpoints = checkpoints_for(tmp_path)
+    first = candidates(checkpoints, [0.9, 0.8, 0.1])
+    assert ids(prioritize(iter([first]), window=0, budget=2, report=lambda item: None,
+                          checkpoints=checkpoints)) == ["UC0", "UC1"]
+
+    # The resumed run sees the two paid channels again, plus new ones
+    resumed = [Candidate("keyword", channel_id, resumed_stage="filtered") for channel_id in ("UC0", "UC1")]
+    new = candidates(checkpoints, [0.7], "NEW")
+    sent = ids(prioritize(iter([resumed + new]), window=0, budget=3, report=lambda item: None,
+                          checkpoints=checkpoints))
+
+    assert sent == ["UC0", "UC1", "NEW0"]
@@ -0,0 +1,32 @@
+import pytest
+
+from rate_limit import ApiGuard, CircuitOpenError
+from standins.fakes import fake_api_error
+
+def fail(status):
+    def call():
+        raise fake_api_error(status)
+    return call
+
+def test_circuit_opens_and_a_successful_trial_closes_it():
+    guard = ApiGuard("test", rate=1000, burst=1000, max_attempts=1, failure_threshold=1, reset_seconds=60)
+    with pytest.raises(Exception):
+        guard.call(fail(503))
+    assert guard.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        guard.call(lambda: "ok")
+
+    guard.breaker.reset_seconds = 0
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.breaker.state == "closed"
+
+def test_throttled_trial_call_lets_the_next_call_probe():
+    guard = ApiGuard("test", rate=1000, burst=1000, max_attempts=1, failure_threshold=1, reset_seconds=0)
+    with pytest.raises(Exception):
+        guard.call(fail(503))
+    # The trial call is throttled: the provider is up, just busy
+    with pytest.raises(Exception) as raised:
+        guard.call(fail(429))
+    assert not isinstance(raised.value, CircuitOpenError)
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.breaker.state == "closed"
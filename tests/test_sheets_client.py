@@ -0,0 +1,63 @@
+import threading
+import time
+
+from sheets_client import BufferedSheetsWriter
+from standins.fakes import Backend, FakeWorksheet
+
+class Sheets:
+    """
+    The two GoogleSheetsClient methods BufferedSheetsWriter uses, over a
+    fake worksheet.
+    """
+    def __init__(self, latency=0.0):
+        self.worksheet = FakeWorksheet(Backend("sheets", latency=latency))
+        self.fail = False
+
+    def lead_to_row(self, lead):
+        return [lead["channel_id"]]
+
+    def append_rows(self, rows):
+        if self.fail:
+            raise RuntimeError("sheet unavailable")
+        self.worksheet.append_rows(rows)
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_linger_timer_flushes_a_partial_batch(tmp_path):
+    sheets = Sheets()
+    writer = BufferedSheetsWriter(sheets, str(tmp_path / "spool.jsonl"), flush_rows=10, flush_seconds=0.05)
+    writer.add({"channel_id": "UC1"})
+    assert wait_for(lambda: sheets.worksheet.rows == [["UC1"]])
+    assert writer.close() == 0
+
+def test_add_does_not_wait_for_a_flush_in_flight(tmp_path):
+    sheets = Sheets(latency=0.5)
+    writer = BufferedSheetsWriter(sheets, str(tmp_path / "spool.jsonl"), flush_rows=1, flush_seconds=10)
+    flushing = threading.Thread(target=writer.add, args=({"channel_id": "UC1"},))
+    flushing.start()
+    assert wait_for(lambda: sheets.worksheet.backend.calls == 1)
+    started = time.monotonic()
+    writer.add({"channel_id": "UC2"})
+    assert time.monotonic() - started < 0.25
+    flushing.join()
+    assert writer.close() == 0
+    assert sheets.worksheet.rows == [["UC1"], ["UC2"]]
+
+def test_failed_rows_stay_spooled_for_the_next_writer(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    sheets = Sheets()
+    sheets.fail = True
+    writer = BufferedSheetsWriter(sheets, spool, flush_rows=10, flush_seconds=10)
+    writer.add({"channel_id": "UC1"})
+    writer.add({"channel_id": "UC2"})
+    assert writer.close() == 2
+
+    sheets.fail = False
+    writer = BufferedSheetsWriter(sheets, spool, flush_rows=10, flush_seconds=10)
+    assert writer.recovered == 2
+    assert writer.close() == 0
+    assert sheets.worksheet.rows == [["UC1"], ["UC2"]]
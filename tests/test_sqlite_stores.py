@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+from channel_index import ChannelIndex
+from channel_store import ChannelStore
+from checkpoints import RunCheckpoints
+from response_cache import ResponseCache
+
+@pytest.mark.parametrize("open_store", [
+    lambda path: ChannelIndex(path),
+    lambda path: ChannelStore(path),
+    lambda path: RunCheckpoints(path, "run-1"),
+    lambda path: ResponseCache(path)
+])
+def test_shared_stores_use_wal(tmp_path, open_store):
+    path = str(tmp_path / "store.sqlite3")
+    open_store(path).close()
+    db = sqlite3.connect(path)
+    assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    db.close()
+
+def test_a_locked_cache_degrades_instead_of_failing(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path)
+    cache.set("youtube", "a", {"n": 1})
+    cache._conn.execute("PRAGMA busy_timeout = 50")
+
+    # Another worker process holds the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert cache.get("youtube", "a") == {"n": 1}
+        cache.set("youtube", "b", {"n": 2})
+        assert cache.get("youtube", "b") is None
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    cache.set("youtube", "b", {"n": 2})
+    assert cache.get("youtube", "b") == {"n": 2}
+    cache.close()
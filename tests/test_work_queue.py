@@ -0,0 +1,78 @@
+import pytest
+
+from work_queue import WorkQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / "work_queue.sqlite3"))
+    yield queue
+    queue.close()
+
+def test_tasks_are_claimed_once(queue):
+    assert queue.add_keywords(["a", "b", "c"], chunk_size=2) == 3
+    first = queue.claim("w1", lease_seconds=60)
+    second = queue.claim("w2", lease_seconds=60)
+    assert first[1] == ["a", "b"]
+    assert second[1] == ["c"]
+    assert queue.claim("w3", lease_seconds=60) is None
+
+def test_expired_lease_is_reclaimed_with_the_same_run_id(queue):
+    queue.add_keywords(["a"])
+    task_id, _, run_id = queue.claim("w1", lease_seconds=-1)
+    again = queue.claim("w2", lease_seconds=60)
+    assert again == (task_id, ["a"], run_id)
+
+def test_keywords_in_flight_are_not_queued_twice(queue):
+    queue.add_keywords(["a", "b"])
+    queue.claim("w1", lease_seconds=60)
+    assert queue.add_keywords(["a", "b", "c"]) == 1
+
+def test_finished_keywords_are_queued_again(queue):
+    queue.add_keywords(["a", "b"])
+    task_id, _, run_id = queue.claim("w1", lease_seconds=60)
+    queue.complete(task_id)
+
+    assert queue.add_keywords(["a", "b"]) == 2
+    new_task_id, keywords, new_run_id = queue.claim("w1", lease_seconds=60)
+    assert keywords == ["a", "b"]
+    assert new_task_id != task_id and new_run_id != run_id
+
+def test_a_channel_belongs_to_the_first_task_that_claims_it(queue):
+    queue.add_keywords(["a", "b"], chunk_size=1)
+    first, _, _ = queue.claim("w1", lease_seconds=60)
+    second, _, _ = queue.claim("w2", lease_seconds=60)
+
+    assert queue.claim_channel("UC1", first)
+    assert queue.claim_channel("UC1", first)
+    assert not queue.claim_channel("UC1", second)
+    assert queue.channel_filter(second)(type("Channel", (), {"id": "UC1"})) == "Claimed by another worker."
+
+    # A finished task keeps its channels while other tasks still run
+    queue.complete(first)
+    assert not queue.claim_channel("UC1", second)
+
+def test_claims_are_released_once_the_queue_drains(queue):
+    queue.add_keywords(["a"])
+    task_id, _, _ = queue.claim("w1", lease_seconds=60)
+    assert queue.claim_channel("UC1", task_id)
+    queue.complete(task_id)
+
+    queue.add_keywords(["a"])
+    next_task, _, _ = queue.claim("w1", lease_seconds=60)
+    assert queue.claim_channel("UC1", next_task)
+
+def test_a_task_that_fails_for_good_releases_its_channels(queue):
+    queue.add_keywords(["a", "b"], chunk_size=1)
+    failing, _, _ = queue.claim("w1", lease_seconds=60)
+    other, _, _ = queue.claim("w2", lease_seconds=60)
+    assert queue.claim_channel("UC1", failing)
+
+    # Retried: the claim stays with the task
+    queue.fail(failing, "boom", max_attempts=2)
+    assert queue.claim("w1", lease_seconds=60)[0] == failing
+    assert not queue.claim_channel("UC1", other)
+
+    queue.fail(failing, "boom again", max_attempts=2)
+    assert queue.counts()["failed"] == 1
+    assert queue.claim_channel("UC1", other)
+    assert queue.failures() == [(failing, ["a"], "boom again")]
@@ -0,0 +1,59 @@
+import httplib2
+
+from standins.fakes import Backend, FakeWorld, FakeYouTube, youtube_http_error
+from youtube_client import YouTubeClient
+
+class FlakyBatches(FakeYouTube):
+    """
+    A fake whose batch requests fail `failures` times: the first sub-request
+    reports a transient error, then the whole batch raises `error`.
+    """
+    def __init__(self, world, failures, error):
+        super().__init__(world, Backend("youtube"))
+        self.failures = failures
+        self.error = error
+        self.batches = 0
+
+    def new_batch_http_request(self, callback):
+        batch = super().new_batch_http_request(callback)
+        execute = batch.execute
+        self.batches += 1
+
+        def flaky_execute():
+            if self.failures:
+                self.failures -= 1
+                request_id, _ = batch.requests[0]
+                callback(request_id, None, youtube_http_error(503))
+                raise self.error
+            execute()
+        batch.execute = flaky_execute
+        return batch
+
+def client_for(fake):
+    client = YouTubeClient()
+    client._local.service = fake
+    singles = []
+    client.get_latest_video = singles.append
+    return client, singles
+
+def test_a_retried_batch_is_rebuilt_and_runs_each_request_once(state_dir):
+    world = FakeWorld(seed=1)
+    fake = FlakyBatches(world, failures=1, error=youtube_http_error(503))
+    client, singles = client_for(fake)
+    ids = [world.channel_id(n) for n in range(3)]
+
+    videos = client.get_latest_videos(ids)
+
+    assert fake.batches == 2
+    assert singles == []
+    assert all(video is not None for video in videos)
+
+def test_a_batch_that_keeps_failing_leaves_no_videos(state_dir):
+    world = FakeWorld(seed=1)
+    fake = FlakyBatches(world, failures=100, error=httplib2.ServerNotFoundError("no route"))
+    client, singles = client_for(fake)
+
+    videos = client.get_latest_videos([world.channel_id(n) for n in range(3)])
+
+    assert videos == [None, None, None]
+    assert singles == []
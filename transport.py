@@ -0,0 +1,194 @@
+"""
+Shared HTTP transport for the API clients.
+
+Every provider gets one process-wide pool of keep-alive connections, sized
+to the provider's concurrency (config.STAGE_CONCURRENCY plus
+HTTP_POOL_HEADROOM), with the timeouts in config.HTTP_TIMEOUTS, and HTTP/2
+where config.HTTP2 asks for it and the h2 package is installed. Clients
+get their SDK's transport from here instead of each building its own:
+
+    OpenAI(..., http_client=transport.httpx_client("openai"))
+
+Requests and newly opened connections are counted per provider (see
+`summary`), so connection reuse can be checked in the run report.
+"""
+import importlib.util
+import threading
+import weakref
+import config
+
+class ReuseStats:
+    """
+    Requests sent and connections opened for one provider.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        # requests adapters (urllib3 pools count for themselves)
+        self._adapters = []
+
+    def record(self, new_connection):
+        with self._lock:
+            self.requests += 1
+            if new_connection:
+                self.connections += 1
+
+    def add_adapter(self, adapter):
+        with self._lock:
+            self._adapters.append(adapter)
+
+    def snapshot(self):
+        with self._lock:
+            requests, connections = self.requests, self.connections
+            adapters = list(self._adapters)
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    requests += pool.num_requests
+                    connections += pool.num_connections
+        return {"requests": requests, "connections": connections}
+
+_stats = {}
+_clients = {}
+_lock = threading.Lock()
+
+def stats(provider):
+    with _lock:
+        if provider not in _stats:
+            _stats[provider] = ReuseStats()
+        return _stats[provider]
+
+def pool_size(provider):
+    return config.STAGE_CONCURRENCY.get(provider, 1) + config.HTTP_POOL_HEADROOM
+
+def timeout(provider):
+    """
+    Returns the read timeout in seconds for a provider's calls.
+    """
+    return config.HTTP_TIMEOUTS.get(provider, 60)
+
+def http2_enabled(provider):
+    return bool(config.HTTP2.get(provider)) and importlib.util.find_spec("h2") is not None
+
+def httpx_client(provider):
+    """
+    Returns the provider's shared httpx.Client (OpenAI, Supabase).
+    """
+    with _lock:
+        client = _clients.get(("httpx", provider))
+    if client is not None:
+        return client
+
+    import httpx
+    provider_stats = stats(provider)
+    # The network stream of every connection that already served a request
+    seen = weakref.WeakSet()
+    seen_lock = threading.Lock()
+
+    def count(response):
+        stream = response.extensions.get("network_stream")
+        with seen_lock:
+            new = stream is None or stream not in seen
+            if stream is not None:
+                seen.add(stream)
+        provider_stats.record(new)
+
+    size = pool_size(provider)
+    client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=size,
+            max_keepalive_connections=size,
+            keepalive_expiry=config.HTTP_KEEPALIVE_SECONDS
+        ),
+        timeout=httpx.Timeout(timeout(provider), connect=config.HTTP_CONNECT_TIMEOUT_SECONDS),
+        http2=http2_enabled(provider),
+        follow_redirects=True,
+        event_hooks={"response": [count]}
+    )
+    with _lock:
+        return _clients.setdefault(("httpx", provider), client)
+
+def httplib2_http(provider):
+    """
+    Returns a new httplib2.Http (googleapiclient) for one thread. httplib2
+    is not thread-safe, so each thread keeps its own connections alive
+    rather than sharing a pool.
+    """
+    import httplib2
+    provider_stats = stats(provider)
+
+    class CountingHttp(httplib2.Http):
+        def _conn_request(self, conn, request_uri, method, body, headers):
+            provider_stats.record(getattr(conn, "sock", None) is None)
+            return super()._conn_request(conn, request_uri, method, body, headers)
+
+    return CountingHttp(timeout=timeout(provider))
+
+def requests_session(provider, credentials):
+    """
+    Returns the provider's shared google-auth AuthorizedSession (gspread),
+    with a connection pool sized to the provider's concurrency.
+    """
+    with _lock:
+        session = _clients.get(("requests", provider))
+    if session is not None:
+        return session
+
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size(provider))
+    session.mount("https://", adapter)
+    with _lock:
+        if ("requests", provider) in _clients:
+            return _clients[("requests", provider)]
+        _clients[("requests", provider)] = session
+    stats(provider).add_adapter(adapter)
+    return session
+
+def apify_client(token):
+    """
+    Returns the shared ApifyClient for a token. apify_client brings its own
+    HTTP client (which pools connections); sharing the ApifyClient keeps
+    one pool per process instead of one per run.
+    """
+    with _lock:
+        client = _clients.get(("apify", token))
+    if client is not None:
+        return client
+
+    import datetime
+    from apify_client import ApifyClient
+    # Retries are handled by the shared guard (see rate_limit.py)
+    client = ApifyClient(
+        token,
+        max_retries=0,
+        timeout_max=datetime.timedelta(seconds=timeout("apify"))
+    )
+    with _lock:
+        return _clients.setdefault(("apify", token), client)
+
+def summary(since=None):
+    """
+    Returns {provider: {"requests", "connections", "reused"}} for every
+    provider that made requests, counted since the process started or, given
+    an earlier summary as `since`, since that one.
+    """
+    with _lock:
+        providers = dict(_stats)
+    result = {}
+    for provider, provider_stats in sorted(providers.items()):
+        current = provider_stats.snapshot()
+        before = (since or {}).get(provider, {})
+        requests = current["requests"] - before.get("requests", 0)
+        connections = current["connections"] - before.get("connections", 0)
+        if requests:
+            result[provider] = {
+                "requests": requests,
+                "connections": connections,
+                "reused": round(1 - connections / requests, 3)
+            }
+    return result
@@ -0,0 +1,241 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from checkpoints import new_run_id
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+class WorkQueue:
+    """
+    Shared SQLite work queue that splits the keyword space across worker
+    processes (or machines sharing the file). Keywords are queued in tasks
+    of a few keywords each; a worker claims a task under a lease it keeps
+    renewing while it runs, so the task of a crashed worker is picked up
+    again (with the same Run ID, resuming its checkpoints) once the lease
+    runs out. Channels are claimed by the first task that finds them, so no
+    two workers process the same channel.
+
+    Claims last as long as the queue has work: once every task is done or
+    failed, they are released, so keywords queued again later (the next
+    scheduled run) look at the same channels afresh.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " task_id INTEGER PRIMARY KEY AUTOINCREMENT, keywords TEXT NOT NULL,"
+            " status TEXT NOT NULL, worker TEXT, run_id TEXT, lease_until REAL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, error TEXT, updated TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keywords ("
+            " keyword TEXT PRIMARY KEY, task_id INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS channels ("
+            " channel_id TEXT PRIMARY KEY, task_id INTEGER NOT NULL, worker TEXT)"
+        )
+
+    def _now(self):
+        return str(datetime.datetime.now())
+
+    def _transaction(self, fn):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers
+        # never claim the same row
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    # Tasks
+
+    def add_keywords(self, keywords, chunk_size=5):
+        """
+        Queues keywords in tasks of `chunk_size`. Keywords still pending or
+        running are skipped; finished and failed ones are queued again.
+        Returns the number of keywords added.
+        """
+        keywords = list(dict.fromkeys(k.strip() for k in keywords if k and k.strip()))
+
+        def add():
+            # A new round of work starts with no channel claimed
+            self._release_claims_if_idle()
+            queued = set()
+            for start in range(0, len(keywords), 500):
+                chunk = keywords[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT k.keyword FROM keywords k JOIN tasks t ON t.task_id = k.task_id"
+                    f" WHERE k.keyword IN ({','.join('?' * len(chunk))}) AND t.status IN (?, ?)",
+                    chunk + [PENDING, CLAIMED]
+                ).fetchall()
+                queued.update(row[0] for row in rows)
+            new = [k for k in keywords if k not in queued]
+            for start in range(0, len(new), chunk_size):
+                task = new[start:start + chunk_size]
+                cursor = self._conn.execute(
+                    "INSERT INTO tasks (keywords, status, updated) VALUES (?, ?, ?)",
+                    (json.dumps(task), PENDING, self._now())
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO keywords (keyword, task_id) VALUES (?, ?)",
+                    [(keyword, cursor.lastrowid) for keyword in task]
+                )
+            return len(new)
+        return self._transaction(add)
+
+    def claim(self, worker, lease_seconds, max_attempts=3):
+        """
+        Claims the oldest pending task, or one whose lease expired, for
+        `worker`. Returns (task_id, keywords, run_id), or None when there is
+        nothing left to claim.
+        """
+        def claim():
+            # Tasks whose last allowed attempt died with its worker
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT task_id FROM tasks WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (CLAIMED, time.time(), max_attempts)
+            ).fetchall()]
+            for task_id in expired:
+                self._conn.execute(
+                    "UPDATE tasks SET status = ?, error = ?, updated = ? WHERE task_id = ?",
+                    (FAILED, "lease expired", self._now(), task_id)
+                )
+                self._conn.execute("DELETE FROM channels WHERE task_id = ?", (task_id,))
+            if expired:
+                self._release_claims_if_idle()
+            row = self._conn.execute(
+                "SELECT task_id, keywords, run_id FROM tasks"
+                " WHERE (status = ? OR (status = ? AND lease_until < ?)) AND attempts < ?"
+                " ORDER BY task_id LIMIT 1",
+                (PENDING, CLAIMED, time.time(), max_attempts)
+            ).fetchone()
+            if row is None:
+                return None
+            task_id, keywords, run_id = row
+            run_id = run_id or new_run_id()
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, worker = ?, run_id = ?, lease_until = ?,"
+                " attempts = attempts + 1, updated = ? WHERE task_id = ?",
+                (CLAIMED, worker, run_id, time.time() + lease_seconds, self._now(), task_id)
+            )
+            return task_id, json.loads(keywords), run_id
+        return self._transaction(claim)
+
+    def renew(self, task_id, worker, lease_seconds):
+        """
+        Extends a claimed task's lease. Returns False if the task is no
+        longer held by `worker`.
+        """
+        def renew():
+            cursor = self._conn.execute(
+                "UPDATE tasks SET lease_until = ?, updated = ? WHERE task_id = ? AND worker = ? AND status = ?",
+                (time.time() + lease_seconds, self._now(), task_id, worker, CLAIMED)
+            )
+            return cursor.rowcount > 0
+        return self._transaction(renew)
+
+    def complete(self, task_id):
+        self._set_status(task_id, DONE)
+
+    def fail(self, task_id, error, max_attempts=3):
+        """
+        Records a failed attempt. The task goes back to the queue (keeping
+        its channel claims for the retry) until it has been tried
+        `max_attempts` times; then its channels are released.
+        """
+        def fail():
+            attempts = self._conn.execute("SELECT attempts FROM tasks WHERE task_id = ?", (task_id,)).fetchone()[0]
+            status = FAILED if attempts >= max_attempts else PENDING
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, lease_until = NULL, error = ?, updated = ? WHERE task_id = ?",
+                (status, str(error), self._now(), task_id)
+            )
+            if status == FAILED:
+                self._conn.execute("DELETE FROM channels WHERE task_id = ?", (task_id,))
+                self._release_claims_if_idle()
+        self._transaction(fail)
+
+    def _set_status(self, task_id, status):
+        def update():
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, lease_until = NULL, updated = ? WHERE task_id = ?",
+                (status, self._now(), task_id)
+            )
+            self._release_claims_if_idle()
+        self._transaction(update)
+
+    def _release_claims_if_idle(self):
+        # Runs inside a transaction. A done task's claims are kept while
+        # other tasks run (they may find the same channels), and dropped
+        # with everything else once none is left
+        busy = self._conn.execute(
+            "SELECT 1 FROM tasks WHERE status IN (?, ?) LIMIT 1", (PENDING, CLAIMED)
+        ).fetchone()
+        if busy is None:
+            self._conn.execute("DELETE FROM channels")
+
+    def counts(self):
+        """
+        Returns {status: number of tasks}.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return dict(rows)
+
+    def failures(self):
+        """
+        Returns [(task_id, keywords, error)] for tasks that gave up.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, keywords, error FROM tasks WHERE status = ? ORDER BY task_id", (FAILED,)
+            ).fetchall()
+        return [(task_id, json.loads(keywords), error) for task_id, keywords, error in rows]
+
+    # Channels
+
+    def claim_channel(self, channel_id, task_id, worker=None):
+        """
+        Claims a channel for a task. Returns True if the task holds it (it
+        just claimed it, or did before), False if another task got it first.
+        """
+        def claim():
+            self._conn.execute(
+                "INSERT OR IGNORE INTO channels (channel_id, task_id, worker) VALUES (?, ?, ?)",
+                (channel_id, task_id, worker)
+            )
+            row = self._conn.execute("SELECT task_id FROM channels WHERE channel_id = ?", (channel_id,)).fetchone()
+            return row[0] == task_id
+        return self._transaction(claim)
+
+    def channel_filter(self, task_id, worker=None):
+        """
+        Returns a pipeline filter (see run_pipeline's extra_filters) that
+        rejects channels claimed by another task.
+        """
+        def claimed_elsewhere(channel):
+            if self.claim_channel(channel.id, task_id, worker):
+                return None
+            return "Claimed by another worker."
+        return claimed_elsewhere
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,80 +1,326 @@
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from response_cache import make_key
+from rate_limit import guard, is_transient, CircuitOpenError
+from metrics import Metrics
 import config
+import transport
+import json
+import threading
+
+# YouTube Data API quota cost per call, in units
+QUOTA_COSTS = {
+    "search.list": 100,
+    "channels.list": 1,
+    "playlistItems.list": 1
+}
+
+# Instrumented operation name per API method (see metrics.py)
+OPERATIONS = {
+    "search.list": "youtube.search",
+    "channels.list": "youtube.channels",
+    "playlistItems.list": "youtube.videos"
+}
+
+# Most IDs a single channels().list call accepts
+MAX_CHANNEL_IDS = 50
+
+def uploads_playlist_id(channel):
+    """
+    Returns the uploads playlist ID for a channel resource (as returned by
+    channels().list), a bare channel ID or an uploads playlist ID. Uploads
+    playlists share the channel ID with a 'UU' instead of a 'UC' prefix,
+    which saves a channels().list call when contentDetails is not at hand.
+    """
+    if isinstance(channel, dict):
+        playlists = channel.get('contentDetails', {}).get('relatedPlaylists', {})
+        if playlists.get('uploads'):
+            return playlists['uploads']
+        channel = channel.get('id', '')
+    if channel.startswith('UC'):
+        return 'UU' + channel[2:]
+    if channel.startswith('UU'):
+        return channel
+    return None
+
+# Discovery document of the YouTube Data API, read once per process
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+def discovery_document():
+    """
+    Returns the YouTube Data API discovery document bundled with
+    googleapiclient (no network fetch), reading it only once per process.
+    """
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            from googleapiclient import discovery_cache
+            _discovery_document = discovery_cache.get_static_doc('youtube', 'v3')
+        return _discovery_document
 
 class YouTubeClient:
-    def __init__(self):
-        self.youtube = build('youtube', 'v3', developerKey=config.YOUTUBE_API_KEY)
+    def __init__(self, cache=None, metrics=None):
+        # httplib2 connections are not thread-safe, so every worker thread
+        # gets its own service object, built on its first API call (runs
+        # served from the cache never build one).
+        self._local = threading.local()
+        self._quota_lock = threading.Lock()
+        self.quota_used = 0
+        self.quota_by_method = {}
+        self.search_stop_reason = None
+        self.cache = cache
+        self.guard = guard("youtube")
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def _connect(self):
+        # googleapiclient.discovery is slow to import; only load it when a
+        # service is needed
+        from googleapiclient.discovery import build_from_document
+        return build_from_document(
+            discovery_document(),
+            developerKey=config.YOUTUBE_API_KEY,
+            http=transport.httplib2_http("youtube")
+        )
+
+    @property
+    def youtube(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._connect()
+            self._local.service = service
+        return service
+
+    def _count(self, method, calls=1):
+        units = QUOTA_COSTS.get(method, 1) * calls
+        with self._quota_lock:
+            self.quota_used += units
+            self.quota_by_method[method] = self.quota_by_method.get(method, 0) + units
+
+    def _execute(self, request, method):
+        with self.metrics.measure(OPERATIONS[method]) as sample:
+            # Every attempt (including retries) is charged against the quota
+            def attempt():
+                self._count(method)
+                sample["quota_units"] += QUOTA_COSTS.get(method, 1)
+                return request.execute()
+            response = self.guard.call(attempt)
+            sample["bytes"] += len(json.dumps(response))
+        return response
+
+    def _cache_get(self, source, key):
+        if self.cache is None:
+            return None
+        return self.cache.get(source, key)
+
+    def _cache_set(self, source, key, value):
+        if self.cache is not None:
+            self.cache.set(source, key, value)
+
+    def iter_search_pages(self, keyword, page_size=50, max_pages=None, quota_budget=None):
+        """
+        Searches for channels matching the keyword, following nextPageToken.
+        Yields one list of channel IDs per page as soon as it arrives.
+        Stops when there are no more results, after `max_pages` pages, or
+        before a call that would take quota_used past `quota_budget`
+        (cached pages cost nothing).
+        The reason is left in self.search_stop_reason
+        ("exhausted", "max_pages", "quota" or "error").
+        """
+        self.search_stop_reason = None
+        page_token = None
+        pages = 0
+        while True:
+            if max_pages is not None and pages >= max_pages:
+                self.search_stop_reason = "max_pages"
+                return
+            cache_key = make_key(keyword, min(page_size, 50), page_token)
+            response = self._cache_get("youtube_search", cache_key)
+            if response is None:
+                if quota_budget is not None and self.quota_used + QUOTA_COSTS["search.list"] > quota_budget:
+                    self.search_stop_reason = "quota"
+                    return
+
+                try:
+                    request = self.youtube.search().list(
+                        part="snippet",
+                        q=keyword,
+                        type="channel",
+                        maxResults=min(page_size, 50),
+                        pageToken=page_token
+                    )
+                    response = self._execute(request, "search.list")
+                except (HttpError, CircuitOpenError) as e:
+                    print(f"YouTube search error: {e}")
+                    self.search_stop_reason = "error"
+                    return
+                self._cache_set("youtube_search", cache_key, {
+                    "items": response.get('items', []),
+                    "nextPageToken": response.get('nextPageToken')
+                })
+
+            pages += 1
+            page_token = response.get('nextPageToken')
+            yield [item['snippet']['channelId'] for item in response.get('items', [])][:page_size]
+
+            if not page_token:
+                self.search_stop_reason = "exhausted"
+                return
 
     def search_channels(self, keyword, max_results=10):
         """
         Searches for channels matching the keyword.
         Returns a list of channel IDs.
         """
-        try:
-            request = self.youtube.search().list(
-                part="snippet",
-                q=keyword,
-                type="channel",
-                maxResults=max_results
-            )
-            response = request.execute()
-            
-            channel_ids = [item['snippet']['channelId'] for item in response.get('items', [])]
-            return channel_ids[:max_results]
-        except HttpError as e:
-            print(f"An HTTP error {e.resp.status} occurred: {e.content}")
-            return []
+        channel_ids = []
+        for page in self.iter_search_pages(keyword, page_size=max_results, max_pages=1):
+            channel_ids.extend(page)
+        return channel_ids[:max_results]
 
     def get_channel_details(self, channel_ids):
         """
         Fetches detailed information for a list of channel IDs.
+        Cached channels are served locally; only the rest are requested,
+        50 IDs per call.
         """
         if not channel_ids:
             return []
-            
-        try:
-            request = self.youtube.channels().list(
-                part="snippet,contentDetails,statistics,brandingSettings",
-                id=','.join(channel_ids)
-            )
-            response = request.execute()
-            return response.get('items', [])
-        except HttpError as e:
-            print(f"An HTTP error {e.resp.status} occurred: {e.content}")
-            return []
 
-    def get_latest_video(self, channel_id):
+        found = {}
+        missing = []
+        for channel_id in channel_ids:
+            cached = self._cache_get("youtube_channels", channel_id)
+            if cached is None:
+                missing.append(channel_id)
+            else:
+                found[channel_id] = cached
+
+        for i in range(0, len(missing), MAX_CHANNEL_IDS):
+            try:
+                request = self.youtube.channels().list(
+                    part="snippet,contentDetails,statistics,brandingSettings",
+                    id=','.join(missing[i:i + MAX_CHANNEL_IDS])
+                )
+                response = self._execute(request, "channels.list")
+                for item in response.get('items', []):
+                    found[item['id']] = item
+                    self._cache_set("youtube_channels", item['id'], item)
+            except (HttpError, CircuitOpenError) as e:
+                print(f"YouTube channels error: {e}")
+
+        return [found[channel_id] for channel_id in channel_ids if channel_id in found]
+
+    def get_latest_video(self, channel):
         """
         Fetches the latest video for a channel.
-        First tries to get the uploads playlist ID, then fetches the first item.
+        `channel` is the channel resource from get_channel_details (preferred,
+        its contentDetails already hold the uploads playlist) or a channel ID.
         """
+        playlist_id = uploads_playlist_id(channel)
+        if not playlist_id:
+            return None
+
+        cached = self._cache_get("youtube_videos", playlist_id)
+        if cached is not None:
+            return cached["snippet"]
+
         try:
-            # 1. Get Uploads Playlist ID
-            request = self.youtube.channels().list(
-                part="contentDetails",
-                id=channel_id
-            )
-            response = request.execute()
-            items = response.get('items', [])
-            if not items:
-                return None
-                
-            uploads_playlist_id = items[0]['contentDetails']['relatedPlaylists']['uploads']
-            
-            # 2. Get latest video from playlist
             request = self.youtube.playlistItems().list(
                 part="snippet",
-                playlistId=uploads_playlist_id,
+                playlistId=playlist_id,
                 maxResults=1
             )
-            response = request.execute()
+            response = self._execute(request, "playlistItems.list")
             items = response.get('items', [])
-            if not items:
-                return None
-                
-            return items[0]['snippet']
-            
-        except HttpError as e:
-            print(f"An HTTP error {e.resp.status} occurred: {e.content}")
+            snippet = items[0]['snippet'] if items else None
+            self._cache_set("youtube_videos", playlist_id, {"snippet": snippet})
+            return snippet
+
+        except (HttpError, CircuitOpenError) as e:
+            print(f"YouTube playlist error: {e}")
             return None
+        except Exception as e:
+            # Network failures the guard gave up on (httplib2, sockets)
+            if not is_transient(e):
+                raise
+            print(f"YouTube playlist error: {e}")
+            return None
+
+    def get_latest_videos(self, channels):
+        """
+        Fetches the latest video for many channels (resources, channel IDs or
+        uploads playlist IDs) in one batched HTTP request. Returns a list
+        aligned with `channels`, with None where a channel has no uploads.
+        Falls back to one request per channel if the batch endpoint rejects
+        the request; a batch that keeps failing transiently leaves the
+        channels without a latest video.
+        """
+        results = [None] * len(channels)
+        playlist_ids = [uploads_playlist_id(channel) for channel in channels]
+        wanted = []
+        for i, playlist_id in enumerate(playlist_ids):
+            if not playlist_id:
+                continue
+            cached = self._cache_get("youtube_videos", playlist_id)
+            if cached is None:
+                wanted.append(i)
+            else:
+                results[i] = cached["snippet"]
+        if not wanted:
+            return results
+
+        def attempt():
+            # A fresh batch per attempt: re-executing a BatchHttpRequest
+            # would run the callbacks of the earlier attempt again
+            retry = []
+            received = 0
+
+            def callback(request_id, response, exception):
+                nonlocal received
+                i = int(request_id)
+                if exception is not None:
+                    # Sub-requests that were throttled or failed transiently
+                    if is_transient(exception):
+                        retry.append(i)
+                    else:
+                        print(f"YouTube playlist error for {playlist_ids[i]}: {exception}")
+                    return
+                received += len(json.dumps(response))
+                items = response.get('items', [])
+                results[i] = items[0]['snippet'] if items else None
+                self._cache_set("youtube_videos", playlist_ids[i], {"snippet": results[i]})
+
+            batch = self.youtube.new_batch_http_request(callback=callback)
+            for i in wanted:
+                batch.add(
+                    self.youtube.playlistItems().list(
+                        part="snippet",
+                        playlistId=playlist_ids[i],
+                        maxResults=1
+                    ),
+                    request_id=str(i)
+                )
+            self._count("playlistItems.list", len(wanted))
+            with self.metrics.measure("youtube.videos") as sample:
+                sample["quota_units"] += QUOTA_COSTS["playlistItems.list"] * len(wanted)
+                batch.execute()
+                sample["bytes"] += received
+            return retry
+
+        try:
+            retry = self.guard.call(attempt)
+        except Exception as e:
+            if isinstance(e, HttpError) and not is_transient(e):
+                # The batch endpoint itself refused
+                print(f"YouTube batch error: {e}")
+                retry = wanted
+            elif isinstance(e, CircuitOpenError) or is_transient(e):
+                print(f"YouTube batch error: {e}; no latest videos for {len(wanted)} channels.")
+                return results
+            else:
+                raise
+
+        # One by one, through the retrying single-request path
+        for i in retry:
+            results[i] = self.get_latest_video(channels[i])
+
+        return results